@@ -1,24 +1,28 @@
 # app/api/deps.py
+import asyncio
+import hmac
+import math
+from typing import Callable, Optional
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from jose import JWTError, jwt
+from jose import ExpiredSignatureError, JWTError
 from sqlalchemy.orm import Session
 from pydantic import ValidationError
 
 from app.db.database import get_db
+from app.db.replicas import get_read_db
 from app.models.user import User as UserModel
 from app.schemas.token import TokenData
 from app.core.config import settings
 from app.crud import crud_user
-from app.core.security import is_token_blacklisted  # <-- Add this import
+from app.core.security import decode_access_token, is_token_revoked, token_revocation_id
+from app.core.metrics import TOKEN_VERIFICATIONS
+from app.core.rate_limit import rate_limiter
 
 http_bearer = HTTPBearer()  # This will show a "Bearer <token>" field in Swagger UI
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(http_bearer),
-    db: Session = Depends(get_db)
-) -> UserModel:
+def _authenticate(credentials: HTTPAuthorizationCredentials, db: Session) -> UserModel:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -29,31 +33,101 @@ async def get_current_user(
         # Extract token from credentials object
         token = credentials.credentials
 
-        # Check if token is blacklisted
-        if is_token_blacklisted(token):
+        payload = decode_access_token(token)
+
+        # Check if token was revoked at logout
+        if is_token_revoked(db, token_revocation_id(token, payload)):
+            TOKEN_VERIFICATIONS.labels("revoked").inc()
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Token has been revoked",
             )
 
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
         email: str | None = payload.get("sub")
         
         if email is None:
+            TOKEN_VERIFICATIONS.labels("invalid").inc()
             raise credentials_exception
 
         try:
             token_data = TokenData(sub=email)
         except ValidationError:
+            TOKEN_VERIFICATIONS.labels("invalid").inc()
             raise credentials_exception
 
         user = crud_user.get_user_by_email(db, email=token_data.sub)
         if user is None:
+            TOKEN_VERIFICATIONS.labels("unknown_user").inc()
             raise credentials_exception
-            
+
+        TOKEN_VERIFICATIONS.labels("ok").inc()
         return user
 
+    except ExpiredSignatureError:
+        TOKEN_VERIFICATIONS.labels("expired").inc()
+        raise credentials_exception
     except JWTError:
+        TOKEN_VERIFICATIONS.labels("invalid").inc()
         raise credentials_exception
+
+# Operator-only diagnostics (pool and pg_stat_activity counts, SQL texts, job errors)
+# are not tied to a user account: they take a shared token, and are off without one
+async def require_health_token(x_health_token: Optional[str] = Header(None)) -> None:
+    if not settings.HEALTH_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if x_health_token is None or not hmac.compare_digest(x_health_token.encode(), settings.HEALTH_TOKEN.encode()):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid health token")
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(http_bearer),
+    db: Session = Depends(get_db)
+) -> UserModel:
+    return _authenticate(credentials, db)
+
+async def get_current_user_for_read(
+    credentials: HTTPAuthorizationCredentials = Depends(http_bearer),
+    db: Session = Depends(get_read_db)
+) -> UserModel:
+    """
+    Same as get_current_user, but authenticates on the read session so read-only
+    endpoints using get_read_db hold a single (replica) connection.
+    """
+    return _authenticate(credentials, db)
+
+# --- Rate limiting (see app/core/rate_limit.py) ---
+
+async def _enforce_rate_limit(policy: str, key: str, cost: float) -> None:
+    if rate_limiter.backend.blocking:
+        wait = await asyncio.to_thread(rate_limiter.check, policy, key, cost)
+    else:
+        wait = rate_limiter.check(policy, key, cost)
+    if wait > 0:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Rate limit exceeded",
+            headers={"Retry-After": str(math.ceil(wait))},
+        )
+
+def rate_limit_user(cost: float = 1, for_read: bool = False) -> Callable:
+    """
+    Dependency charging cost to the current user's bucket. It resolves the same
+    user dependency as the endpoint (get_current_user_for_read when for_read), so
+    FastAPI authenticates the request only once.
+    """
+    user_dependency = get_current_user_for_read if for_read else get_current_user
+
+    async def dependency(current_user: UserModel = Depends(user_dependency)) -> None:
+        if settings.RATE_LIMIT_ENABLED:
+            await _enforce_rate_limit("user", str(current_user.id), cost)
+
+    return dependency
+
+def rate_limit_ip(cost: float = 1) -> Callable:
+    """Dependency charging cost to the client IP's bucket, for unauthenticated endpoints."""
+
+    async def dependency(request: Request) -> None:
+        if settings.RATE_LIMIT_ENABLED:
+            # request.client is the proxy unless uvicorn runs with --proxy-headers
+            await _enforce_rate_limit("auth", request.client.host if request.client else "unknown", cost)
+
+    return dependency
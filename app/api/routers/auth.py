@@ -5,25 +5,42 @@ from fastapi import APIRouter, Depends, HTTPException, status, Body
 from fastapi.security import OAuth2PasswordRequestForm  # For login form data
 from fastapi import Header
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from typing import Optional
 # SQLAlchemy specific imports
 from sqlalchemy.orm import Session
-from jose import jwt, JWTError
+from jose import JWTError
 from app.core.config import settings
 
 # Your application-specific imports
 from app.db.database import get_db
+from app.api.deps import rate_limit_ip
 from app.schemas.user import UserCreate, UserResponse, UserWithTokenResponse  # For registration
-from app.schemas.token import Token, RefreshTokenRequest  # For the /login and /refresh response_model
+from app.schemas.token import Token, TokenPair, RefreshTokenRequest  # For the /login and /refresh response_model
 from app.crud import crud_user  # Your user CRUD operations
-from app.core.security import verify_password, create_access_token, create_refresh_token, add_to_blacklist  # Security utilities
+from app.core.security import (  # Security utilities
+    get_password_hash_async,
+    verify_password_async,
+    create_access_token,
+    create_refresh_token,
+    decode_access_token,
+    decode_token,
+    family_revocation_id,
+    is_token_revoked,
+    revoke_token,
+    token_revocation_id,
+)
 
 router = APIRouter(
     prefix="/api/auth",
     tags=["Authentication"]  # This groups these endpoints in Swagger UI
 )
 
+# Per client IP; register and login cost more because they run bcrypt
+_bcrypt_limit = [Depends(rate_limit_ip(cost=3))]
+_token_limit = [Depends(rate_limit_ip(cost=1))]
+
 # --- User Registration Endpoint ---
-@router.post("/register", response_model=UserWithTokenResponse, status_code=status.HTTP_201_CREATED)
+@router.post("/register", response_model=UserWithTokenResponse, status_code=status.HTTP_201_CREATED, dependencies=_bcrypt_limit)
 async def register_user(
     user_in: UserCreate,  # Expects data matching UserCreate schema in request body
     db: Session = Depends(get_db)
@@ -45,7 +62,9 @@ async def register_user(
         )
 
     # Create the new user
-    created_user = crud_user.create_user(db=db, user=user_in)
+    created_user = crud_user.create_user(
+        db=db, user=user_in, hashed_password=await get_password_hash_async(user_in.password)
+    )
 
     # Generate tokens for the newly registered user
     # The "sub" (subject) of the tokens will be the user's email
@@ -61,7 +80,7 @@ async def register_user(
     }
 
 # --- User Login Endpoint ---
-@router.post("/login", response_model=UserWithTokenResponse)
+@router.post("/login", response_model=UserWithTokenResponse, dependencies=_bcrypt_limit)
 async def login_for_access_token(
     db: Session = Depends(get_db),
     form_data: OAuth2PasswordRequestForm = Depends()  # Handles username/password from form data
@@ -74,7 +93,7 @@ async def login_for_access_token(
         user = crud_user.get_user_by_email(db, email=form_data.username)
 
     # If user still not found, or if password verification fails
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -94,37 +113,92 @@ async def login_for_access_token(
     }
 
 # --- Token Refresh Endpoint ---
-@router.post("/refresh")
+@router.post("/refresh", response_model=TokenPair, dependencies=_token_limit)
 async def refresh_token(
     refresh_request: RefreshTokenRequest = Body(...),
+    db: Session = Depends(get_db)
 ):
+    """
+    Rotates the refresh token: the presented token is revoked and a new one from
+    the same family is returned with the new access token. Presenting a refresh
+    token that was already rotated means it leaked (or was replayed), so the whole
+    family is revoked and its holder has to log in again.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    token = refresh_request.refresh_token
     try:
-        payload = jwt.decode(
-            refresh_request.refresh_token,
-            settings.REFRESH_TOKEN_SECRET_KEY,
-            algorithms=[settings.ALGORITHM]
-        )
-        email = payload.get("sub")
-        if not email:
-            raise credentials_exception
-        # Optionally: Check if the refresh token is in a valid list (if you want to revoke tokens)
-        new_access_token = create_access_token(data={"sub": email})
-        return {"access_token": new_access_token, "token_type": "bearer"}
+        payload = decode_token(token, settings.REFRESH_TOKEN_SECRET_KEY)
     except JWTError:
         raise credentials_exception
+    email = payload.get("sub")
+    if not email:
+        raise credentials_exception
+
+    family_id = payload.get("fam") # Absent on tokens issued before rotation; they start a new family
+    if family_id and is_token_revoked(db, family_revocation_id(family_id)):
+        raise credentials_exception
+
+    if not revoke_token(db, token_revocation_id(token, payload), payload["exp"]):
+        if family_id:
+            revoke_token(db, family_revocation_id(family_id), payload["exp"])
+        db.commit()
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token reuse detected; please log in again",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    db.commit()
+
+    return {
+        "access_token": create_access_token(data={"sub": email}),
+        "refresh_token": create_refresh_token(
+            data={"sub": email},
+            family_id=family_id,
+            expires_at=payload["exp"] if family_id else None
+        ),
+        "token_type": "bearer"
+    }
 
 # --- User Logout Endpoint ---
 http_bearer = HTTPBearer()
 
-@router.post("/logout")
+@router.post("/logout", dependencies=_token_limit)
 async def logout(
-    credentials: HTTPAuthorizationCredentials = Depends(http_bearer)
+    credentials: HTTPAuthorizationCredentials = Depends(http_bearer),
+    refresh_request: Optional[RefreshTokenRequest] = Body(None),
+    db: Session = Depends(get_db)
 ):
+    """
+    Revokes the access token and, when its refresh token is sent along, the whole
+    refresh-token family. Revocations lapse when the tokens would have expired.
+    """
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
     token = credentials.credentials
-    add_to_blacklist(token)
+    try:
+        payload = decode_access_token(token)
+    except JWTError:
+        raise credentials_exception
+    revoke_token(db, token_revocation_id(token, payload), payload["exp"])
+
+    if refresh_request is not None:
+        try:
+            refresh_payload = decode_token(refresh_request.refresh_token, settings.REFRESH_TOKEN_SECRET_KEY)
+        except JWTError:
+            raise credentials_exception
+        if refresh_payload.get("sub") != payload.get("sub"):
+            raise credentials_exception
+        if refresh_payload.get("fam"):
+            revoke_token(db, family_revocation_id(refresh_payload["fam"]), refresh_payload["exp"])
+        else:
+            revoke_token(db, token_revocation_id(refresh_request.refresh_token, refresh_payload), refresh_payload["exp"])
+
+    db.commit()
     return {"message": "Successfully logged out"}
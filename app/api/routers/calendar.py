@@ -0,0 +1,76 @@
+# app/api/routers/calendar.py
+from datetime import datetime, timezone
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.api.deps import get_current_user
+from app.db.database import get_db
+from app.db.replicas import get_read_db, replica_router
+from app.models.calendar_feed import CalendarFeed
+from app.models.user import User
+from app.schemas.calendar import CalendarFeedResponse
+from app.services import ics_feed
+
+router = APIRouter(
+    prefix="/api/calendar",
+    tags=["Calendar"]
+)
+
+@router.post("/feed", response_model=CalendarFeedResponse, status_code=status.HTTP_201_CREATED)
+async def create_calendar_feed_endpoint(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Creates the user's ICS feed URL, replacing (and revoking) any previous one."""
+    token, token_hash = ics_feed.new_feed_token()
+    stmt = pg_insert(CalendarFeed).values(
+        user_id=current_user.id, token_hash=token_hash, created_at=datetime.now(timezone.utc)
+    )
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[CalendarFeed.user_id],
+        set_={"token_hash": stmt.excluded.token_hash, "created_at": stmt.excluded.created_at}
+    ))
+    db.commit()
+    return {"url": str(request.url_for("calendar_feed_endpoint", token=token)), "token": token}
+
+@router.delete("/feed", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_calendar_feed_endpoint(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    db.execute(delete(CalendarFeed).where(CalendarFeed.user_id == current_user.id))
+    db.commit()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@router.get("/feed/{token}.ics", name="calendar_feed_endpoint", response_class=StreamingResponse)
+async def calendar_feed_endpoint(
+    token: str,
+    request: Request,
+    db: Session = Depends(get_read_db)
+):
+    """
+    Every event the feed's owner can read, as text/calendar. The token in the URL
+    is the only credential, since calendar apps cannot send a bearer token.
+    Polls with a matching If-None-Match get 304.
+    """
+    user_id = db.execute(
+        select(CalendarFeed.user_id).where(CalendarFeed.token_hash == ics_feed.hash_feed_token(token))
+    ).scalar()
+    if user_id is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Calendar feed not found")
+
+    etag = ics_feed.feed_etag(db, user_id)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in (tag.strip() for tag in if_none_match.split(","))):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return StreamingResponse(
+        ics_feed.iter_feed(lambda: replica_router.session_for(None), user_id),
+        media_type="text/calendar; charset=utf-8",
+        headers=headers
+    )
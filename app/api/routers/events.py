@@ -1,43 +1,129 @@
 # app/api/routers/events.py
 
-from fastapi import APIRouter, Depends, HTTPException, status, Response # Response is used for 204
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status, Response # Response is used for 204
+from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
-from typing import List, Optional, Dict, Any # Added Dict, Any for the diff endpoint
-from datetime import datetime
+from typing import Callable, List, Optional, Dict, Any # Added Dict, Any for the diff endpoint
+from pydantic import TypeAdapter
+from datetime import date, datetime
 
+from app.core.config import settings
 from app.db.database import get_db
-from app.api.deps import get_current_user
+from app.db.replicas import get_read_db, is_replica_session
+from app.api.deps import get_current_user, get_current_user_for_read, rate_limit_user
 from app.models.user import User
 from app.models.event import Event
 from app.models.permission import EventPermission
 # No need to import EventVersion model here, as router calls CRUD which handles it
-from app.schemas.event import EventCreate, EventUpdate, EventResponse
+from app.schemas.event import (
+    EventCreate,
+    EventUpdate,
+    EventResponse,
+    EventBulkUpdate,
+    EventBulkDelete,
+    EventBulkResult,
+    EventBatchReadResponse,
+    EventHeatmapResponse,
+    HeatmapBucketSize
+)
 from app.schemas.permission import (
     EventPermissionCreate,
     EventPermissionResponse,
     EventPermissionDetail,
     EventPermissionUpdate
 )
-from app.schemas.pagination import PaginatedResponse
+from app.schemas.pagination import CursorPage, PaginatedResponse, decode_cursor, encode_cursor
 from app.schemas.changelog import ChangelogEntryResponseSchema # <-- New import for changelog schema
-from app.crud import crud_event
+from app.schemas.diff import EventVersionRangeDiffResponse
+from app.crud import crud_event, crud_user
+from app.services import idempotency
+from app.services.event_cache import event_read_cache
 
 router = APIRouter(
     prefix="/api/events",
     tags=["Events"]
 )
 
+# Per-user rate limits on the expensive endpoints, weighted by cost
+_batch_limit = [Depends(rate_limit_user(cost=10))]
+_by_ids_limit = [Depends(rate_limit_user(cost=5, for_read=True))]
+_diff_limit = [Depends(rate_limit_user(cost=5, for_read=True))]
+_changelog_limit = [Depends(rate_limit_user(cost=2, for_read=True))]
+_heatmap_limit = [Depends(rate_limit_user(cost=2, for_read=True))]
+
+# Create, batch and share accept an Idempotency-Key header: retries of the same
+# request replay the stored response instead of writing again
+_idempotency_key_header = Header(None, alias="Idempotency-Key", max_length=200)
+
+async def _idempotent(
+    db: Session,
+    user_id: int,
+    key: Optional[str],
+    endpoint: str,
+    payload: Any,
+    adapter: TypeAdapter,
+    status_code: int,
+    produce: Callable[[bool], Any]
+) -> Any:
+    """
+    Runs produce(commit) once per key; without a key it simply runs it and lets
+    it commit. With a key, produce only flushes its write, and the stored
+    response is committed in the same transaction, so the write never lands
+    without its response (which would let a retry write it again).
+    """
+    if key is None:
+        return produce(True)
+    try:
+        stored = await idempotency.begin(
+            db, user_id, key, idempotency.request_fingerprint(endpoint, jsonable_encoder(payload))
+        )
+    except idempotency.IdempotencyKeyReused:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key was already used for a different request"
+        )
+    except idempotency.IdempotencyInProgress:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A request with this Idempotency-Key is still being processed",
+            headers={"Retry-After": "1"}
+        )
+    if stored is not None:
+        return Response(
+            content=stored.body,
+            status_code=stored.status_code,
+            media_type="application/json",
+            headers={"Idempotent-Replayed": "true"}
+        )
+    try:
+        body = adapter.dump_json(adapter.validate_python(produce(False), from_attributes=True))
+        idempotency.complete(db, user_id, key, status_code, body)
+    except BaseException:
+        idempotency.release(db, user_id, key) # Rolls the uncommitted write back too
+        raise
+    return Response(content=body, status_code=status_code, media_type="application/json")
+
 # --- Standard Event Endpoints ---
 
 @router.post("/", response_model=EventResponse, status_code=status.HTTP_201_CREATED)
 async def create_event_endpoint(
     event_data: EventCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    idempotency_key: Optional[str] = _idempotency_key_header
 ):
-    return crud_event.create_event(db=db, event=event_data, owner_id=current_user.id)
+    return await _idempotent(
+        db, current_user.id, idempotency_key, "create_event", event_data,
+        _event_response_adapter, status.HTTP_201_CREATED,
+        lambda commit: crud_event.create_event(db=db, event=event_data, owner_id=current_user.id, commit=commit)
+    )
 
-@router.get("/", response_model=PaginatedResponse[EventResponse])
+@router.get(
+    "/",
+    response_model=PaginatedResponse[EventResponse],
+    response_model_exclude_none=settings.RESPONSE_EXCLUDE_NONE,
+    response_model_exclude_defaults=settings.RESPONSE_EXCLUDE_DEFAULTS
+)
 async def read_events_endpoint(
     skip: int = 0,
     limit: int = 100,
@@ -46,8 +132,9 @@ async def read_events_endpoint(
     start_time_after: Optional[datetime] = None,
     start_time_before: Optional[datetime] = None,
     sort_by: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    q: Optional[str] = None, # Full-text search over title, description and location
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user_for_read)
 ):
     result = crud_event.get_events_with_permission(
         db=db,
@@ -58,20 +145,104 @@ async def read_events_endpoint(
         owner_id=owner_id,
         start_time_after=start_time_after,
         start_time_before=start_time_before,
-        sort_by=sort_by
+        sort_by=sort_by,
+        search=q
     )
     return result
 
+# Hot reads (single event, changelog) are served from event_read_cache: the ACL and
+# the serialized body are cached per event, and access is checked per user on every hit.
+_event_response_adapter = TypeAdapter(EventResponse)
+_changelog_response_adapter = TypeAdapter(List[ChangelogEntryResponseSchema])
+_event_list_response_adapter = TypeAdapter(List[EventResponse])
+_permission_response_adapter = TypeAdapter(EventPermissionResponse)
+
+def _json_body(adapter: TypeAdapter, value: Any) -> bytes:
+    return adapter.dump_json(
+        adapter.validate_python(value, from_attributes=True),
+        exclude_none=settings.RESPONSE_EXCLUDE_NONE,
+        exclude_defaults=settings.RESPONSE_EXCLUDE_DEFAULTS
+    )
+
+def _event_body(db: Session, event_id: int) -> Optional[bytes]:
+    event_obj = crud_event.get_event(db, event_id)
+    return _json_body(_event_response_adapter, event_obj) if event_obj else None
+
+async def _can_read_event(db: Session, event_id: int, user_id: int) -> bool:
+    acl = await event_read_cache.get_or_load_async(
+        event_id, "acl", lambda: crud_event.get_event_acl(db, event_id), replica=is_replica_session(db)
+    )
+    return acl is not None and user_id in acl
+
+# Dashboards read many specific events at once: visibility and rows come from one
+# set-based query instead of one request (and ACL + event lookups) per id.
+# Declared before /{event_id} so "by-ids" is not parsed as an id.
+@router.get(
+    "/by-ids",
+    response_model=EventBatchReadResponse,
+    response_model_exclude_none=settings.RESPONSE_EXCLUDE_NONE,
+    response_model_exclude_defaults=settings.RESPONSE_EXCLUDE_DEFAULTS,
+    dependencies=_by_ids_limit
+)
+async def read_events_by_ids_endpoint(
+    ids: List[str] = Query(..., min_length=1), # ?ids=1,2,3 or ?ids=1&ids=2
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user_for_read)
+):
+    try:
+        event_ids = [int(part) for value in ids for part in value.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="ids must be integers")
+    if not event_ids or len(event_ids) > settings.EVENT_BATCH_READ_MAX_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Provide between 1 and {settings.EVENT_BATCH_READ_MAX_IDS} ids"
+        )
+    found = crud_event.get_events_by_ids_with_permission(db, event_ids, current_user.id)
+    return {"items": [
+        {"id": event_id, "found": event_id in found, "event": found.get(event_id)}
+        for event_id in event_ids
+    ]}
+
+# Calendar views draw per-day counts: aggregated in the database instead of the client
+# paging through every event. Declared before /{event_id}, like /by-ids.
+@router.get("/heatmap", response_model=EventHeatmapResponse, response_model_exclude_none=True, dependencies=_heatmap_limit)
+async def read_event_heatmap_endpoint(
+    start: date,
+    end: date, # Inclusive
+    bucket: HeatmapBucketSize = "day",
+    busy_minutes: bool = False, # Also return the summed length of the events
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user_for_read)
+):
+    """Event counts per UTC day, week or month of start time, over the events the caller can read."""
+    if end < start or (end - start).days >= settings.EVENT_HEATMAP_MAX_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"end must be on or after start, and the range at most {settings.EVENT_HEATMAP_MAX_DAYS} days"
+        )
+    items = crud_event.get_event_heatmap(
+        db, current_user.id, start, end, bucket, use_rollup=settings.EVENT_HEATMAP_SOURCE == "rollup"
+    )
+    if not busy_minutes:
+        for item in items:
+            item["busy_minutes"] = None
+    return {"bucket": bucket, "items": items}
+
 @router.get("/{event_id}", response_model=EventResponse)
 async def read_single_event_endpoint(
     event_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user_for_read)
 ):
-    event_obj = crud_event.get_event_with_permission(db, event_id, current_user.id)
-    if not event_obj:
+    body = None
+    if await _can_read_event(db, event_id, current_user.id):
+        body = await event_read_cache.get_or_load_async(
+            event_id, "event", lambda: _event_body(db, event_id), replica=is_replica_session(db)
+        )
+    if body is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Event not found or not authorized")
-    return event_obj
+    return Response(content=body, media_type="application/json")
 
 @router.put("/{event_id}", response_model=EventResponse)
 async def update_single_event_endpoint(
@@ -96,77 +267,161 @@ async def delete_single_event_endpoint(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Event not found or not authorized for deletion")
     return db_event
 
-@router.post("/batch", response_model=List[EventResponse], status_code=status.HTTP_201_CREATED)
+@router.post("/batch", response_model=List[EventResponse], status_code=status.HTTP_201_CREATED, dependencies=_batch_limit)
 async def create_events_batch_endpoint(
     events_data: List[EventCreate],
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    idempotency_key: Optional[str] = _idempotency_key_header
 ):
-    return crud_event.create_events_batch(db, events_data, owner_id=current_user.id)
+    return await _idempotent(
+        db, current_user.id, idempotency_key, "create_events_batch", events_data,
+        _event_list_response_adapter, status.HTTP_201_CREATED,
+        lambda commit: crud_event.create_events_batch(db, events_data, owner_id=current_user.id, commit=commit)
+    )
 
-# --- Event Sharing and Permission Endpoints ---
+def _require_single_selector(ids: Optional[List[int]], filter_obj) -> None:
+    if (ids is None) == (filter_obj is None):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Provide exactly one of 'ids' or 'filter'"
+        )
 
-@router.post("/{event_id}/share", response_model=EventPermissionResponse)
-async def share_event_endpoint(
-    event_id: int,
-    permission_in: EventPermissionCreate,
+@router.patch("/batch", response_model=EventBulkResult, dependencies=_batch_limit)
+async def bulk_update_events_endpoint(
+    bulk_in: EventBulkUpdate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    event_obj = db.query(Event).filter(Event.id == event_id, Event.owner_id == current_user.id).first()
-    if not event_obj:
+    _require_single_selector(bulk_in.ids, bulk_in.filter)
+    result = crud_event.bulk_update_events(
+        db, current_user.id, bulk_in.patch, event_ids=bulk_in.ids, filters=bulk_in.filter
+    )
+    if result["unauthorized_ids"]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only the event owner can share this event"
+            detail=f"Events not found or not owned by you: {result['unauthorized_ids']}"
         )
-    
-    user_to_share_with = db.query(User).filter(User.id == permission_in.user_id).first()
-    if not user_to_share_with:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"User with ID {permission_in.user_id} not found"
-        )
-    
-    existing_permission = db.query(EventPermission).filter(
-        EventPermission.event_id == event_id,
-        EventPermission.user_id == permission_in.user_id
-    ).first()
-    if existing_permission:
+    return result
+
+@router.post("/batch/delete", response_model=EventBulkResult, dependencies=_batch_limit)
+async def bulk_delete_events_endpoint(
+    bulk_in: EventBulkDelete,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    _require_single_selector(bulk_in.ids, bulk_in.filter)
+    result = crud_event.bulk_delete_events(
+        db, current_user.id, event_ids=bulk_in.ids, filters=bulk_in.filter
+    )
+    if result["unauthorized_ids"]:
         raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail=f"User {permission_in.user_id} already has a permission for event {event_id}. Use PUT to update."
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Events not found or not owned by you: {result['unauthorized_ids']}"
         )
+    return result
 
-    new_permission = EventPermission(
-        event_id=event_id,
-        user_id=permission_in.user_id,
-        role_id=permission_in.role_id
-    )
-    db.add(new_permission)
-    db.commit()
-    db.refresh(new_permission)
-    return new_permission
+# --- Event Sharing and Permission Endpoints ---
 
-@router.get("/{event_id}/permissions", response_model=List[EventPermissionDetail])
-async def list_event_permissions_endpoint(
+@router.post("/{event_id}/share", response_model=EventPermissionResponse)
+async def share_event_endpoint(
     event_id: int,
+    permission_in: EventPermissionCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    idempotency_key: Optional[str] = _idempotency_key_header
 ):
-    event_obj = db.query(Event).filter(Event.id == event_id, Event.owner_id == current_user.id).first()
-    if not event_obj:
-        has_any_permission = db.query(EventPermission).filter(
-            EventPermission.event_id == event_id,
-            EventPermission.user_id == current_user.id
-        ).first()
-        if not has_any_permission: 
-             raise HTTPException(
+    def share(commit: bool) -> EventPermission:
+        event_obj = db.query(Event).filter(Event.id == event_id, Event.owner_id == current_user.id).first()
+        if not event_obj:
+            raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
-                detail="Not authorized to view permissions for this event"
+                detail="Only the event owner can share this event"
             )
-    
-    permissions_details = crud_event.get_permissions_for_event(db, event_id)
-    return permissions_details
+
+        user_to_share_with = crud_user.get_user_by_id(db, permission_in.user_id)
+        if not user_to_share_with:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"User with ID {permission_in.user_id} not found"
+            )
+
+        existing_permission = crud_event.get_permission(db, event_id, permission_in.user_id)
+        if existing_permission:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"User {permission_in.user_id} already has a permission for event {event_id}. Use PUT to update."
+            )
+
+        new_permission = EventPermission(
+            event_id=event_id,
+            user_id=permission_in.user_id,
+            role_id=permission_in.role_id
+        )
+        db.add(new_permission)
+        if commit:
+            db.commit()
+        else:
+            db.flush()
+        db.refresh(new_permission)
+        return new_permission
+
+    response = await _idempotent(
+        db, current_user.id, idempotency_key, "share_event", {"event_id": event_id, "permission": permission_in},
+        _permission_response_adapter, status.HTTP_200_OK, share
+    )
+    # After the commit, which with a key happens inside _idempotent
+    event_read_cache.invalidate(event_id, kinds=("acl",))
+    return response
+
+@router.get(
+    "/{event_id}/permissions",
+    response_model=List[EventPermissionDetail],
+    response_model_exclude_none=settings.RESPONSE_EXCLUDE_NONE,
+    response_model_exclude_defaults=settings.RESPONSE_EXCLUDE_DEFAULTS
+)
+async def list_event_permissions_endpoint(
+    event_id: int,
+    role: Optional[str] = None, # Role name, e.g. "editor"
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user_for_read)
+):
+    if not await _can_read_event(db, event_id, current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to view permissions for this event"
+        )
+    return crud_event.get_permissions_for_event(db, event_id, role=role)
+
+@router.get(
+    "/{event_id}/permissions/page",
+    response_model=CursorPage[EventPermissionDetail],
+    response_model_exclude_none=settings.RESPONSE_EXCLUDE_NONE,
+    response_model_exclude_defaults=settings.RESPONSE_EXCLUDE_DEFAULTS
+)
+async def page_event_permissions_endpoint(
+    event_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    role: Optional[str] = None, # Role name, e.g. "editor"
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user_for_read)
+):
+    """Keyset-paginated permission list; follow next_cursor until it is null."""
+    if not await _can_read_event(db, event_id, current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to view permissions for this event"
+        )
+    after_id = None
+    if cursor is not None:
+        after_id = decode_cursor(cursor)
+        if after_id is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    # One extra row tells whether another page follows, without counting
+    rows = crud_event.get_permissions_for_event(db, event_id, role=role, after_id=after_id, limit=limit + 1)
+    next_cursor = encode_cursor(rows[limit - 1].id) if len(rows) > limit else None
+    return CursorPage[EventPermissionDetail](items=rows[:limit], next_cursor=next_cursor)
 
 @router.put("/{event_id}/permissions/{target_user_id}", response_model=EventPermissionResponse)
 async def update_user_permission_endpoint(
@@ -222,8 +477,8 @@ async def delete_user_permission_endpoint(
 async def get_event_version_history_endpoint(
     event_id: int,
     version_id: int, 
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user_for_read)
 ):
     event_access = crud_event.get_event_with_permission(db, event_id, current_user.id)
     if not event_access:
@@ -232,7 +487,7 @@ async def get_event_version_history_endpoint(
             detail=f"Event ID {event_id} not found or user not authorized to view its history"
         )
 
-    event_version_obj = crud_event.get_specific_event_version(db, version_id)
+    event_version_obj = crud_event.get_specific_event_version(db, version_id, event_id=event_id)
 
     if not event_version_obj or event_version_obj.event_id != event_id:
         raise HTTPException(
@@ -266,31 +521,75 @@ async def rollback_event_to_version_endpoint(
         )
     return rolled_back_event
 
+@router.post("/{event_id}/rollback", response_model=EventResponse)
+async def rollback_event_by_version_number_endpoint(
+    event_id: int,
+    version_number: Optional[int] = None,
+    steps_back: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    if (version_number is None) == (steps_back is None):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Provide exactly one of 'version_number' or 'steps_back'"
+        )
+    if steps_back is not None and steps_back < 1:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="'steps_back' must be at least 1"
+        )
+
+    rolled_back_event = crud_event.rollback_event_to_version_number(
+        db, event_id, current_user.id, version_number=version_number, steps_back=steps_back
+    )
+    if rolled_back_event:
+        return rolled_back_event
+
+    # Only the failure path pays for telling "not owner" apart from "no such version"
+    is_owner = db.query(Event).filter(Event.id == event_id, Event.owner_id == current_user.id).first()
+    if not is_owner:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only the event owner can perform a rollback"
+        )
+    raise HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail=f"Rollback failed. Requested version not found for event ID {event_id}."
+    )
+
 # --- Changelog & Diff Endpoints ---
 
-@router.get("/{event_id}/changelog", response_model=List[ChangelogEntryResponseSchema])
+@router.get(
+    "/{event_id}/changelog",
+    response_model=List[ChangelogEntryResponseSchema],
+    response_model_exclude_none=settings.RESPONSE_EXCLUDE_NONE,
+    response_model_exclude_defaults=settings.RESPONSE_EXCLUDE_DEFAULTS,
+    dependencies=_changelog_limit
+)
 async def get_event_changelog_endpoint(
     event_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user_for_read)
 ):
-    event_access = crud_event.get_event_with_permission(db, event_id, current_user.id)
-    if not event_access:
+    if not await _can_read_event(db, event_id, current_user.id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Event ID {event_id} not found or user not authorized to view its changelog"
         )
-    
-    changelog_data = crud_event.get_event_changelog(db, event_id)
-    return changelog_data
 
-@router.get("/{event_id}/diff/{version_id1}/{version_id2}", response_model=Dict[str, Any])
+    body = await event_read_cache.get_or_load_async(event_id, "changelog", lambda: _json_body(
+        _changelog_response_adapter, crud_event.get_event_changelog(db, event_id)
+    ), replica=is_replica_session(db))
+    return Response(content=body, media_type="application/json")
+
+@router.get("/{event_id}/diff/{version_id1}/{version_id2}", response_model=Dict[str, Any], dependencies=_diff_limit)
 async def get_event_versions_diff_endpoint(
     event_id: int,
     version_id1: int,
     version_id2: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user_for_read)
 ):
     event_access = crud_event.get_event_with_permission(db, event_id, current_user.id)
     if not event_access:
@@ -308,3 +607,36 @@ async def get_event_versions_diff_endpoint(
         )
     
     return diff_data
+
+@router.get(
+    "/{event_id}/diff",
+    response_model=EventVersionRangeDiffResponse,
+    response_model_exclude_none=True,
+    dependencies=_diff_limit
+)
+async def get_event_version_range_diff_endpoint(
+    event_id: int,
+    from_version: int,
+    to_version: int,
+    include_steps: bool = False,
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user_for_read)
+):
+    event_access = crud_event.get_event_with_permission(db, event_id, current_user.id)
+    if not event_access:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Event ID {event_id} not found or user not authorized to view version diffs"
+        )
+
+    diff_data = crud_event.get_diff_across_event_versions(
+        db, event_id, from_version, to_version, include_steps=include_steps
+    )
+
+    if diff_data is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Version range {from_version}..{to_version} not found for event ID {event_id}"
+        )
+
+    return diff_data
@@ -0,0 +1,50 @@
+# app/api/routers/health.py
+from fastapi import APIRouter, Depends
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from typing import Any, Dict
+
+from app.api.deps import require_health_token
+from app.core.profiling import query_profile_registry
+from app.core.scheduler import scheduler
+from app.db.database import get_db, get_engine, pool_metrics
+from app.db.replicas import replica_router
+
+router = APIRouter(
+    prefix="/api/health",
+    tags=["Health"],
+    dependencies=[Depends(require_health_token)]
+)
+
+@router.get("/db-pool", response_model=Dict[str, Any])
+async def db_pool_stats(db: Session = Depends(get_db)):
+    """
+    Connection pool metrics for this worker process (primary, and each replica
+    pool once it has been used), plus the primary's connection budget, for
+    sizing workers * (pool_size + max_overflow).
+    """
+    server = db.execute(text("""
+        SELECT current_setting('max_connections')::int AS max_connections,
+               (SELECT count(*) FROM pg_stat_activity) AS connections_in_use
+    """)).mappings().one()
+    return {
+        "pool": pool_metrics.snapshot(get_engine().pool),
+        "replica_pools": replica_router.pool_snapshots(),
+        "server": dict(server),
+    }
+
+@router.get("/queries", response_model=Dict[str, Any])
+async def query_profile_stats():
+    """
+    Per-route histograms of SQL statement count and DB time for this worker
+    process. Empty unless QUERY_PROFILING_ENABLED is set.
+    """
+    return query_profile_registry.snapshot()
+
+@router.get("/jobs", response_model=Dict[str, Any])
+async def scheduled_jobs():
+    """
+    Scheduled maintenance jobs as seen by this worker process. A leader_only
+    job only runs in the worker holding its lock; elsewhere it counts as skipped.
+    """
+    return scheduler.snapshot()
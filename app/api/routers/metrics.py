@@ -0,0 +1,12 @@
+# app/api/routers/metrics.py
+from fastapi import APIRouter, Depends, Response
+
+from app.api.deps import require_health_token
+from app.core.metrics import CONTENT_TYPE_LATEST, render_metrics
+
+router = APIRouter(tags=["Metrics"], dependencies=[Depends(require_health_token)])
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint (aggregated across workers in multiprocess mode)."""
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
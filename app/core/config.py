@@ -9,6 +9,98 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int
     REFRESH_TOKEN_SECRET_KEY: str
     REFRESH_TOKEN_EXPIRE_DAYS: int = 30
+    TOKEN_CACHE_SIZE: int = 10000  # Verified access tokens kept in memory per worker; 0 disables
+    PASSWORD_HASH_CONCURRENCY: int = 4  # bcrypt calls run at once per worker (in threads); the rest queue
+    REVOCATION_PURGE_SECONDS: float = 3600  # How often expired rows are deleted from revoked_tokens; 0 disables
+    REVOCATION_PURGE_BATCH_SIZE: int = 10000
+    DIFF_CACHE_SIZE: int = 1024  # Max number of computed version diffs kept in memory
+    HISTORY_WRITE_BEHIND: bool = False  # Write versions/changelog through the outbox instead of on the request path
+    HISTORY_OUTBOX_WORKER_IN_PROCESS: bool = True  # Set False when running `python -m app.services.history_outbox` separately
+    HISTORY_OUTBOX_BATCH_SIZE: int = 500
+    HISTORY_OUTBOX_POLL_SECONDS: float = 0.5
+
+    # Connection pool, per worker process: size workers so that
+    # workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) stays below Postgres max_connections
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30  # Seconds to wait for a free connection before failing
+    DB_POOL_RECYCLE: int = 1800  # Seconds before a connection is replaced; -1 disables
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_PREWARM: int = 0  # Connections opened at start-up, before the first request (at most DB_POOL_SIZE)
+    DB_STATEMENT_TIMEOUT_MS: int = 0  # Per-statement timeout set on every connection; 0 disables
+    DB_COMPILED_CACHE_SIZE: int = 1000  # Compiled SQL statements kept per engine
+    # psycopg 3 only (postgresql+psycopg:// URLs): executions of the same SQL on a connection
+    # before it is prepared server-side; -1 disables (e.g. behind PgBouncer in transaction mode)
+    DB_PREPARE_THRESHOLD: int = 2
+
+    # Read replicas used by get_read_db, comma-separated; empty means all reads go to DATABASE_URL
+    DATABASE_REPLICA_URLS: str = ""
+    REPLICA_RETRY_SECONDS: float = 10.0  # How long a replica that failed its connection check is skipped
+    READ_YOUR_WRITES_SECONDS: float = 5.0  # Reads go to the primary for this long after the caller's own write
+
+    METRICS_ENABLED: bool = True  # Serve Prometheus metrics at /metrics
+    HEALTH_TOKEN: str = ""  # Operator token for /api/health/* and /metrics (X-Health-Token header); empty disables those routes
+
+    # Cache of single-event and changelog responses (and their ACLs), per worker
+    EVENT_CACHE_SIZE: int = 4096  # Max entries; 0 disables
+    EVENT_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    EVENT_CACHE_TTL_SECONDS: float = 5.0  # Bounds staleness for changes made through other workers
+    EVENT_BATCH_READ_MAX_IDS: int = 500  # Max ids per GET /api/events/by-ids request
+    EVENT_HEATMAP_SOURCE: str = "events"  # "events" aggregates the events table; "rollup" reads owned events from event_day_rollups
+    EVENT_HEATMAP_MAX_DAYS: int = 1100  # Longest range per GET /api/events/heatmap request
+
+    # Monthly partitions of event_versions/changelog and archival of old ones
+    HISTORY_MAINTENANCE_SECONDS: float = 3600  # How often partitions are created/archived; 0 disables the job
+    HISTORY_PARTITION_MONTHS_AHEAD: int = 2  # Partitions created beyond the current month
+    HISTORY_RETENTION_MONTHS: int = 0  # Months kept in the database (incl. the current one); 0 keeps everything
+    HISTORY_ARCHIVE_DIR: str = "history_archive"  # Stand-in for object storage
+
+    # Compaction of bursts of small edits in event history (app/services/history_compaction.py)
+    HISTORY_COMPACTION_SECONDS: float = 0  # How often the history_compaction job runs; 0 disables it
+    HISTORY_COMPACTION_WINDOW_SECONDS: float = 600  # Consecutive versions by one user within this long of the first are merged
+    HISTORY_COMPACTION_MIN_AGE_SECONDS: float = 86400  # Younger versions are left alone, so recent edits can still be undone one by one
+    HISTORY_COMPACTION_BATCH_EVENTS: int = 100  # Events compacted per run, most merges first; one short transaction each
+
+    # Cost-weighted token buckets: per user on expensive endpoints, per client IP on /api/auth/*
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"  # "memory" (per worker) or "postgres" (shared by all workers)
+    RATE_LIMIT_USER_CAPACITY: float = 100  # Burst size, in cost units
+    RATE_LIMIT_USER_REFILL_PER_SECOND: float = 5
+    RATE_LIMIT_AUTH_CAPACITY: float = 30
+    RATE_LIMIT_AUTH_REFILL_PER_SECOND: float = 1
+    RATE_LIMIT_MAX_KEYS: int = 100000  # In-memory buckets per worker; least recently used are dropped first
+    RATE_LIMIT_PURGE_SECONDS: float = 600  # How often idle rows are deleted from rate_limit_buckets (postgres backend)
+
+    # Idempotency-Key support on event create/batch/share
+    IDEMPOTENCY_TTL_SECONDS: float = 86400  # How long a stored response is replayed to retries
+    IDEMPOTENCY_WAIT_SECONDS: float = 10  # How long a duplicate waits for the first request before getting 409
+    IDEMPOTENCY_STALE_SECONDS: float = 300  # A claim older than this (its request died) may be taken over
+    IDEMPOTENCY_PURGE_SECONDS: float = 3600  # How often expired keys are deleted; 0 disables
+
+    # ICS calendar feeds
+    ICS_CACHE_SIZE: int = 20000  # Rendered VEVENT blocks kept per worker, one per event; 0 disables
+    ICS_FEED_BATCH_SIZE: int = 500  # Rows fetched per round trip while streaming a feed
+
+    # In-process scheduler for maintenance jobs (app/core/scheduler.py)
+    SCHEDULER_ENABLED: bool = True
+    SCHEDULER_JITTER: float = 0.1  # Fraction of the interval by which each wait is randomly shortened/lengthened
+
+    # Response size: negotiated zstd/br/gzip above COMPRESSION_MIN_SIZE bytes, and
+    # optional omission of null/default fields from list responses
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    COMPRESSION_ZSTD_LEVEL: int = 3
+    RESPONSE_EXCLUDE_NONE: bool = False
+    RESPONSE_EXCLUDE_DEFAULTS: bool = False
+
+    # Per-request SQL accounting (Server-Timing header, per-route histograms at /api/health/queries)
+    QUERY_PROFILING_ENABLED: bool = False
+    QUERY_PROFILING_SLOWEST: int = 5  # Slowest statements kept per request for the slow-request log
+    SLOW_REQUEST_MS: int = 0  # Requests slower than this are logged with their slowest statements; 0 disables
+    SLOW_REQUEST_PROFILE_DIR: str = ""  # If set, slow requests also dump a sampled stack profile (.folded) here
+    PROFILE_SAMPLE_INTERVAL_MS: int = 5
 
 
 
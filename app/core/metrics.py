@@ -0,0 +1,156 @@
+# app/core/metrics.py
+"""
+Prometheus metrics served at /metrics.
+
+Each worker process keeps its own values. With several uvicorn/gunicorn workers,
+set PROMETHEUS_MULTIPROC_DIR (in the process environment, before start-up) to an
+empty directory: every worker then writes its samples to memory-mapped files
+there and /metrics aggregates the files of all workers.
+"""
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by route template; the _count series gives throughput",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "Requests currently being handled",
+    multiprocess_mode="livesum",
+)
+
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections",
+    "Connections currently checked out, by pool (primary, replica0, replica1, ...)",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled connection, by pool",
+    ["pool"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0),
+)
+DB_POOL_CHECKOUT_FAILURES = Counter(
+    "db_pool_checkout_failures_total",
+    "Pool timeouts and connection errors on checkout, by pool",
+    ["pool"],
+)
+
+PASSWORD_HASH_IN_FLIGHT = Gauge(
+    "password_hash_in_flight",
+    "bcrypt hash/verify calls running or waiting to run",
+    multiprocess_mode="livesum",
+)
+PASSWORD_HASH_QUEUED = Gauge(
+    "password_hash_queued",
+    "bcrypt hash/verify calls waiting for one of the PASSWORD_HASH_CONCURRENCY slots",
+    multiprocess_mode="livesum",
+)
+PASSWORD_HASH_DURATION = Histogram(
+    "password_hash_duration_seconds",
+    "Duration of bcrypt hash/verify calls",
+    ["operation"],
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.0),
+)
+
+TOKEN_VERIFICATIONS = Counter(
+    "token_verifications_total",
+    "Access token checks by outcome",
+    ["result"],
+)
+
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "In-process cache lookups by cache and outcome (hit/miss)",
+    ["cache", "result"],
+)
+
+RATE_LIMIT_REJECTIONS = Counter(
+    "rate_limit_rejections_total",
+    "Requests rejected with 429 by rate-limit policy",
+    ["policy"],
+)
+
+HISTORY_COMPACTED_ROWS = Counter(
+    "history_compacted_rows_total",
+    "event_versions/changelog rows deleted by history compaction",
+    ["table"],
+)
+HISTORY_COMPACTED_BYTES = Counter(
+    "history_compacted_bytes_total",
+    "Size of the rows deleted by history compaction (pg_column_size of the row)",
+    ["table"],
+)
+
+JOB_RUNS = Counter(
+    "scheduled_job_runs_total",
+    "Scheduled job runs by outcome (ok/error/skipped; skipped means another worker leads the job)",
+    ["job", "result"],
+)
+JOB_DURATION = Histogram(
+    "scheduled_job_duration_seconds",
+    "Duration of scheduled job runs",
+    ["job"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0),
+)
+JOBS_RUNNING = Gauge(
+    "scheduled_jobs_running",
+    "Scheduled jobs currently running",
+    multiprocess_mode="livesum",
+)
+
+
+def render_metrics() -> bytes:
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency and in-flight requests per route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            route = scope.get("route")
+            REQUEST_LATENCY.labels(
+                scope["method"], getattr(route, "path", "<unmatched>"), str(status_code)
+            ).observe(time.perf_counter() - started)
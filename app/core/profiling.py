@@ -0,0 +1,226 @@
+# app/core/profiling.py
+"""
+Per-request SQL accounting and an opt-in sampling profiler for slow requests.
+
+When QUERY_PROFILING_ENABLED is off, neither the SQLAlchemy hooks nor the
+middleware are installed, so there is no per-statement or per-request cost.
+"""
+import heapq
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RequestQueryStats:
+    __slots__ = ("count", "seconds", "slowest")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.slowest: List[Tuple[float, str]] = [] # min-heap of (duration, statement)
+
+    def record(self, duration: float, statement: str) -> None:
+        self.count += 1
+        self.seconds += duration
+        if len(self.slowest) < settings.QUERY_PROFILING_SLOWEST:
+            heapq.heappush(self.slowest, (duration, statement))
+        elif duration > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (duration, statement))
+
+
+_current_stats: ContextVar[Optional[RequestQueryStats]] = ContextVar("request_query_stats", default=None)
+
+
+# The start time lives on the statement's execution context, which is discarded
+# with it, so a statement that fails (no after hook) leaves nothing behind
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_query_started", None)
+    stats = _current_stats.get()
+    if stats is not None and started is not None:
+        stats.record(time.perf_counter() - started, statement)
+
+
+def install_query_hooks() -> None:
+    """Registers the cursor hooks on every Engine (primary and replicas)."""
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class RouteHistogram:
+    """Fixed-bucket histogram; the last bucket catches everything above the previous bound."""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.samples = 0
+
+    def observe(self, value: float) -> None:
+        self.samples += 1
+        self.total += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                return
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.samples,
+            "sum": round(self.total, 6),
+            "buckets": {
+                ("+Inf" if bound == float("inf") else str(bound)): count
+                for bound, count in zip(self.buckets, self.counts)
+            },
+        }
+
+
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, float("inf"))
+DB_SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, float("inf"))
+
+
+class QueryProfileRegistry:
+    """Per-route-template histograms of statement count and DB time."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: Dict[str, Tuple[RouteHistogram, RouteHistogram]] = {}
+
+    def observe(self, route: str, stats: RequestQueryStats) -> None:
+        with self._lock:
+            histograms = self._routes.get(route)
+            if histograms is None:
+                histograms = (RouteHistogram(QUERY_COUNT_BUCKETS), RouteHistogram(DB_SECONDS_BUCKETS))
+                self._routes[route] = histograms
+            histograms[0].observe(stats.count)
+            histograms[1].observe(stats.seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                route: {"statements": counts.snapshot(), "db_seconds": seconds.snapshot()}
+                for route, (counts, seconds) in sorted(self._routes.items())
+            }
+
+
+query_profile_registry = QueryProfileRegistry()
+
+
+class StackSampler:
+    """
+    Samples the stack of one thread at a fixed interval and aggregates the samples
+    as collapsed stacks (the input format of flamegraph tools). Async handlers all
+    run on the event loop thread, so concurrent requests show up in each other's
+    samples.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self) -> "StackSampler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path: str) -> None:
+        with open(path, "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class QueryProfilingMiddleware:
+    """
+    ASGI middleware that counts the SQL statements and DB time of each request,
+    reports them in a Server-Timing header, feeds the per-route histograms and
+    logs (and optionally profiles) slow requests.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        install_query_hooks()
+        self.slow_seconds = settings.SLOW_REQUEST_MS / 1000 if settings.SLOW_REQUEST_MS > 0 else None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestQueryStats()
+        token = _current_stats.set(stats)
+        started = time.perf_counter()
+        sampler = None
+        if self.slow_seconds is not None and settings.SLOW_REQUEST_PROFILE_DIR:
+            sampler = StackSampler(threading.get_ident(), settings.PROFILE_SAMPLE_INTERVAL_MS / 1000).start()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                headers = list(message.get("headers", []))
+                headers.append((
+                    b"server-timing",
+                    f'db;dur={stats.seconds * 1000:.2f};desc="{stats.count} queries", app;dur={elapsed_ms:.2f}'.encode()
+                ))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_stats.reset(token)
+            elapsed = time.perf_counter() - started
+            if sampler:
+                sampler.stop()
+            route = scope.get("route")
+            query_profile_registry.observe(getattr(route, "path", "<unmatched>"), stats)
+            if self.slow_seconds is not None and elapsed >= self.slow_seconds:
+                self._report_slow(scope, stats, elapsed, sampler)
+
+    @staticmethod
+    def _report_slow(scope, stats: RequestQueryStats, elapsed: float, sampler: Optional[StackSampler]) -> None:
+        slowest = sorted(stats.slowest, reverse=True)
+        logger.warning(
+            "Slow request %s %s: %.1fms, %d statements, %.1fms in DB; slowest: %s",
+            scope["method"], scope["path"], elapsed * 1000, stats.count, stats.seconds * 1000,
+            [(round(d * 1000, 2), s[:200]) for d, s in slowest]
+        )
+        if sampler and sampler.samples:
+            os.makedirs(settings.SLOW_REQUEST_PROFILE_DIR, exist_ok=True)
+            path = os.path.join(
+                settings.SLOW_REQUEST_PROFILE_DIR,
+                f"{int(time.time() * 1000)}-{scope['method']}-{scope['path'].strip('/').replace('/', '_') or 'root'}.folded"
+            )
+            sampler.dump(path)
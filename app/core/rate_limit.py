@@ -0,0 +1,141 @@
+# app/core/rate_limit.py
+"""
+Cost-weighted token-bucket rate limiting.
+
+- A bucket holds up to `capacity` tokens and refills at `rate` tokens per second.
+  Each request spends its cost; if the bucket holds less, the request is rejected
+  and told how long until it would not be (the Retry-After header).
+- The "user" policy limits authenticated endpoints per user and the "auth" policy
+  limits /api/auth/* per client IP (see the dependencies in app/api/deps.py).
+- The memory backend keeps one (tokens, timestamp) pair per active key in each
+  worker. A bucket that has been idle long enough to refill completely is the
+  same as a missing one, so those are dropped, and the least recently used keys
+  go first once there are more than RATE_LIMIT_MAX_KEYS.
+- RATE_LIMIT_BACKEND=postgres shares the buckets across workers through the
+  UNLOGGED rate_limit_buckets table, at one round trip per limited request.
+"""
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, NamedTuple, Tuple
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.metrics import RATE_LIMIT_REJECTIONS
+
+
+class RateLimitPolicy(NamedTuple):
+    name: str
+    capacity: float
+    rate: float # Tokens added per second
+
+    @property
+    def refill_seconds(self) -> float:
+        """Time for an empty bucket to fill up again."""
+        return self.capacity / self.rate
+
+
+POLICIES: Dict[str, RateLimitPolicy] = {
+    "user": RateLimitPolicy("user", settings.RATE_LIMIT_USER_CAPACITY, settings.RATE_LIMIT_USER_REFILL_PER_SECOND),
+    "auth": RateLimitPolicy("auth", settings.RATE_LIMIT_AUTH_CAPACITY, settings.RATE_LIMIT_AUTH_REFILL_PER_SECOND),
+}
+
+
+class MemoryBuckets:
+    """Per-worker buckets in an LRU-ordered dict."""
+
+    blocking = False
+
+    def __init__(self, max_keys: int = settings.RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        # key -> (tokens, updated_at, full_at), in least recently used order
+        self._buckets: "OrderedDict[str, Tuple[float, float, float]]" = OrderedDict()
+        self._lock = Lock()
+
+    def spend(self, key: str, cost: float, policy: RateLimitPolicy) -> float:
+        """Spends cost tokens; returns 0.0 if allowed, otherwise the seconds to wait."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._buckets.pop(key, None)
+            if entry is None:
+                tokens = policy.capacity
+            else:
+                tokens = min(policy.capacity, entry[0] + (now - entry[1]) * policy.rate)
+            if tokens >= cost:
+                tokens -= cost
+                wait = 0.0
+            else:
+                wait = (cost - tokens) / policy.rate
+            self._buckets[key] = (tokens, now, now + (policy.capacity - tokens) / policy.rate)
+            # The oldest entries are the most likely to have refilled; stop at the first one that has not
+            while self._buckets:
+                oldest_key, (_, _, full_at) = next(iter(self._buckets.items()))
+                if full_at > now and len(self._buckets) <= self.max_keys:
+                    break
+                del self._buckets[oldest_key]
+        return wait
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+# Refill computed from the stored row; every reference is to the row as it was
+# before this statement, so the expression is repeated rather than reused
+_REFILLED = "least(:capacity, b.tokens + extract(epoch FROM statement_timestamp() - b.updated_at) * :rate)"
+
+
+class PostgresBuckets:
+    """Buckets shared by all workers; one atomic upsert per request."""
+
+    blocking = True
+
+    _spend = text(f"""
+        INSERT INTO rate_limit_buckets AS b (key, tokens, allowed, updated_at)
+        VALUES (:key, :capacity - :cost, true, statement_timestamp())
+        ON CONFLICT (key) DO UPDATE SET
+            allowed = {_REFILLED} >= :cost,
+            tokens = {_REFILLED} - CASE WHEN {_REFILLED} >= :cost THEN :cost ELSE 0 END,
+            updated_at = statement_timestamp()
+        RETURNING allowed, tokens
+    """)
+
+    def spend(self, key: str, cost: float, policy: RateLimitPolicy) -> float:
+        from app.db.database import get_engine
+
+        with get_engine().begin() as connection:
+            allowed, tokens = connection.execute(
+                self._spend, {"key": key, "cost": cost, "capacity": policy.capacity, "rate": policy.rate}
+            ).one()
+        return 0.0 if allowed else (cost - tokens) / policy.rate
+
+    def purge_idle(self) -> int:
+        """Deletes buckets idle long enough to be full again; returns how many."""
+        from app.db.database import get_engine
+
+        idle_seconds = max(policy.refill_seconds for policy in POLICIES.values())
+        with get_engine().begin() as connection:
+            return connection.execute(
+                text("DELETE FROM rate_limit_buckets WHERE updated_at < statement_timestamp() - make_interval(secs => :idle)"),
+                {"idle": idle_seconds}
+            ).rowcount
+
+
+class RateLimiter:
+    def __init__(self, backend):
+        self.backend = backend
+
+    def check(self, policy_name: str, key: str, cost: float = 1.0) -> float:
+        """
+        Charges cost to the policy's bucket for key. Returns 0.0 if the request may
+        proceed, otherwise the seconds until it could (for Retry-After).
+        """
+        policy = POLICIES[policy_name]
+        # A cost above the capacity could never be paid; charge a full bucket instead
+        wait = self.backend.spend(f"{policy.name}:{key}", min(cost, policy.capacity), policy)
+        if wait > 0:
+            RATE_LIMIT_REJECTIONS.labels(policy.name).inc()
+        return wait
+
+
+rate_limiter = RateLimiter(PostgresBuckets() if settings.RATE_LIMIT_BACKEND == "postgres" else MemoryBuckets())
@@ -0,0 +1,278 @@
+# app/core/scheduler.py
+"""
+In-process scheduler for periodic and deferred maintenance jobs.
+
+- Jobs run in worker threads (asyncio.to_thread), never on the event loop, so
+  they do not hold up request handling.
+- Each wait between runs of a periodic job is randomly lengthened or shortened by
+  up to SCHEDULER_JITTER of the interval, and the first run is delayed by a random
+  fraction of the jittered interval, so workers started together spread their runs.
+- A leader_only job runs in one process only: the one holding the job's Postgres
+  advisory lock. The locks are session-level and live on one dedicated
+  connection, so when the leader exits they are released and another worker
+  takes the job over on its next tick.
+- Runs and latency are exported as scheduled_job_runs_total and
+  scheduled_job_duration_seconds; GET /api/health/jobs shows this worker's view.
+"""
+import asyncio
+import hashlib
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Set
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.pool import NullPool
+
+from app.core.config import settings
+from app.core.metrics import JOB_DURATION, JOB_RUNS, JOBS_RUNNING
+
+logger = logging.getLogger(__name__)
+
+
+def job_lock_key(name: str) -> int:
+    """Stable signed 64-bit advisory lock key for a job name."""
+    return int.from_bytes(hashlib.sha256(f"job:{name}".encode()).digest()[:8], "big", signed=True)
+
+
+class LeaderLocks:
+    """Session-level advisory locks held on one connection outside the pool."""
+
+    def __init__(self, engine_factory: Callable[[], Engine]):
+        self._engine_factory = engine_factory
+        self._engine: Optional[Engine] = None
+        self._connection: Optional[Connection] = None
+        self._held: Set[int] = set()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, key: int) -> bool:
+        """True if this process holds (or has just taken) the lock for key."""
+        with self._lock:
+            try:
+                if self._connection is None:
+                    if self._engine is None:
+                        self._engine = self._engine_factory()
+                    self._connection = self._engine.connect()
+                if key in self._held:
+                    # The locks vanish with the connection; make sure it is still alive
+                    self._connection.execute(text("SELECT 1"))
+                    self._connection.commit()
+                    return True
+                acquired = self._connection.execute(
+                    text("SELECT pg_try_advisory_lock(:key)"), {"key": key}
+                ).scalar()
+                self._connection.commit()
+            except Exception:
+                logger.exception("Leader lock connection failed; dropping held locks")
+                self._discard_connection()
+                return False
+            if acquired:
+                self._held.add(key)
+            return bool(acquired)
+
+    def _discard_connection(self) -> None:
+        self._held.clear()
+        if self._connection is not None:
+            try:
+                self._connection.invalidate()
+                self._connection.close()
+            except Exception:
+                pass
+            self._connection = None
+
+    def release_all(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                try:
+                    self._connection.execute(text("SELECT pg_advisory_unlock_all()"))
+                    self._connection.commit()
+                    self._connection.close()
+                except Exception:
+                    pass
+                self._connection = None
+            self._held.clear()
+            if self._engine is not None:
+                self._engine.dispose()
+                self._engine = None
+
+
+class Job:
+    __slots__ = (
+        "name", "func", "interval", "leader_only", "initial_delay", "lock_key",
+        "runs", "failures", "skipped", "last_started_at", "last_duration", "last_error", "last_result", "next_run_at"
+    )
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[], Any],
+        interval: Optional[float],
+        leader_only: bool,
+        initial_delay: Optional[float]
+    ):
+        self.name = name
+        self.func = func
+        self.interval = interval # None for deferred (one-off) jobs
+        self.leader_only = leader_only
+        self.initial_delay = initial_delay
+        self.lock_key = job_lock_key(name)
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.last_started_at: Optional[float] = None # Unix time
+        self.last_duration: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.last_result: Any = None # What func returned last, e.g. rows purged
+        self.next_run_at: Optional[float] = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "interval_seconds": self.interval,
+            "leader_only": self.leader_only,
+            "runs": self.runs,
+            "failures": self.failures,
+            "skipped": self.skipped,
+            "last_started_at": self.last_started_at,
+            "last_duration_seconds": round(self.last_duration, 6) if self.last_duration is not None else None,
+            "last_error": self.last_error,
+            "last_result": self.last_result,
+            "next_run_at": self.next_run_at,
+        }
+
+
+class JobScheduler:
+    """
+    Runs registered jobs from asyncio tasks once start() has been called (from the
+    app lifespan). Jobs registered after start() are scheduled immediately.
+    """
+
+    def __init__(self, leader_locks: LeaderLocks, jitter: float = settings.SCHEDULER_JITTER):
+        self.leader_locks = leader_locks
+        self.jitter = jitter
+        self.jobs: Dict[str, Job] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._stopping: Optional[asyncio.Event] = None
+        self._started = False
+
+    def every(
+        self,
+        name: str,
+        interval: float,
+        func: Callable[[], Any],
+        leader_only: bool = True,
+        initial_delay: Optional[float] = None
+    ) -> Job:
+        """
+        Registers func to run every interval seconds (with jitter). initial_delay
+        overrides the random delay before the first run, e.g. 0 to run at start-up.
+        """
+        job = Job(name, func, interval, leader_only, initial_delay)
+        self._register(job)
+        return job
+
+    def defer(self, name: str, func: Callable[[], Any], delay: float = 0.0, leader_only: bool = False) -> Job:
+        """Runs func once, delay seconds from now (or from start() if not started yet)."""
+        job = Job(name, func, None, leader_only, delay)
+        self._register(job)
+        return job
+
+    def _register(self, job: Job) -> None:
+        if job.name in self.jobs:
+            raise ValueError(f"Job {job.name!r} is already registered")
+        self.jobs[job.name] = job
+        if self._started:
+            self._spawn(job)
+
+    def _jittered(self, seconds: float) -> float:
+        return max(0.0, seconds * (1 + random.uniform(-self.jitter, self.jitter)))
+
+    def _execute(self, job: Job) -> None:
+        """Runs in a worker thread."""
+        if job.leader_only and not self.leader_locks.try_acquire(job.lock_key):
+            job.skipped += 1
+            JOB_RUNS.labels(job.name, "skipped").inc()
+            return
+        job.last_started_at = time.time()
+        started = time.perf_counter()
+        JOBS_RUNNING.inc()
+        try:
+            job.last_result = job.func()
+            result = "ok"
+            job.last_error = None
+        except Exception as exc:
+            logger.exception("Scheduled job %s failed", job.name)
+            result = "error"
+            job.failures += 1
+            job.last_error = repr(exc)
+        finally:
+            JOBS_RUNNING.dec()
+        job.last_duration = time.perf_counter() - started
+        job.runs += 1
+        JOB_DURATION.labels(job.name).observe(job.last_duration)
+        JOB_RUNS.labels(job.name, result).inc()
+
+    async def _sleep(self, seconds: float) -> bool:
+        """Waits up to seconds; returns False if the scheduler is stopping."""
+        try:
+            await asyncio.wait_for(self._stopping.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            return True
+        return False
+
+    async def _run(self, job: Job) -> None:
+        if job.initial_delay is not None:
+            delay = job.initial_delay
+        else:
+            delay = random.uniform(0, self._jittered(job.interval))
+        while True:
+            job.next_run_at = time.time() + delay
+            if not await self._sleep(delay):
+                return
+            job.next_run_at = None
+            await asyncio.to_thread(self._execute, job)
+            if job.interval is None:
+                self.jobs.pop(job.name, None)
+                return
+            delay = self._jittered(job.interval)
+
+    def _spawn(self, job: Job) -> None:
+        task = asyncio.create_task(self._run(job), name=f"job:{job.name}")
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def start(self) -> None:
+        self._stopping = asyncio.Event()
+        self._started = True
+        for job in list(self.jobs.values()):
+            self._spawn(job)
+
+    async def stop(self) -> None:
+        """
+        Lets running jobs finish, drops pending runs and releases the leader locks.
+        Jobs are unregistered, so a later lifespan can register them again.
+        """
+        if not self._started:
+            return
+        self._stopping.set()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._started = False
+        self.jobs.clear()
+        await asyncio.to_thread(self.leader_locks.release_all)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {name: job.snapshot() for name, job in sorted(self.jobs.items())}
+
+
+def _leader_engine() -> Engine:
+    from app.db.database import connect_args_for
+
+    # Outside the pool: the connection is held for the life of the process
+    return create_engine(
+        settings.DATABASE_URL, poolclass=NullPool, connect_args=connect_args_for(settings.DATABASE_URL)
+    )
+
+
+scheduler = JobScheduler(LeaderLocks(_leader_engine))
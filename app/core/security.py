@@ -1,23 +1,81 @@
 # app/core/security.py
-from passlib.context import CryptContext
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from threading import Lock
 from datetime import datetime, timedelta, timezone
-from typing import Optional, Dict, Any # Added Dict, Any for type hints
-from jose import JWTError, jwt
-from sqlalchemy import text
-from app.db.database import SessionLocal
+from typing import TYPE_CHECKING, Callable, Optional, Dict, Any, Tuple, TypeVar, Union # Added Dict, Any for type hints
+from jose import ExpiredSignatureError, JWTError, jwt
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from app.models.token import RevokedToken
 from hashlib import sha256
 # Import your actual settings from app.core.config
 from app.core.config import settings
+from app.core.metrics import CACHE_REQUESTS, PASSWORD_HASH_DURATION, PASSWORD_HASH_IN_FLIGHT, PASSWORD_HASH_QUEUED
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+try:
+    # PyJWT performs the same signature and claim checks as python-jose at a
+    # fraction of the cost, so it is used for decoding whenever it is installed
+    import jwt as pyjwt
+except ImportError:
+    pyjwt = None
+
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
+
+# passlib and its bcrypt backend are loaded on first use (the app lifespan does it
+# at start-up) instead of when this module is imported
+_pwd_context: Optional["CryptContext"] = None
+_pwd_context_lock = Lock()
+
+def get_pwd_context() -> "CryptContext":
+    global _pwd_context
+    if _pwd_context is None:
+        with _pwd_context_lock:
+            if _pwd_context is None:
+                from passlib.context import CryptContext
+
+                context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+                context.handler("bcrypt").get_backend()
+                _pwd_context = context
+    return _pwd_context
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a plain password against the hashed password."""
-    return pwd_context.verify(plain_password, hashed_password)
+    """Verify a plain password against the hashed password (blocks for the bcrypt cost)."""
+    with PASSWORD_HASH_DURATION.labels("verify").time():
+        return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    """Hash a password for storing."""
-    return pwd_context.hash(password)
+    """Hash a password for storing (blocks for the bcrypt cost)."""
+    with PASSWORD_HASH_DURATION.labels("hash").time():
+        return get_pwd_context().hash(password)
+
+# Request handlers run bcrypt in the threadpool, at most PASSWORD_HASH_CONCURRENCY calls
+# per worker at a time; further calls wait at this semaphore (PASSWORD_HASH_QUEUED)
+_password_hash_slots = asyncio.Semaphore(max(settings.PASSWORD_HASH_CONCURRENCY, 1))
+
+_T = TypeVar("_T")
+
+async def _run_password_hash(func: Callable[..., _T], *args: Any) -> _T:
+    with PASSWORD_HASH_IN_FLIGHT.track_inprogress():
+        with PASSWORD_HASH_QUEUED.track_inprogress():
+            await _password_hash_slots.acquire()
+        try:
+            return await run_in_threadpool(func, *args)
+        finally:
+            _password_hash_slots.release()
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password off the event loop."""
+    return await _run_password_hash(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash off the event loop."""
+    return await _run_password_hash(get_password_hash, password)
 
 # In app/core/security.py
 
@@ -27,44 +85,140 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
         expire = datetime.now(timezone.utc) + expires_delta
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
+def create_refresh_token(
+    data: dict,
+    expires_delta: Optional[timedelta] = None,
+    family_id: Optional[str] = None,
+    expires_at: Optional[Union[datetime, int]] = None
+) -> str:
+    """
+    Refresh tokens belong to a family (`fam`) started at login. Rotation passes the
+    family and its exp along, so a family never outlives the original login.
+    """
     to_encode = data.copy()
-    if expires_delta:
+    if expires_at is not None:
+        expire = expires_at
+    elif expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
     else:
         expire = datetime.now(timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)  # e.g., 30 days
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex, "fam": family_id or uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, settings.REFRESH_TOKEN_SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-def add_to_blacklist(token: str):
-    token_hash = sha256(token.encode()).hexdigest()
-    with SessionLocal() as db:
-        db.execute(
-            text("INSERT INTO token_blacklist (token_hash, created_at) VALUES (:token_hash, NOW())"),
-            {"token_hash": token_hash}
-        )
-        db.commit()
-
-def is_token_blacklisted(token: str) -> bool:
-    token_hash = sha256(token.encode()).hexdigest()
-    with SessionLocal() as db:
-        result = db.execute(
-            text("SELECT 1 FROM token_blacklist WHERE token_hash = :token_hash"),
-            {"token_hash": token_hash}
-        ).fetchone()
-        return result is not None
-
-def cleanup_blacklist(days: int = 7):
-    with SessionLocal() as db:
-        db.execute(
-            text("DELETE FROM token_blacklist WHERE created_at < NOW() - INTERVAL :days DAY"),
-            {"days": days}
-        )
-        db.commit()
+def decode_token(token: str, key: str) -> Dict[str, Any]:
+    """
+    Verifies a token and returns its claims. Raises python-jose's JWTError
+    (ExpiredSignatureError when expired) whichever backend does the work.
+    """
+    if pyjwt is None:
+        return jwt.decode(token, key, algorithms=[settings.ALGORITHM])
+    try:
+        return pyjwt.decode(token, key, algorithms=[settings.ALGORITHM])
+    except pyjwt.ExpiredSignatureError as exc:
+        raise ExpiredSignatureError(str(exc))
+    except pyjwt.InvalidTokenError as exc:
+        raise JWTError(str(exc))
+
+
+class TokenClaimsCache:
+    """
+    Bounded LRU of verified access tokens, keyed by the token's SHA-256 digest.
+    A hit skips signature and claim verification but still honors `exp`.
+    Revocation is not cached: callers check revoked_tokens with is_token_revoked
+    on every request.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[bytes, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._lock = Lock()
+
+    def decode(self, token: str) -> Dict[str, Any]:
+        if self.maxsize <= 0:
+            return decode_token(token, settings.SECRET_KEY)
+        key = sha256(token.encode()).digest()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is not None:
+            claims, expires_at = entry
+            if expires_at > time.time():
+                CACHE_REQUESTS.labels("token", "hit").inc()
+                return claims
+            with self._lock:
+                self._entries.pop(key, None)
+            raise ExpiredSignatureError("Signature has expired.")
+
+        CACHE_REQUESTS.labels("token", "miss").inc()
+        claims = decode_token(token, settings.SECRET_KEY)
+        expires_at = claims.get("exp")
+        if isinstance(expires_at, (int, float)): # Tokens without exp are verified every time
+            with self._lock:
+                self._entries[key] = (claims, expires_at)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return claims
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+token_claims_cache = TokenClaimsCache(maxsize=settings.TOKEN_CACHE_SIZE)
+
+def decode_access_token(token: str) -> Dict[str, Any]:
+    return token_claims_cache.decode(token)
+
+# Revocation index. The helpers take the caller's session so a request never holds a second
+# connection, and leave committing to the caller.
+
+def token_revocation_id(token: str, claims: Dict[str, Any]) -> str:
+    """The key a token is revoked under: its jti, or a digest for tokens issued without one."""
+    return claims.get("jti") or sha256(token.encode()).hexdigest()
+
+def family_revocation_id(family_id: str) -> str:
+    return f"family:{family_id}"
+
+def revoke_token(db: Session, token_id: str, expires_at: Union[datetime, int, float]) -> bool:
+    """
+    Records a revocation that lapses together with the token at expires_at.
+    Returns False if token_id was already revoked.
+    """
+    if not isinstance(expires_at, datetime):
+        expires_at = datetime.fromtimestamp(expires_at, tz=timezone.utc)
+    inserted = db.execute(
+        pg_insert(RevokedToken)
+        .values(token_id=token_id, expires_at=expires_at)
+        .on_conflict_do_nothing(index_elements=[RevokedToken.token_id])
+        .returning(RevokedToken.token_id)
+    ).first()
+    return inserted is not None
 
+def is_token_revoked(db: Session, *token_ids: str) -> bool:
+    """Primary-key lookup of one or more revocation ids (token jti, family)."""
+    return db.execute(
+        select(RevokedToken.token_id).where(RevokedToken.token_id.in_(token_ids)).limit(1)
+    ).first() is not None
 
+def purge_expired_revocations(db: Session, batch_size: int = 10000) -> int:
+    """Deletes up to batch_size revocations whose tokens have expired anyway."""
+    expired = (
+        select(RevokedToken.token_id)
+        .where(RevokedToken.expires_at < datetime.now(timezone.utc))
+        .limit(batch_size)
+        .scalar_subquery()
+    )
+    result = db.execute(
+        delete(RevokedToken).where(RevokedToken.token_id.in_(expired)).execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
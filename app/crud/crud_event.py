@@ -1,43 +1,81 @@
 # app/crud/crud_event.py
 
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_
-from typing import Optional, List, Dict, Any
-from datetime import datetime
-from dateutil import parser # For parsing ISO datetime strings back to datetime objects
+from sqlalchemy.orm import Session, aliased, joinedload
+from sqlalchemy import BigInteger, and_, cast, delete, exists, func, insert, lambda_stmt, literal, literal_column, or_, select, union_all, update
+from typing import Optional, List, Dict, Any, FrozenSet, Tuple
+from datetime import date, datetime, time, timedelta, timezone
 
-from app.models.event import Event
+from app.models.event import Event, SEARCH_TEXT_CONFIG
+from app.models.event_rollup import EventDayRollup
 from app.models.permission import EventPermission
 from app.models.version import EventVersion
 from app.models.changelog import Changelog
 from app.models.user import User, Role
-from app.schemas.event import EventCreate, EventUpdate, EventResponse # For EventResponse.model_fields
-
-def model_to_dict(obj) -> Dict[str, Any]:
-    """Convert SQLAlchemy model to dict with datetime ISO formatting."""
-    result = {}
-    for c in obj.__table__.columns:
-        value = getattr(obj, c.key)
-        if isinstance(value, datetime):
-            result[c.key] = value.isoformat()
-        else:
-            result[c.key] = value
-    return result
+from app.schemas.event import EventCreate, EventUpdate, EventBulkFilter
+from app.schemas.permission import EventPermissionDetail
+from app.services.diff_service import diff_cache, diff_snapshots
+from app.services.event_cache import event_read_cache
+from app.services.event_snapshot import event_snapshot_codec
+from app.services import history_archive
+from app.services.history_outbox import (
+    enqueue_history, enqueue_history_many, lock_event_history, materialize_pending_history
+)
+from app.core.config import settings
+
+# Hot-path lookups are lambda statements: SQLAlchemy builds and compiles each one
+# once, and later calls only extract the new bound values from the closure. The SQL
+# text is therefore identical on every call, which also lets psycopg 3 reuse its
+# server-side prepared statement (see DB_PREPARE_THRESHOLD).
+
+# Rendered inline rather than bound, so the text search config is a regconfig constant
+_SEARCH_CONFIG = literal_column(f"'{SEARCH_TEXT_CONFIG}'::regconfig")
 
 def get_event_with_permission(db: Session, event_id: int, user_id: int) -> Optional[Event]:
     """Get event if user has access (owner, editor, or viewer)"""
-    event = db.query(Event).filter(Event.id == event_id).first()
-    if not event:
+    stmt = lambda_stmt(lambda: select(Event).where(
+        Event.id == event_id,
+        or_(
+            Event.owner_id == user_id,
+            exists().where(EventPermission.event_id == Event.id, EventPermission.user_id == user_id)
+        )
+    ))
+    return db.execute(stmt).scalars().first()
+
+def get_events_by_ids_with_permission(db: Session, event_ids: List[int], user_id: int) -> Dict[int, Event]:
+    """
+    The requested events the user can read, keyed by id, in one query; ids that
+    do not exist or are not visible to the user are simply missing.
+    """
+    unique_ids = list(dict.fromkeys(event_ids))
+    stmt = lambda_stmt(lambda: select(Event).where(
+        Event.id.in_(unique_ids),
+        or_(
+            Event.owner_id == user_id,
+            exists().where(EventPermission.event_id == Event.id, EventPermission.user_id == user_id)
+        )
+    ))
+    return {event.id: event for event in db.execute(stmt).scalars()}
+
+def get_event(db: Session, event_id: int) -> Optional[Event]:
+    stmt = lambda_stmt(lambda: select(Event).where(Event.id == event_id))
+    return db.execute(stmt).scalars().first()
+
+def get_event_acl(db: Session, event_id: int) -> Optional[FrozenSet[int]]:
+    """
+    IDs of the users who may read the event (owner and everyone it is shared
+    with), loaded in one query; None if the event does not exist.
+    """
+    stmt = lambda_stmt(lambda: (
+        select(Event.owner_id, func.array_agg(EventPermission.user_id))
+        .outerjoin(EventPermission, EventPermission.event_id == Event.id)
+        .where(Event.id == event_id)
+        .group_by(Event.id)
+    ))
+    row = db.execute(stmt).first()
+    if row is None:
         return None
-    if event.owner_id == user_id:
-        return event
-    permission = db.query(EventPermission).filter(
-        EventPermission.event_id == event_id,
-        EventPermission.user_id == user_id
-    ).first()
-    if permission:
-        return event
-    return None
+    owner_id, shared_user_ids = row
+    return frozenset([owner_id, *(uid for uid in shared_user_ids if uid is not None)])
 
 def get_events_with_permission(
     db: Session,
@@ -48,45 +86,137 @@ def get_events_with_permission(
     owner_id: Optional[int] = None,
     start_time_after: Optional[datetime] = None,
     start_time_before: Optional[datetime] = None,
-    sort_by: Optional[str] = None
+    sort_by: Optional[str] = None,
+    search: Optional[str] = None
 ) -> Dict[str, Any]:
-    """Get events the user has access to, with pagination, filtering, and sorting"""
-    permission_subquery = db.query(EventPermission.event_id).filter(
-        EventPermission.user_id == user_id
-    ).subquery()
-    
-    query = db.query(Event).filter(
-        (Event.owner_id == user_id) | (Event.id.in_(permission_subquery))
-    )
+    """
+    Get events the user has access to, with pagination, filtering, and sorting.
+    `search` runs a full-text query over title, description and location using the
+    GIN-indexed search_vector column; results are ranked unless sort_by is given.
+    """
+    # Each optional filter is its own lambda, so every combination of filters gets
+    # its own cached statement
+    stmt = lambda_stmt(lambda: select(Event).where(or_(
+        Event.owner_id == user_id,
+        Event.id.in_(select(EventPermission.event_id).where(EventPermission.user_id == user_id))
+    )))
 
     if title:
-        query = query.filter(Event.title.ilike(f"%{title}%"))
+        title_pattern = f"%{title}%"
+        stmt += lambda s: s.where(Event.title.ilike(title_pattern))
     if owner_id:
-        query = query.filter(Event.owner_id == owner_id)
+        stmt += lambda s: s.where(Event.owner_id == owner_id)
     if start_time_after:
-        query = query.filter(Event.start_time >= start_time_after)
+        stmt += lambda s: s.where(Event.start_time >= start_time_after)
     if start_time_before:
-        query = query.filter(Event.start_time <= start_time_before)
+        stmt += lambda s: s.where(Event.start_time <= start_time_before)
+    if search:
+        stmt += lambda s: s.where(Event.search_vector.op("@@")(func.websearch_to_tsquery(_SEARCH_CONFIG, search)))
+
+    total = db.execute(stmt + (lambda s: s.with_only_columns(func.count(Event.id)))).scalar_one()
 
     if sort_by:
         if sort_by == "title":
-            query = query.order_by(Event.title)
+            stmt += lambda s: s.order_by(Event.title)
         elif sort_by == "start_time":
-            query = query.order_by(Event.start_time)
+            stmt += lambda s: s.order_by(Event.start_time)
+    elif search:
+        stmt += lambda s: s.order_by(
+            func.ts_rank_cd(Event.search_vector, func.websearch_to_tsquery(_SEARCH_CONFIG, search)).desc(),
+            Event.id
+        )
+
+    stmt += lambda s: s.offset(skip).limit(limit)
+    events = db.execute(stmt).scalars().all()
 
-    total = query.count()
-    events = query.offset(skip).limit(limit).all()
-    
     return {"items": events, "total": total}
 
-def create_event(db: Session, event: EventCreate, owner_id: int) -> Event:
-    """Create a new event. The creator is the owner."""
+# Same expressions as the event_day_rollups triggers (app/services/event_rollup.py). Constants are
+# inlined, so the bucket expression in SELECT and GROUP BY is the same SQL text.
+_UTC_START = func.timezone(literal_column("'UTC'"), Event.start_time)
+_BUSY_MINUTES = func.greatest(
+    cast(func.round(func.extract("epoch", Event.end_time - Event.start_time) / 60), BigInteger), 0
+)
+
+def get_event_heatmap(
+    db: Session,
+    user_id: int,
+    start: date,
+    end: date,
+    bucket: str,
+    use_rollup: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Number and busy minutes of the events the user can read, per day, week or month
+    of their UTC start, for start days from start to end inclusive; one GROUP BY
+    query. With use_rollup the user's own events are summed from event_day_rollups
+    and only events shared with the user are aggregated from events.
+    """
+    unit = literal_column(f"'{bucket}'") # One of day/week/month, validated by the schema
+    in_range = and_(
+        Event.start_time >= datetime.combine(start, time.min, timezone.utc),
+        Event.start_time < datetime.combine(end + timedelta(days=1), time.min, timezone.utc)
+    )
+    shared_with_user = Event.id.in_(select(EventPermission.event_id).where(EventPermission.user_id == user_id))
+
+    if use_rollup:
+        owned = select(
+            func.date_trunc(unit, EventDayRollup.day).label("bucket"),
+            EventDayRollup.event_count.label("event_count"),
+            EventDayRollup.busy_minutes.label("busy_minutes")
+        ).where(EventDayRollup.owner_id == user_id, EventDayRollup.day.between(start, end))
+        shared = select(
+            func.date_trunc(unit, _UTC_START).label("bucket"),
+            literal(1).label("event_count"),
+            _BUSY_MINUTES.label("busy_minutes")
+        ).where(Event.owner_id != user_id, shared_with_user, in_range)
+        rows = union_all(owned, shared).subquery()
+        stmt = (
+            select(rows.c.bucket, func.sum(rows.c.event_count), func.sum(rows.c.busy_minutes))
+            .group_by(rows.c.bucket)
+            .having(func.sum(rows.c.event_count) > 0)
+            .order_by(rows.c.bucket)
+        )
+    else:
+        bucket_start = func.date_trunc(unit, _UTC_START)
+        stmt = (
+            select(bucket_start, func.count(Event.id), func.sum(_BUSY_MINUTES))
+            .where(or_(Event.owner_id == user_id, shared_with_user), in_range)
+            .group_by(bucket_start)
+            .order_by(bucket_start)
+        )
+
+    return [
+        {"start": first_day.date(), "count": int(count), "busy_minutes": int(busy_minutes or 0)}
+        for first_day, count, busy_minutes in db.execute(stmt)
+    ]
+
+def create_event(db: Session, event: EventCreate, owner_id: int, commit: bool = True) -> Event:
+    """
+    Create a new event. The creator is the owner. With commit=False it is only
+    flushed, for callers that commit more in the same transaction.
+    """
     db_event = Event(**event.model_dump(), owner_id=owner_id)
     db.add(db_event)
-    db.commit()
+    if commit:
+        db.commit()
+    else:
+        db.flush()
     db.refresh(db_event)
     return db_event
 
+def _changes_for_update(db_event: Event, update_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Field-level old/new values that update_data would change on db_event."""
+    changes = {}
+    for key, value in update_data.items():
+        old_value = getattr(db_event, key)
+        if old_value != value:
+            changes[key] = {
+                "old": old_value.isoformat() if isinstance(old_value, datetime) else old_value,
+                "new": value.isoformat() if isinstance(value, datetime) else value
+            }
+    return changes
+
 def update_event(
     db: Session,
     event_id: int,
@@ -94,48 +224,48 @@ def update_event(
     user_id: int
 ) -> Optional[Event]:
     """Update an event, create a version and changelog entry."""
-    db_event = db.query(Event).filter(Event.id == event_id).first()
+    # The snapshot and changes (and, without write-behind, the version number) are
+    # computed under the event's row lock, against the last committed update
+    db_event = db.query(Event).filter(Event.id == event_id).with_for_update().first()
     if not db_event:
         return None
 
-    version_number = db.query(EventVersion).filter(
-        EventVersion.event_id == event_id
-    ).count() + 1
+    version_data = event_snapshot_codec.encode(db_event) # Current state before update
 
-    version_data = model_to_dict(db_event) # Current state before update
-    version = EventVersion(
-        event_id=event_id,
-        version_number=version_number,
-        data=version_data,
-        changed_by_user_id=user_id,
-        timestamp=datetime.utcnow()
-    )
-    db.add(version)
-    db.flush() # Ensure version.id is available for changelog
-
-    changes = {}
     update_data = event.model_dump(exclude_unset=True)
-    for key, value in update_data.items():
-        old_value = getattr(db_event, key)
-        if old_value != value:
-            changes[key] = {
-                "old": old_value.isoformat() if isinstance(old_value, datetime) else old_value,
-                "new": value.isoformat() if isinstance(value, datetime) else value
-            }
-    if changes:
-        changelog = Changelog(
+    changes = _changes_for_update(db_event, update_data)
+
+    if settings.HISTORY_WRITE_BEHIND:
+        # Version and changelog rows are materialized later by the outbox worker
+        enqueue_history(db, event_id, user_id, version_data, changes)
+    else:
+        version_number = db.execute(select(_latest_version_number_subquery(event_id))).scalar() + 1
+
+        version = EventVersion(
             event_id=event_id,
-            version_id=version.id, # version.id should now be populated
-            user_id=user_id,
-            timestamp=datetime.utcnow(),
-            changes=changes
+            version_number=version_number,
+            data=version_data,
+            changed_by_user_id=user_id,
+            timestamp=datetime.utcnow()
         )
-        db.add(changelog)
+        db.add(version)
+        db.flush() # Ensure version.id is available for changelog
+
+        if changes:
+            changelog = Changelog(
+                event_id=event_id,
+                version_id=version.id, # version.id should now be populated
+                user_id=user_id,
+                timestamp=datetime.utcnow(),
+                changes=changes
+            )
+            db.add(changelog)
 
     for key, value in update_data.items():
         setattr(db_event, key, value)
     db.add(db_event)
     db.commit()
+    event_read_cache.invalidate(event_id)
     db.refresh(db_event)
     return db_event
 
@@ -148,43 +278,209 @@ def delete_event(db: Session, event_id: int, user_id: int) -> Optional[Event]:
         return None 
     db.delete(db_event)
     db.commit()
+    event_read_cache.invalidate(event_id)
     return db_event
 
-def create_events_batch(db: Session, events: List[EventCreate], owner_id: int) -> List[Event]:
-    """Create multiple events in a single transaction."""
+def _owned_events_query(
+    db: Session,
+    user_id: int,
+    event_ids: Optional[List[int]] = None,
+    filters: Optional[EventBulkFilter] = None
+):
+    query = db.query(Event).filter(Event.owner_id == user_id)
+    if event_ids is not None:
+        query = query.filter(Event.id.in_(event_ids))
+    if filters:
+        if filters.title:
+            query = query.filter(Event.title.ilike(f"%{filters.title}%"))
+        if filters.start_time_after:
+            query = query.filter(Event.start_time >= filters.start_time_after)
+        if filters.start_time_before:
+            query = query.filter(Event.start_time <= filters.start_time_before)
+    return query
+
+def bulk_update_events(
+    db: Session,
+    user_id: int,
+    patch: EventUpdate,
+    event_ids: Optional[List[int]] = None,
+    filters: Optional[EventBulkFilter] = None
+) -> Dict[str, Any]:
+    """
+    Applies one patch to many events owned by user_id in a single transaction.
+    - Ownership of every targeted event is verified by the same query that locks
+      and loads their current state.
+    - The patch is applied with one set-based UPDATE.
+    - Version and changelog rows (or outbox rows in write-behind mode) are written
+      with multi-row INSERTs.
+    If any requested ID is missing or not owned, nothing is changed and those IDs
+    are returned under "unauthorized_ids".
+    """
+    targets = (
+        _owned_events_query(db, user_id, event_ids, filters)
+        .order_by(Event.id)
+        .with_for_update()
+        .all()
+    )
+    if event_ids is not None:
+        unauthorized_ids = sorted(set(event_ids) - {e.id for e in targets})
+        if unauthorized_ids:
+            db.rollback()
+            return {"count": 0, "event_ids": [], "unauthorized_ids": unauthorized_ids}
+
+    target_ids = [e.id for e in targets]
+    update_data = patch.model_dump(exclude_unset=True)
+    if not target_ids or not update_data:
+        db.rollback()
+        return {"count": 0, "event_ids": [], "unauthorized_ids": []}
+
+    now = datetime.utcnow()
+    history = [
+        {
+            "event_id": e.id,
+            "snapshot": event_snapshot_codec.encode(e),
+            "changes": _changes_for_update(e, update_data),
+        }
+        for e in targets
+    ]
+
+    db.execute(
+        update(Event)
+        .where(Event.id.in_(target_ids))
+        .values(**update_data, updated_at=now)
+        .execution_options(synchronize_session=False)
+    )
+
+    if settings.HISTORY_WRITE_BEHIND:
+        enqueue_history_many(db, [{**h, "user_id": user_id} for h in history])
+    else:
+        latest_version_numbers = history_archive.latest_version_numbers(db, target_ids)
+        version_ids = db.execute(
+            insert(EventVersion).returning(EventVersion.id, sort_by_parameter_order=True),
+            [
+                {
+                    "event_id": h["event_id"],
+                    "version_number": latest_version_numbers.get(h["event_id"], 0) + 1,
+                    "data": h["snapshot"],
+                    "changed_by_user_id": user_id,
+                    "timestamp": now,
+                }
+                for h in history
+            ]
+        ).scalars().all()
+        changelog_rows = [
+            {
+                "event_id": h["event_id"],
+                "version_id": version_id,
+                "user_id": user_id,
+                "timestamp": now,
+                "changes": h["changes"],
+            }
+            for h, version_id in zip(history, version_ids)
+            if h["changes"]
+        ]
+        if changelog_rows:
+            db.execute(insert(Changelog), changelog_rows)
+
+    db.commit()
+    event_read_cache.invalidate_many(target_ids)
+    return {"count": len(target_ids), "event_ids": target_ids, "unauthorized_ids": []}
+
+def bulk_delete_events(
+    db: Session,
+    user_id: int,
+    event_ids: Optional[List[int]] = None,
+    filters: Optional[EventBulkFilter] = None
+) -> Dict[str, Any]:
+    """
+    Deletes many events owned by user_id with one set-based DELETE.
+    Permissions, versions and changelog rows go with them via ON DELETE CASCADE.
+    If any requested ID is missing or not owned, nothing is deleted and those IDs
+    are returned under "unauthorized_ids".
+    """
+    owned_ids = [
+        row.id for row in
+        _owned_events_query(db, user_id, event_ids, filters)
+        .with_entities(Event.id)
+        .order_by(Event.id)
+        .with_for_update()
+        .all()
+    ]
+    if event_ids is not None:
+        unauthorized_ids = sorted(set(event_ids) - set(owned_ids))
+        if unauthorized_ids:
+            db.rollback()
+            return {"count": 0, "event_ids": [], "unauthorized_ids": unauthorized_ids}
+
+    if owned_ids:
+        db.execute(
+            delete(Event)
+            .where(Event.id.in_(owned_ids))
+            .execution_options(synchronize_session=False)
+        )
+    db.commit()
+    event_read_cache.invalidate_many(owned_ids)
+    return {"count": len(owned_ids), "event_ids": owned_ids, "unauthorized_ids": []}
+
+def create_events_batch(db: Session, events: List[EventCreate], owner_id: int, commit: bool = True) -> List[Event]:
+    """Create multiple events in a single transaction (left open with commit=False, as in create_event)."""
     db_events = []
     for event_data in events:
         db_event_obj = Event(**event_data.model_dump(), owner_id=owner_id)
         db.add(db_event_obj)
         db_events.append(db_event_obj)
-    db.commit()
+    if commit:
+        db.commit()
+    else:
+        db.flush()
     for db_event_obj in db_events:
         db.refresh(db_event_obj)
     return db_events
 
 # --- Permission CRUD Functions ---
-def get_permissions_for_event(db: Session, event_id: int) -> List[Dict[str, Any]]:
-    """Get all permissions for an event, including user and role details."""
-    permissions = (
-        db.query(EventPermission)
-        .options(joinedload(EventPermission.user), joinedload(EventPermission.role))
-        .filter(EventPermission.event_id == event_id)
-        .all()
-    )
-    result = []
-    for p in permissions:
-        user_details = p.user
-        role_details = p.role
-        result.append({
-            "id": p.id,
-            "event_id": p.event_id,
-            "user_id": user_details.id if user_details else None,
-            "username": user_details.username if user_details else "N/A",
-            "email": user_details.email if user_details else "N/A",
-            "role_id": role_details.id if role_details else None,
-            "role_name": role_details.name if role_details else "N/A"
-        })
-    return result
+def get_permissions_for_event(
+    db: Session,
+    event_id: int,
+    role: Optional[str] = None,
+    after_id: Optional[int] = None,
+    limit: Optional[int] = None
+) -> List[EventPermissionDetail]:
+    """
+    Permissions for an event with user and role details, ordered by permission id.
+    One projected SELECT over event_permissions, users and roles; rows map straight
+    to EventPermissionDetail without hydrating ORM entities. after_id/limit give a
+    keyset page (served by the (event_id, id) index).
+    """
+    stmt = lambda_stmt(lambda: (
+        select(
+            EventPermission.id,
+            EventPermission.event_id,
+            EventPermission.user_id,
+            User.username,
+            User.email,
+            EventPermission.role_id,
+            Role.name.label("role_name")
+        )
+        .join(User, User.id == EventPermission.user_id)
+        .join(Role, Role.id == EventPermission.role_id)
+        .where(EventPermission.event_id == event_id)
+        .order_by(EventPermission.id)
+    ))
+    if role is not None:
+        stmt += lambda s: s.where(Role.name == role)
+    if after_id is not None:
+        stmt += lambda s: s.where(EventPermission.id > after_id)
+    if limit is not None:
+        stmt += lambda s: s.limit(limit)
+    # Columns come straight from NOT NULL table columns, so validation is skipped
+    return [EventPermissionDetail.model_construct(**row) for row in db.execute(stmt).mappings()]
+
+def get_permission(db: Session, event_id: int, user_id: int) -> Optional[EventPermission]:
+    stmt = lambda_stmt(lambda: select(EventPermission).where(
+        EventPermission.event_id == event_id,
+        EventPermission.user_id == user_id
+    ))
+    return db.execute(stmt).scalars().first()
 
 def update_permission(
     db: Session,
@@ -193,14 +489,12 @@ def update_permission(
     role_id: int
 ) -> Optional[EventPermission]:
     """Update a user's permission for an event."""
-    permission = db.query(EventPermission).filter(
-        EventPermission.event_id == event_id,
-        EventPermission.user_id == user_id
-    ).first()
+    permission = get_permission(db, event_id, user_id)
     if permission:
         permission.role_id = role_id
         db.add(permission)
         db.commit()
+        event_read_cache.invalidate(event_id, kinds=("acl",))
         db.refresh(permission)
     return permission
 
@@ -210,75 +504,113 @@ def delete_permission(
     user_id: int
 ) -> bool:
     """Remove a user's permission for an event."""
-    permission = db.query(EventPermission).filter(
-        EventPermission.event_id == event_id,
-        EventPermission.user_id == user_id
-    ).first()
+    permission = get_permission(db, event_id, user_id)
     if permission:
         db.delete(permission)
         db.commit()
+        event_read_cache.invalidate(event_id, kinds=("acl",))
         return True
     return False
 
 # --- Version History and Rollback CRUD Functions ---
 
-def get_specific_event_version(db: Session, event_version_id: int) -> Optional[EventVersion]:
+def get_specific_event_version(
+    db: Session,
+    event_version_id: int,
+    event_id: Optional[int] = None
+) -> Optional[EventVersion]:
     """
     Fetches a specific event version by its ID.
+    Versions in archived partitions are found too when event_id is given.
     """
-    return db.query(EventVersion).filter(EventVersion.id == event_version_id).first()
+    version = db.query(EventVersion).filter(EventVersion.id == event_version_id).first()
+    if version is None and event_id is not None:
+        version = history_archive.archived_versions_by_id(db, event_id, {event_version_id}).get(event_version_id)
+    return version
+
+def _latest_version_number_subquery(event_id: int):
+    live_latest = (
+        select(func.coalesce(func.max(EventVersion.version_number), 0))
+        .where(EventVersion.event_id == event_id)
+        .scalar_subquery()
+    )
+    return func.greatest(live_latest, history_archive.latest_archived_version_number(event_id))
 
-def rollback_event_to_specific_version(
+def _lock_event_with_version(
     db: Session,
     event_id: int,
-    event_version_id: int,
-    current_user_id: int
-) -> Optional[Event]:
+    version_filter,
+    archived_version,
+    owner_id: Optional[int] = None
+) -> Optional[Tuple[Event, EventVersion, int]]:
     """
-    Rolls back an event to a specific version.
-    - Updates the main event record.
-    - Creates a new version record for this rollback action.
-    - Creates a changelog entry for the rollback.
+    Locks the event FOR UPDATE, then fetches it, the matching version and the
+    latest version number of the event in a single query.
+    If no live version matches, archived_version(latest_version_number) looks the
+    target up in the history archive.
     """
-    current_event = db.query(Event).filter(Event.id == event_id).first()
-    if not current_event:
+    if settings.HISTORY_WRITE_BEHIND:
+        # The outbox worker skips this event while its history lock is held, so both
+        # cannot take the same version number
+        lock_event_history(db, event_id)
+    # Locked in its own statement: a query that waits for the lock re-checks the
+    # event row but not the latest version number, which would be stale
+    db.query(Event.id).filter(Event.id == event_id).with_for_update().scalar()
+    if settings.HISTORY_WRITE_BEHIND:
+        # Pending history must land first; after the row lock, so no update commits
+        # an outbox row in between
+        materialize_pending_history(db, event_id=event_id)
+
+    latest_version_number = _latest_version_number_subquery(event_id)
+    query = (
+        db.query(Event, EventVersion, latest_version_number.label("latest_version_number"))
+        .join(EventVersion, EventVersion.event_id == Event.id)
+        .filter(Event.id == event_id, version_filter(latest_version_number))
+        .with_for_update(of=Event)
+    )
+    if owner_id is not None:
+        query = query.filter(Event.owner_id == owner_id)
+    row = query.first()
+    if row:
+        return tuple(row)
+
+    # The target version may have been archived with its partition
+    query = (
+        db.query(Event, latest_version_number.label("latest_version_number"))
+        .filter(Event.id == event_id)
+        .with_for_update(of=Event)
+    )
+    if owner_id is not None:
+        query = query.filter(Event.owner_id == owner_id)
+    row = query.first()
+    if not row:
         return None
+    current_event, latest = row
+    target_version = archived_version(latest)
+    return (current_event, target_version, latest) if target_version else None
 
-    target_version = db.query(EventVersion).filter(
-        EventVersion.id == event_version_id,
-        EventVersion.event_id == event_id
-    ).first()
-    if not target_version:
-        return None
+def _apply_rollback(
+    db: Session,
+    current_event: Event,
+    target_version: EventVersion,
+    latest_version_number: int,
+    current_user_id: int
+) -> Event:
+    """
+    Restores target_version onto current_event, records a new version for the
+    rollback and a changelog entry with the fields it changed.
+    """
+    original_event_state_before_rollback = event_snapshot_codec.encode(current_event)
 
-    rolled_back_data = target_version.data.copy()
-    fields_to_update = {}
-    original_event_state_before_rollback = model_to_dict(current_event)
-
-    for key, value in rolled_back_data.items():
-        if key in EventResponse.model_fields:
-            if key in ["start_time", "end_time", "created_at", "updated_at"] and isinstance(value, str):
-                try:
-                    fields_to_update[key] = parser.parse(value)
-                except (parser.ParserError, TypeError):
-                    fields_to_update[key] = value 
-            elif key not in ["id", "owner_id", "created_at", "updated_at"]: 
-                fields_to_update[key] = value
-    
-    for key, value in fields_to_update.items():
-        if hasattr(current_event, key):
-            setattr(current_event, key, value)
+    for key, value in event_snapshot_codec.decode(target_version.data).items():
+        setattr(current_event, key, value)
     current_event.updated_at = datetime.utcnow()
 
-    new_version_number_for_rollback = db.query(EventVersion).filter(
-        EventVersion.event_id == event_id
-    ).count() + 1
-    
-    data_for_new_version = model_to_dict(current_event)
+    data_for_new_version = event_snapshot_codec.encode(current_event)
 
     rollback_version_entry = EventVersion(
-        event_id=event_id,
-        version_number=new_version_number_for_rollback,
+        event_id=current_event.id,
+        version_number=latest_version_number + 1,
         data=data_for_new_version,
         changed_by_user_id=current_user_id,
         timestamp=datetime.utcnow()
@@ -297,7 +629,7 @@ def rollback_event_to_specific_version(
             
     if changes_due_to_rollback:
         changelog_entry = Changelog(
-            event_id=event_id,
+            event_id=current_event.id,
             version_id=rollback_version_entry.id,
             user_id=current_user_id,
             timestamp=datetime.utcnow(),
@@ -306,16 +638,99 @@ def rollback_event_to_specific_version(
         db.add(changelog_entry)
 
     db.commit()
+    event_read_cache.invalidate(current_event.id)
     db.refresh(current_event)
     return current_event
 
+def rollback_event_to_specific_version(
+    db: Session,
+    event_id: int,
+    event_version_id: int,
+    current_user_id: int
+) -> Optional[Event]:
+    """
+    Rolls back an event to a specific version, addressed by its global EventVersion ID.
+    - Updates the main event record.
+    - Creates a new version record for this rollback action.
+    - Creates a changelog entry for the rollback.
+    """
+    locked = _lock_event_with_version(
+        db,
+        event_id,
+        lambda latest: EventVersion.id == event_version_id,
+        lambda latest: history_archive.archived_versions_by_id(db, event_id, {event_version_id}).get(event_version_id)
+    )
+    if not locked:
+        return None
+    current_event, target_version, latest_version_number = locked
+    return _apply_rollback(db, current_event, target_version, latest_version_number, current_user_id)
+
+def rollback_event_to_version_number(
+    db: Session,
+    event_id: int,
+    current_user_id: int,
+    version_number: Optional[int] = None,
+    steps_back: Optional[int] = None
+) -> Optional[Event]:
+    """
+    Rolls back an event owned by current_user_id, addressed either by its
+    per-event version_number or by how many versions back to go
+    (steps_back=1 restores the most recent snapshot, i.e. undoes the last change).
+    steps_back counts the versions that exist, so numbers removed by history
+    compaction are skipped. The event, the target version and the latest version
+    number are resolved in one SELECT ... FOR UPDATE.
+    Returns None if the event is not owned by the user or the version does not exist.
+    """
+    if version_number is not None:
+        version_filter = lambda latest: EventVersion.version_number == version_number
+
+        def archived_version(latest: int) -> Optional[EventVersion]:
+            versions = history_archive.archived_versions_in_range(db, event_id, version_number, version_number)
+            return versions[0] if versions else None
+    elif steps_back is not None and steps_back >= 1:
+        newer = aliased(EventVersion)
+        version_filter = lambda latest: EventVersion.version_number == (
+            select(newer.version_number)
+            .where(newer.event_id == event_id)
+            .order_by(newer.version_number.desc())
+            .offset(steps_back - 1)
+            .limit(1)
+            .scalar_subquery()
+        )
+
+        def archived_version(latest: int) -> Optional[EventVersion]:
+            # Fewer live versions than steps_back: count the rest down through the archive
+            live_count, oldest_live = db.query(
+                func.count(EventVersion.id), func.min(EventVersion.version_number)
+            ).filter(EventVersion.event_id == event_id).one()
+            remaining = steps_back - live_count
+            upper = (oldest_live or latest + 1) - 1
+            versions = history_archive.archived_versions_in_range(db, event_id, 1, upper) if upper >= 1 else []
+            return versions[-remaining] if 0 < remaining <= len(versions) else None
+    else:
+        return None
+
+    locked = _lock_event_with_version(
+        db,
+        event_id,
+        version_filter,
+        archived_version,
+        owner_id=current_user_id
+    )
+    if not locked:
+        return None
+    current_event, target_version, latest_version_number = locked
+    return _apply_rollback(db, current_event, target_version, latest_version_number, current_user_id)
+
 # --- Changelog & Diff CRUD Functions ---
 
 def get_event_changelog(db: Session, event_id: int) -> List[Dict[str, Any]]:
     """
     Fetches all changelog entries for a given event, ordered chronologically.
-    Includes details of the user who made the change.
+    Includes details of the user who made the change. Entries from archived
+    partitions come first; they are all older than the live ones.
     """
+    results = _archived_changelog_entries(db, event_id)
     changelog_entries = (
         db.query(Changelog)
         .options(joinedload(Changelog.user_detail)) 
@@ -323,8 +738,7 @@ def get_event_changelog(db: Session, event_id: int) -> List[Dict[str, Any]]:
         .order_by(Changelog.timestamp.asc())
         .all()
     )
-    
-    results = []
+
     for entry in changelog_entries:
         user_info = None
         if entry.user_detail:
@@ -344,6 +758,28 @@ def get_event_changelog(db: Session, event_id: int) -> List[Dict[str, Any]]:
         })
     return results
 
+def _archived_changelog_entries(db: Session, event_id: int) -> List[Dict[str, Any]]:
+    rows = history_archive.archived_changelog(db, event_id)
+    if not rows:
+        return []
+    user_ids = {row["user_id"] for row in rows if row["user_id"] is not None}
+    users = {
+        user.id: {"id": user.id, "username": user.username, "email": user.email}
+        for user in db.query(User).filter(User.id.in_(user_ids))
+    } if user_ids else {}
+    return [
+        {
+            "id": row["id"],
+            "event_id": row["event_id"],
+            "version_id": row["version_id"],
+            "user_id": row["user_id"],
+            "user_details": users.get(row["user_id"]),
+            "timestamp": row["timestamp"],
+            "changes": row["changes"],
+        }
+        for row in sorted(rows, key=lambda row: row["timestamp"])
+    ]
+
 def get_diff_between_event_versions(
     db: Session,
     event_id: int,
@@ -352,34 +788,110 @@ def get_diff_between_event_versions(
 ) -> Optional[Dict[str, Any]]:
     """
     Computes a diff between the 'data' fields of two EventVersion records for a specific event.
+    Nested JSON is diffed by path and multi-line text at line level.
+    Results are cached by version-id pair; versions are immutable once written,
+    but history compaction may delete them, and only the worker running it drops
+    their diffs. So a cached diff is used only once a primary-key lookup confirms
+    both versions are still live; otherwise (e.g. archived versions) the diff is
+    rebuilt from the loaded rows.
     Returns None if versions are not found or don't belong to the event.
     """
-    ver1 = db.query(EventVersion).filter(
-        EventVersion.id == version_id1,
-        EventVersion.event_id == event_id
-    ).first()
-
-    ver2 = db.query(EventVersion).filter(
-        EventVersion.id == version_id2,
-        EventVersion.event_id == event_id
-    ).first()
-
-    if not ver1 or not ver2:
-        return None
-
-    data1 = ver1.data
-    data2 = ver2.data
+    changes = diff_cache.get((event_id, version_id1, version_id2))
+    if changes is not None:
+        live_count = db.execute(
+            select(func.count(EventVersion.id))
+            .where(EventVersion.event_id == event_id, EventVersion.id.in_([version_id1, version_id2]))
+        ).scalar()
+        if live_count < len({version_id1, version_id2}):
+            changes = None
+    if changes is None:
+        versions = db.query(EventVersion).filter(
+            EventVersion.id.in_([version_id1, version_id2]),
+            EventVersion.event_id == event_id
+        ).all()
+        versions_by_id = {v.id: v for v in versions}
+        missing_ids = {version_id1, version_id2} - versions_by_id.keys()
+        if missing_ids:
+            versions_by_id.update(history_archive.archived_versions_by_id(db, event_id, missing_ids))
+
+        ver1 = versions_by_id.get(version_id1)
+        ver2 = versions_by_id.get(version_id2)
+        if not ver1 or not ver2:
+            return None
+
+        changes = diff_snapshots(ver1.data, ver2.data)
+        diff_cache.set((event_id, version_id1, version_id2), changes)
 
     diff_result = {}
-    all_keys = set(data1.keys()).union(set(data2.keys()))
-
-    for key in all_keys:
-        val_from_v1 = data1.get(key)
-        val_from_v2 = data2.get(key)
-        
-        if val_from_v1 != val_from_v2:
+    for key, change in changes.items():
+        if "line_diff" in change:
+            diff_result[key] = change
+        else:
             diff_result[key] = {
-                f"value_in_version_id_{version_id1}": val_from_v1,
-                f"value_in_version_id_{version_id2}": val_from_v2
+                f"value_in_version_id_{version_id1}": change["old"],
+                f"value_in_version_id_{version_id2}": change["new"]
             }
     return diff_result
+
+def get_diff_across_event_versions(
+    db: Session,
+    event_id: int,
+    from_version: int,
+    to_version: int,
+    include_steps: bool = False
+) -> Optional[Dict[str, Any]]:
+    """
+    Computes the cumulative diff between two version numbers of an event.
+    All versions in the range are fetched in a single query; with include_steps
+    the diff between each consecutive pair is returned as well.
+    Returns None if either end of the range does not exist for the event.
+    """
+    if from_version > to_version:
+        from_version, to_version = to_version, from_version
+
+    query = db.query(EventVersion).filter(EventVersion.event_id == event_id)
+    if include_steps:
+        query = query.filter(EventVersion.version_number.between(from_version, to_version))
+    else:
+        query = query.filter(EventVersion.version_number.in_([from_version, to_version]))
+    versions = query.order_by(EventVersion.version_number.asc()).all()
+
+    if not versions or versions[0].version_number != from_version:
+        # The start of the range (or all of it) may be in archived partitions
+        archived = history_archive.archived_versions_in_range(db, event_id, from_version, to_version)
+        if not include_steps:
+            archived = [v for v in archived if v.version_number in (from_version, to_version)]
+        live_numbers = {v.version_number for v in versions}
+        versions = [v for v in archived if v.version_number not in live_numbers] + versions
+
+    if (
+        not versions
+        or versions[0].version_number != from_version
+        or versions[-1].version_number != to_version
+    ):
+        return None
+
+    def _cached_diff(ver_a: EventVersion, ver_b: EventVersion) -> Dict[str, Any]:
+        cache_key = (event_id, ver_a.id, ver_b.id)
+        cached = diff_cache.get(cache_key)
+        if cached is None:
+            cached = diff_snapshots(ver_a.data, ver_b.data)
+            diff_cache.set(cache_key, cached)
+        return cached
+
+    result: Dict[str, Any] = {
+        "event_id": event_id,
+        "from_version": from_version,
+        "to_version": to_version,
+        "changes": _cached_diff(versions[0], versions[-1]),
+    }
+    if include_steps:
+        result["steps"] = [
+            {
+                "from_version": prev.version_number,
+                "to_version": curr.version_number,
+                "changes": _cached_diff(prev, curr),
+            }
+            for prev, curr in zip(versions, versions[1:])
+        ]
+    return result
@@ -1,4 +1,5 @@
 # app/crud/crud_user.py
+from sqlalchemy import lambda_stmt, select
 from sqlalchemy.orm import Session
 from typing import Optional
 
@@ -7,31 +8,38 @@ from app.models.user import User as UserModel # Adjust import if your model is n
 from app.schemas.user import UserCreate     # Pydantic schema for creating a user
 from app.core.security import get_password_hash # For hashing passwords
 
+# Lambda statements are built and compiled once; see the note in crud_event.py
+
 def get_user_by_id(db: Session, user_id: int) -> Optional[UserModel]:
     """
     Retrieve a user by their ID.
     """
-    return db.query(UserModel).filter(UserModel.id == user_id).first()
+    stmt = lambda_stmt(lambda: select(UserModel).where(UserModel.id == user_id))
+    return db.execute(stmt).scalars().first()
 
 def get_user_by_email(db: Session, email: str) -> Optional[UserModel]:
     """
     Retrieve a user by their email address.
     """
-    return db.query(UserModel).filter(UserModel.email == email).first()
+    stmt = lambda_stmt(lambda: select(UserModel).where(UserModel.email == email))
+    return db.execute(stmt).scalars().first()
 
 def get_user_by_username(db: Session, username: str) -> Optional[UserModel]:
     """
     Retrieve a user by their username.
     """
-    return db.query(UserModel).filter(UserModel.username == username).first()
+    stmt = lambda_stmt(lambda: select(UserModel).where(UserModel.username == username))
+    return db.execute(stmt).scalars().first()
 
-def create_user(db: Session, user: UserCreate) -> UserModel:
+def create_user(db: Session, user: UserCreate, hashed_password: Optional[str] = None) -> UserModel:
     """
     Create a new user in the database.
-    - Hashes the password before storing.
+    - Hashes the password before storing, unless the caller already did
+      (request handlers hash with get_password_hash_async, off the event loop).
     - Adds the new user to the session, commits, and refreshes to get DB-generated values.
     """
-    hashed_password = get_password_hash(user.password)
+    if hashed_password is None:
+        hashed_password = get_password_hash(user.password)
     db_user = UserModel(
         email=user.email,
         username=user.username,
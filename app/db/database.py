@@ -1,14 +1,180 @@
+import logging
+import time
+from threading import Lock
+from typing import Any, Dict, Optional
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 
 from app.core.config import settings # Import the settings instance
+from app.core.metrics import DB_POOL_CHECKED_OUT, DB_POOL_CHECKOUT_FAILURES, DB_POOL_CHECKOUT_WAIT
 
 SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+logger = logging.getLogger(__name__)
+
+
+class PoolMetrics:
+    """Checkout wait-time histogram and saturation for one connection pool."""
+
+    # Upper bounds in seconds; the last bucket catches everything slower
+    WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, float("inf"))
+
+    def __init__(self):
+        self._lock = Lock()
+        self.checkouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.wait_bucket_counts = [0] * len(self.WAIT_BUCKETS)
+        self.failures = 0
+
+    def record_wait(self, seconds: float) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+            for i, bound in enumerate(self.WAIT_BUCKETS):
+                if seconds <= bound:
+                    self.wait_bucket_counts[i] += 1
+                    break
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+
+    def snapshot(self, pool: QueuePool) -> Dict[str, Any]:
+        capacity = pool.size() + max(settings.DB_MAX_OVERFLOW, 0)
+        checked_out = pool.checkedout()
+        with self._lock:
+            return {
+                "pool_size": pool.size(),
+                "max_overflow": settings.DB_MAX_OVERFLOW,
+                "checked_out": checked_out,
+                "checked_in": pool.checkedin(),
+                "overflow": pool.overflow(),
+                "saturation": round(checked_out / capacity, 4) if capacity else 0.0,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.failures, # Pool timeouts and connect errors
+                "checkout_wait_seconds_total": round(self.wait_seconds_total, 6),
+                "checkout_wait_seconds_max": round(self.wait_seconds_max, 6),
+                "checkout_wait_buckets": {
+                    ("+Inf" if bound == float("inf") else str(bound)): count
+                    for bound, count in zip(self.WAIT_BUCKETS, self.wait_bucket_counts)
+                },
+            }
+
+
+pool_metrics = PoolMetrics() # Primary pool
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that records how long each checkout waited for a connection, in
+    `metrics` and in the Prometheus pool metrics under the `label` pool label.
+    Pools for other databases use a subclass from instrumented_pool_class.
+    """
+    label = "primary"
+    metrics = pool_metrics
+
+    def _do_get(self):
+        # _do_get is where QueuePool blocks for a free connection (up to pool_timeout)
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            self.metrics.record_failure()
+            DB_POOL_CHECKOUT_FAILURES.labels(self.label).inc()
+            raise
+        waited = time.perf_counter() - started
+        self.metrics.record_wait(waited)
+        DB_POOL_CHECKOUT_WAIT.labels(self.label).observe(waited)
+        DB_POOL_CHECKED_OUT.labels(self.label).set(self.checkedout())
+        return connection
+
+    def _do_return_conn(self, record):
+        super()._do_return_conn(record)
+        DB_POOL_CHECKED_OUT.labels(self.label).set(self.checkedout())
+
+
+def instrumented_pool_class(label: str) -> type:
+    """
+    InstrumentedQueuePool subclass with its own label and PoolMetrics. A class
+    rather than instance attributes, since SQLAlchemy recreates pools from their class.
+    """
+    DB_POOL_CHECKED_OUT.labels(label).set(0) # Registers the pool's series before its first checkout
+    return type(f"InstrumentedQueuePool_{label}", (InstrumentedQueuePool,), {"label": label, "metrics": PoolMetrics()})
+
+
+def connect_args_for(url: str) -> Dict[str, Any]:
+    args: Dict[str, Any] = {}
+    if settings.DB_STATEMENT_TIMEOUT_MS > 0:
+        # Applied per connection by libpq, so every statement on it is bounded
+        args["options"] = f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"
+    if make_url(url).drivername == "postgresql+psycopg":
+        # psycopg 3 prepares a statement server-side once it has run this many times on
+        # a connection; psycopg2 has no server-side prepared statements
+        threshold = settings.DB_PREPARE_THRESHOLD
+        args["prepare_threshold"] = threshold if threshold >= 0 else None
+    return args
+
+
+# The engine (and with it the DBAPI driver import) is created on first use rather than
+# at import time; the app lifespan creates it at start-up, see prewarm_pool.
+_engine: Optional[Engine] = None
+_engine_lock = Lock()
+
+def get_engine() -> Engine:
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = create_engine(
+                    SQLALCHEMY_DATABASE_URL,
+                    poolclass=InstrumentedQueuePool,
+                    pool_size=settings.DB_POOL_SIZE,
+                    max_overflow=settings.DB_MAX_OVERFLOW,
+                    pool_timeout=settings.DB_POOL_TIMEOUT,
+                    pool_recycle=settings.DB_POOL_RECYCLE,
+                    pool_pre_ping=settings.DB_POOL_PRE_PING,
+                    query_cache_size=settings.DB_COMPILED_CACHE_SIZE,
+                    connect_args=connect_args_for(SQLALCHEMY_DATABASE_URL),
+                )
+    return _engine
+
+
+def prewarm_pool(connections: int = settings.DB_POOL_PREWARM) -> int:
+    """
+    Creates the engine and opens up to `connections` pool connections (at most
+    DB_POOL_SIZE, since overflow connections are closed on return), so the first
+    requests do not pay for connecting. Returns how many were opened; a database
+    that is unreachable is logged, not raised, so the app still starts.
+    """
+    engine = get_engine()
+    opened = []
+    try:
+        for _ in range(min(connections, settings.DB_POOL_SIZE)):
+            opened.append(engine.connect())
+    except Exception:
+        logger.warning("Connection pool pre-warm stopped after %d connections", len(opened), exc_info=True)
+    finally:
+        for connection in opened:
+            connection.close()
+    return len(opened)
+
+
+class _LazySessionmaker(sessionmaker):
+    """sessionmaker that binds to the primary engine when the first session is opened."""
+
+    def __call__(self, **local_kw):
+        if self.kw.get("bind") is None:
+            self.configure(bind=get_engine())
+        return super().__call__(**local_kw)
+
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = _LazySessionmaker(autocommit=False, autoflush=False)
 
 Base = declarative_base() # All your SQLAlchemy models will inherit from this
 
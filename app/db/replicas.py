@@ -0,0 +1,149 @@
+# app/db/replicas.py
+import itertools
+import time
+from threading import Lock
+from typing import Any, Dict, Iterator, List, Optional
+
+from fastapi import Request
+from jose import JWTError, jwt
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.config import settings
+from app.db.database import SessionLocal, connect_args_for, instrumented_pool_class
+
+
+class _Replica:
+    def __init__(self, url: str, label: str):
+        self.url = url
+        self.label = label # Pool label on the pool metrics
+        self._engine: Optional[Engine] = None
+        self._engine_lock = Lock()
+        self.session_factory = sessionmaker(autocommit=False, autoflush=False)
+        self.down_until = 0.0 # monotonic time before which the replica is skipped
+
+    @property
+    def engine(self) -> Engine:
+        # Created on first use, like the primary engine (see get_engine)
+        if self._engine is None:
+            with self._engine_lock:
+                if self._engine is None:
+                    self._engine = create_engine(
+                        self.url,
+                        poolclass=instrumented_pool_class(self.label),
+                        pool_size=settings.DB_POOL_SIZE,
+                        max_overflow=settings.DB_MAX_OVERFLOW,
+                        pool_timeout=settings.DB_POOL_TIMEOUT,
+                        pool_recycle=settings.DB_POOL_RECYCLE,
+                        pool_pre_ping=True,
+                        query_cache_size=settings.DB_COMPILED_CACHE_SIZE,
+                        connect_args=connect_args_for(self.url),
+                    )
+        return self._engine
+
+    def session(self) -> Session:
+        return self.session_factory(bind=self.engine)
+
+
+class ReplicaRouter:
+    """
+    Hands out read sessions from a set of replicas in round-robin order.
+    - A replica whose connection check fails is skipped for REPLICA_RETRY_SECONDS.
+    - Callers that wrote recently (see mark_write) are served by the primary for
+      READ_YOUR_WRITES_SECONDS, so they never read a stale replica after their own write.
+    - With no replicas configured (or all down) every read goes to the primary.
+    - Replica sessions carry info["replica"] = True (see is_replica_session).
+    Stickiness is tracked per worker process.
+    """
+
+    def __init__(self, replica_urls: List[str]):
+        self.replicas = [_Replica(url, f"replica{index}") for index, url in enumerate(replica_urls)]
+        self._next = itertools.count()
+        self._lock = Lock()
+        self._recent_writers: Dict[str, float] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    @staticmethod
+    def writer_key(authorization: Optional[str]) -> Optional[str]:
+        """
+        Identifies the caller by the token subject. The claims are read without
+        verification: the key only decides routing, authentication happens later.
+        """
+        if not authorization or not authorization.lower().startswith("bearer "):
+            return None
+        try:
+            return jwt.get_unverified_claims(authorization[7:]).get("sub")
+        except JWTError:
+            return None
+
+    def mark_write(self, writer: Optional[str]) -> None:
+        if not writer:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._recent_writers[writer] = now + settings.READ_YOUR_WRITES_SECONDS
+            if len(self._recent_writers) > 10_000:
+                self._recent_writers = {k: v for k, v in self._recent_writers.items() if v > now}
+
+    def pool_snapshots(self) -> Dict[str, Dict[str, Any]]:
+        """PoolMetrics snapshot per replica label, for the replicas used so far in this process."""
+        snapshots = {}
+        for replica in self.replicas:
+            if replica._engine is not None:
+                pool = replica._engine.pool
+                snapshots[replica.label] = type(pool).metrics.snapshot(pool)
+        return snapshots
+
+    def is_sticky(self, writer: Optional[str]) -> bool:
+        if not writer:
+            return False
+        until = self._recent_writers.get(writer)
+        return until is not None and until > time.monotonic()
+
+    def _replica_session(self) -> Optional[Session]:
+        now = time.monotonic()
+        with self._lock:
+            start = next(self._next)
+        for offset in range(len(self.replicas)):
+            replica = self.replicas[(start + offset) % len(self.replicas)]
+            if replica.down_until > now:
+                continue
+            db = replica.session()
+            try:
+                db.connection() # Checks out (and pre-pings) a connection now rather than mid-request
+                db.info["replica"] = True
+                return db
+            except OperationalError:
+                db.close()
+                replica.down_until = now + settings.REPLICA_RETRY_SECONDS
+        return None
+
+    def session_for(self, writer: Optional[str]) -> Session:
+        if self.enabled and not self.is_sticky(writer):
+            db = self._replica_session()
+            if db is not None:
+                return db
+        return SessionLocal()
+
+
+def is_replica_session(db: Session) -> bool:
+    return bool(db.info.get("replica"))
+
+
+replica_router = ReplicaRouter(
+    [url.strip() for url in settings.DATABASE_REPLICA_URLS.split(",") if url.strip()]
+)
+
+
+# Dependency for read-only endpoints; falls back to the primary when needed
+def get_read_db(request: Request) -> Iterator[Session]:
+    db = replica_router.session_for(replica_router.writer_key(request.headers.get("authorization")))
+    try:
+        yield db
+    finally:
+        db.close()
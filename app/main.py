@@ -1,22 +1,100 @@
 # app/main.py
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from app.core.config import settings
+from app.db.database import SessionLocal, prewarm_pool
+from app.db.replicas import replica_router
+from app.core.compression import CompressionMiddleware
+from app.core.metrics import MetricsMiddleware
+from app.core.profiling import QueryProfilingMiddleware
+from app.core.scheduler import scheduler
+from app.core.rate_limit import PostgresBuckets, rate_limiter
+from app.core.security import get_pwd_context
+from app.services.history_archive import HistoryArchiver
+from app.services.history_compaction import HistoryCompactor
+from app.services.history_outbox import HistoryOutboxWorker
+from app.services.idempotency import purge_expired_keys
+from app.services.token_revocation import RevocationCompactor
 from app.api.routers import auth as auth_router
 from app.api.routers import users as users_router 
 from app.api.routers import events as events_router 
+from app.api.routers import calendar as calendar_router
+from app.api.routers import health as health_router
+from app.api.routers import metrics as metrics_router
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Initialization kept out of import time: the engine (plus DB_POOL_PREWARM
+    # connections) and the password hasher, side by side in worker threads
+    await asyncio.gather(asyncio.to_thread(prewarm_pool), asyncio.to_thread(get_pwd_context))
+    history_worker = None
+    if settings.HISTORY_WRITE_BEHIND and settings.HISTORY_OUTBOX_WORKER_IN_PROCESS:
+        history_worker = HistoryOutboxWorker(SessionLocal)
+        history_worker.start()
+    if settings.SCHEDULER_ENABLED:
+        if settings.REVOCATION_PURGE_SECONDS > 0:
+            scheduler.every(
+                "purge_revoked_tokens", settings.REVOCATION_PURGE_SECONDS, RevocationCompactor(SessionLocal).run_once
+            )
+        if settings.HISTORY_MAINTENANCE_SECONDS > 0:
+            # First run at start-up so the current month's partitions exist before any writes
+            scheduler.every(
+                "history_partitions", settings.HISTORY_MAINTENANCE_SECONDS, HistoryArchiver(SessionLocal).run_once,
+                initial_delay=0
+            )
+        if settings.HISTORY_COMPACTION_SECONDS > 0:
+            history_compactor = HistoryCompactor(SessionLocal)
+            scheduler.every(
+                "history_compaction", settings.HISTORY_COMPACTION_SECONDS, lambda: history_compactor.run_once()._asdict()
+            )
+        if settings.IDEMPOTENCY_PURGE_SECONDS > 0:
+            scheduler.every(
+                "purge_idempotency_keys", settings.IDEMPOTENCY_PURGE_SECONDS, lambda: purge_expired_keys(SessionLocal)
+            )
+        if isinstance(rate_limiter.backend, PostgresBuckets) and settings.RATE_LIMIT_PURGE_SECONDS > 0:
+            scheduler.every("purge_rate_limit_buckets", settings.RATE_LIMIT_PURGE_SECONDS, rate_limiter.backend.purge_idle)
+        scheduler.start()
+    yield
+    await scheduler.stop()
+    if history_worker:
+        await history_worker.stop()
+
 app = FastAPI(
+    lifespan=lifespan,
     title=settings.PROJECT_NAME,
     description="API for a Collaborative Event Management System.",
     version="0.1.0",
     openapi_url="/api/v1/openapi.json" 
 )
 
+if replica_router.enabled:
+    @app.middleware("http")
+    async def read_your_writes(request: Request, call_next):
+        # Successful writes pin the caller's following reads to the primary for a short window
+        response = await call_next(request)
+        if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+            replica_router.mark_write(replica_router.writer_key(request.headers.get("authorization")))
+        return response
+
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
+if settings.QUERY_PROFILING_ENABLED:
+    app.add_middleware(QueryProfilingMiddleware)
+
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # Include your routers
 app.include_router(auth_router.router)
 app.include_router(users_router.router) 
 app.include_router(events_router.router) 
+app.include_router(calendar_router.router)
+app.include_router(health_router.router)
+if settings.METRICS_ENABLED:
+    app.include_router(metrics_router.router)
 
 @app.get("/")
 async def root():
@@ -4,5 +4,12 @@ from .event import Event
 from .permission import EventPermission
 from .version import EventVersion
 from .changelog import Changelog
+from .outbox import EventHistoryOutbox
+from .token import RevokedToken
+from .history_archive import HistoryArchiveSegment
+from .rate_limit import RateLimitBucket
+from .idempotency import IdempotencyKey
+from .calendar_feed import CalendarFeed
+from .event_rollup import EventDayRollup
 
 # This allows you to import like: from app.models import User, Event, etc.
@@ -0,0 +1,16 @@
+# app/models/calendar_feed.py
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String
+
+from app.db.database import Base
+
+
+class CalendarFeed(Base):
+    """
+    Secret token of a user's ICS feed (GET /api/calendar/feed/{token}.ics). Only the
+    token's SHA-256 is stored; creating a new token replaces the old one.
+    """
+    __tablename__ = "calendar_feeds"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    token_hash = Column(String(64), nullable=False, unique=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
@@ -10,16 +10,22 @@ from app.db.database import Base
 class Changelog(Base):
     __tablename__ = "changelog"
 
-    id = Column(Integer, primary_key=True, index=True)
+    # Range-partitioned by month on timestamp like event_versions, hence the composite key
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     event_id = Column(Integer, ForeignKey("events.id", ondelete="CASCADE"), nullable=False)
     # A changelog entry is usually associated with a version that resulted from the change
-    version_id = Column(Integer, ForeignKey("event_versions.id", ondelete="CASCADE"), nullable=True) # Making it nullable if some logs are not direct version changes
+    # No foreign key: a partitioned event_versions has no unique constraint on id alone
+    version_id = Column(Integer, nullable=True) # Making it nullable if some logs are not direct version changes
     user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True) # User who made the change
-    timestamp = Column(DateTime(timezone=True), default=datetime.utcnow) # Corresponds to TIMESTAMPTZ
+    timestamp = Column(DateTime(timezone=True), primary_key=True, default=datetime.utcnow) # Corresponds to TIMESTAMPTZ
     changes = Column(JSONB, nullable=False) # Details of what changed (e.g., diff)
 
     # Relationships
     event = relationship("Event", back_populates="changelogs")
     user_detail = relationship("User", back_populates="changelog_entries_by_user") # Changed from 'user'
  
-    version_detail = relationship("EventVersion") 
+    version_detail = relationship(
+        "EventVersion", primaryjoin="foreign(Changelog.version_id) == EventVersion.id", viewonly=True
+    )
+
+    __table_args__ = {"postgresql_partition_by": "RANGE (timestamp)"}
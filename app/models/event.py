@@ -1,11 +1,14 @@
 # app/models/event.py (or wherever you place the Event model)
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, TEXT, CheckConstraint
-from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, TEXT, CheckConstraint, Computed
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
+from sqlalchemy.orm import relationship, deferred
 from datetime import datetime
 
 from app.db.database import Base
 
+# Text search configuration used both for the stored vector and for queries against it
+SEARCH_TEXT_CONFIG = "english"
+
 
 class Event(Base):
     __tablename__ = "events"
@@ -24,6 +27,14 @@ class Event(Base):
     created_at = Column(DateTime(timezone=True), default=datetime.utcnow) # Use timezone=True for TIMESTAMPTZ
     updated_at = Column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # Maintained by Postgres (GENERATED ... STORED) and GIN-indexed; deferred so it is never loaded with the row
+    search_vector = deferred(Column(TSVECTOR, Computed(
+        f"setweight(to_tsvector('{SEARCH_TEXT_CONFIG}', coalesce(title, '')), 'A') || "
+        f"setweight(to_tsvector('{SEARCH_TEXT_CONFIG}', coalesce(description, '')), 'B') || "
+        f"setweight(to_tsvector('{SEARCH_TEXT_CONFIG}', coalesce(location, '')), 'C')",
+        persisted=True
+    )))
+
     # Define the relationship to the User who owns the event
     owner = relationship("User", back_populates="owned_events")
 
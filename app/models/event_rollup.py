@@ -0,0 +1,18 @@
+# app/models/event_rollup.py
+from sqlalchemy import BigInteger, Column, Date, Integer
+
+from app.db.database import Base
+
+
+class EventDayRollup(Base):
+    """
+    Number and total length of each owner's events per UTC start day. Kept up to
+    date by statement-level triggers on events, installed (and the table rebuilt)
+    by `python -m app.services.event_rollup`.
+    """
+    __tablename__ = "event_day_rollups"
+
+    owner_id = Column(Integer, primary_key=True) # users.id; no foreign key, rows go when the user's events do
+    day = Column(Date, primary_key=True)
+    event_count = Column(Integer, nullable=False)
+    busy_minutes = Column(BigInteger, nullable=False) # Whole event length, counted on its start day
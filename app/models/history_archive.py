@@ -0,0 +1,26 @@
+# app/models/history_archive.py
+from sqlalchemy import Column, BigInteger, Date, Integer, ForeignKey, String
+
+from app.db.database import Base
+
+
+class HistoryArchiveSegment(Base):
+    """
+    Location of one event's archived event_versions or changelog rows for one
+    month. Each segment is a separate gzip member of an archive file of that month
+    (see app/services/history_archive.py), so it can be read on its own. A month
+    archived more than once has one file, and so one segment per event, per run.
+    """
+    __tablename__ = "history_archive_segments"
+
+    event_id = Column(Integer, ForeignKey("events.id", ondelete="CASCADE"), primary_key=True)
+    table_name = Column(String(32), primary_key=True) # "event_versions" or "changelog"
+    month = Column(Date, primary_key=True) # First day of the archived partition's month
+    path = Column(String(255), primary_key=True) # Relative to HISTORY_ARCHIVE_DIR
+    byte_offset = Column(BigInteger, nullable=False)
+    byte_length = Column(Integer, nullable=False)
+    row_count = Column(Integer, nullable=False)
+    min_row_id = Column(Integer, nullable=False)
+    max_row_id = Column(Integer, nullable=False)
+    min_version_number = Column(Integer, nullable=True) # event_versions segments only
+    max_version_number = Column(Integer, nullable=True)
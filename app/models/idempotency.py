@@ -0,0 +1,21 @@
+# app/models/idempotency.py
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, LargeBinary, SmallInteger, String
+
+from app.db.database import Base
+
+
+class IdempotencyKey(Base):
+    """
+    Result of a write sent with an Idempotency-Key header, replayed to retries of
+    the same request until expires_at (see app/services/idempotency.py). A row
+    with no status_code is a claim: the first request is still running.
+    """
+    __tablename__ = "idempotency_keys"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    key = Column(String(200), primary_key=True)
+    request_hash = Column(String(64), nullable=False) # SHA-256 of the endpoint and its parsed body
+    status_code = Column(SmallInteger, nullable=True)
+    response_body = Column(LargeBinary, nullable=True) # zlib-compressed JSON
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
@@ -0,0 +1,22 @@
+# app/models/outbox.py
+from sqlalchemy import Column, BigInteger, Integer, ForeignKey, DateTime
+from sqlalchemy.dialects.postgresql import JSONB
+from datetime import datetime
+
+from app.db.database import Base
+
+
+class EventHistoryOutbox(Base):
+    """
+    Pending history write for an event update, committed together with the update
+    when HISTORY_WRITE_BEHIND is enabled. The outbox worker turns each row into an
+    EventVersion (+ Changelog) and deletes it.
+    """
+    __tablename__ = "event_history_outbox"
+
+    id = Column(BigInteger, primary_key=True) # Monotonic; defines the per-event order of history writes
+    event_id = Column(Integer, ForeignKey("events.id", ondelete="CASCADE"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    snapshot = Column(JSONB, nullable=False) # Event state before the update
+    changes = Column(JSONB, nullable=False) # Field-level old/new values, may be empty
+    created_at = Column(DateTime(timezone=True), default=datetime.utcnow) # Becomes the version/changelog timestamp
@@ -0,0 +1,19 @@
+# app/models/rate_limit.py
+from sqlalchemy import Boolean, Column, DateTime, Float, String
+
+from app.db.database import Base
+
+
+class RateLimitBucket(Base):
+    """
+    Token buckets shared by all workers when RATE_LIMIT_BACKEND=postgres (see
+    app/core/rate_limit.py). UNLOGGED: the table is not crash-safe, and losing
+    it only refills every bucket.
+    """
+    __tablename__ = "rate_limit_buckets"
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
+
+    key = Column(String(200), primary_key=True) # "<policy>:<user id or client IP>"
+    tokens = Column(Float, nullable=False)
+    allowed = Column(Boolean, nullable=False) # Outcome of the last request against the bucket
+    updated_at = Column(DateTime(timezone=True), nullable=False, index=True)
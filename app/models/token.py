@@ -0,0 +1,18 @@
+# app/models/token.py
+from sqlalchemy import Column, String, DateTime
+
+from app.db.database import Base
+
+
+class RevokedToken(Base):
+    """
+    Revocation index for JWTs. A row only needs to outlive the token it revokes,
+    so expires_at is the token's own exp and expired rows are purged in the
+    background (see app/services/token_revocation.py).
+    """
+    __tablename__ = "revoked_tokens"
+
+    # jti of an access/refresh token, "family:<id>" for a whole refresh-token family,
+    # or the SHA-256 of a token issued without a jti
+    token_id = Column(String(80), primary_key=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
@@ -1,5 +1,5 @@
 # app/models/version.py (or wherever you place EventVersion model)
-from sqlalchemy import Column, Integer, ForeignKey, UniqueConstraint, DateTime
+from sqlalchemy import Column, Integer, ForeignKey, Index, DateTime
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -10,17 +10,23 @@ from app.db.database import Base
 class EventVersion(Base):
     __tablename__ = "event_versions"
 
-    id = Column(Integer, primary_key=True, index=True)
+    # The table is range-partitioned by month on timestamp (see app/services/history_archive.py),
+    # so the partition key is part of the primary key
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     event_id = Column(Integer, ForeignKey("events.id", ondelete="CASCADE"), nullable=False)
     version_number = Column(Integer, nullable=False)
     data = Column(JSONB, nullable=False) # Snapshot of event data
     changed_by_user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
-    timestamp = Column(DateTime(timezone=True), default=datetime.utcnow) # Corresponds to TIMESTAMPTZ
+    timestamp = Column(DateTime(timezone=True), primary_key=True, default=datetime.utcnow) # Corresponds to TIMESTAMPTZ
 
     # Relationships
     event = relationship("Event", back_populates="versions")
     changed_by_user_detail = relationship("User", back_populates="event_versions_changed") 
-    # Define the unique constraint
+    # Unique indexes on a partitioned table must include the partition key, so
+    # (event_id, version_number) is only indexed; numbers are assigned under the
+    # event's row lock, or in write-behind mode under the event's history lock
+    # (see lock_event_history in app/services/history_outbox.py)
     __table_args__ = (
-        UniqueConstraint('event_id', 'version_number', name='uq_event_version'),
+        Index('idx_event_versions_event_id_version_number', 'event_id', 'version_number'),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
     )
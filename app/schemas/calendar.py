@@ -0,0 +1,7 @@
+# app/schemas/calendar.py
+from pydantic import BaseModel
+
+
+class CalendarFeedResponse(BaseModel):
+    url: str # Subscribe to this URL from a calendar app; it works without other credentials
+    token: str # Shown once; creating a new feed revokes the previous URL
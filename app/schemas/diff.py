@@ -0,0 +1,15 @@
+# app/schemas/diff.py
+from pydantic import BaseModel
+from typing import Optional, Dict, Any, List
+
+class EventVersionStepDiff(BaseModel):
+    from_version: int
+    to_version: int
+    changes: Dict[str, Any] # Keyed by field path, e.g. "recurrence_pattern.interval"
+
+class EventVersionRangeDiffResponse(BaseModel):
+    event_id: int
+    from_version: int
+    to_version: int
+    changes: Dict[str, Any] # Cumulative diff between the two ends of the range
+    steps: Optional[List[EventVersionStepDiff]] = None # Only populated when include_steps=true
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
-from typing import Optional, Union
-from datetime import datetime
+from typing import Literal, Optional, Union, List
+from datetime import date, datetime
 
 class EventCreate(BaseModel):
     title: str
@@ -20,6 +20,24 @@ class EventUpdate(BaseModel):
     is_recurring: Optional[bool] = None
     recurrence_pattern: Optional[dict] = None
 
+class EventBulkFilter(BaseModel):
+    title: Optional[str] = None
+    start_time_after: Optional[datetime] = None
+    start_time_before: Optional[datetime] = None
+
+class EventBulkUpdate(BaseModel):
+    ids: Optional[List[int]] = None # Either ids or filter selects the events
+    filter: Optional[EventBulkFilter] = None
+    patch: EventUpdate
+
+class EventBulkDelete(BaseModel):
+    ids: Optional[List[int]] = None
+    filter: Optional[EventBulkFilter] = None
+
+class EventBulkResult(BaseModel):
+    count: int
+    event_ids: List[int]
+
 class EventResponse(BaseModel):
     id: int
     title: str
@@ -35,3 +53,22 @@ class EventResponse(BaseModel):
 
     class Config:
         from_attributes = True  # For Pydantic v2 (previously orm_mode=True)
+
+class EventLookupResult(BaseModel):
+    id: int
+    found: bool # False if the event does not exist or is not visible to the caller
+    event: Optional[EventResponse] = None
+
+class EventBatchReadResponse(BaseModel):
+    items: List[EventLookupResult] # One per requested id, in request order
+
+HeatmapBucketSize = Literal["day", "week", "month"]
+
+class EventHeatmapBucket(BaseModel):
+    start: date # First day of the bucket (weeks start on Monday)
+    count: int
+    busy_minutes: Optional[int] = None # Only with ?busy_minutes=true
+
+class EventHeatmapResponse(BaseModel):
+    bucket: HeatmapBucketSize
+    items: List[EventHeatmapBucket] # Buckets without events are omitted
@@ -1,8 +1,30 @@
+import base64
+import binascii
 from pydantic import BaseModel
-from typing import List, Generic, TypeVar
+from typing import List, Generic, Optional, TypeVar
 
 T = TypeVar("T")
 
 class PaginatedResponse(BaseModel, Generic[T]):
     items: List[T]
     total: int
+
+class CursorPage(BaseModel, Generic[T]):
+    """
+    Keyset page: next_cursor is passed back as ?cursor= to fetch the following
+    page and is null on the last one. No total is computed.
+    """
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+def encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(str(last_id).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Optional[int]:
+    """Returns the id encoded in the cursor, or None if the cursor is malformed."""
+    try:
+        value = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        return int(value)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
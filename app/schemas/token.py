@@ -6,6 +6,9 @@ class Token(BaseModel):
     access_token: str
     token_type: str
 
+class TokenPair(Token):
+    refresh_token: str
+
 class TokenData(BaseModel):
     sub: Optional[str] = None
 
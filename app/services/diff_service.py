@@ -0,0 +1,107 @@
+# app/services/diff_service.py
+import difflib
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Hashable, Iterable, List, Optional
+
+from app.core.config import settings
+from app.core.metrics import CACHE_REQUESTS
+
+
+def _text_line_diff(old_text: str, new_text: str) -> List[str]:
+    """Unified diff of two text values, without the file header lines."""
+    lines = difflib.unified_diff(
+        old_text.splitlines(),
+        new_text.splitlines(),
+        lineterm="",
+        n=1,
+    )
+    return [line for line in lines if not line.startswith(("---", "+++"))]
+
+
+def _is_multiline(value: Any) -> bool:
+    return isinstance(value, str) and "\n" in value
+
+
+def diff_snapshots(
+    old: Optional[Dict[str, Any]],
+    new: Optional[Dict[str, Any]],
+    _prefix: str = "",
+) -> Dict[str, Any]:
+    """
+    Diff two snapshot dicts.
+    - Nested dicts (e.g. recurrence_pattern) are walked and reported by dotted path.
+    - Multi-line text values are reported as a line-level unified diff.
+    - Everything else is reported as an old/new pair.
+    """
+    old = old or {}
+    new = new or {}
+    result: Dict[str, Any] = {}
+
+    for key in sorted(set(old.keys()).union(new.keys())):
+        path = f"{_prefix}{key}"
+        old_value = old.get(key)
+        new_value = new.get(key)
+        if old_value == new_value:
+            continue
+
+        if isinstance(old_value, dict) and isinstance(new_value, dict):
+            result.update(diff_snapshots(old_value, new_value, f"{path}."))
+        elif _is_multiline(old_value) or _is_multiline(new_value):
+            result[path] = {
+                "line_diff": _text_line_diff(old_value or "", new_value or "")
+            }
+        else:
+            result[path] = {"old": old_value, "new": new_value}
+    return result
+
+
+class DiffCache:
+    """
+    Bounded LRU cache for computed diffs.
+    Event versions are immutable, so an entry keyed by version ids only goes stale
+    when history compaction deletes one of its versions. discard_versions drops
+    those in the compacting worker; readers confirm the versions still exist
+    before using a cached entry.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, Dict[str, Any]]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+        CACHE_REQUESTS.labels("diff", "miss" if value is None else "hit").inc()
+        return value
+
+    def set(self, key: Hashable, value: Dict[str, Any]) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard_versions(self, version_ids: Iterable[int]) -> None:
+        """Drops the diffs involving any of the versions; keys are (event_id, version_id, version_id)."""
+        removed = set(version_ids)
+        if not removed:
+            return
+        with self._lock:
+            for key in [key for key in self._entries if removed.intersection(key[1:])]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+diff_cache = DiffCache(maxsize=settings.DIFF_CACHE_SIZE)
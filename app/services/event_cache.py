@@ -0,0 +1,185 @@
+# app/services/event_cache.py
+"""
+In-process cache for hot event reads (single event and changelog bodies) and
+the per-event ACLs used to authorize them.
+
+- Entries are invalidated by the CRUD functions that change an event, its
+  history or its permissions, right after they commit. Other worker processes
+  only see the change once EVENT_CACHE_TTL_SECONDS has passed.
+- Memory is bounded by entry count and by total body size (LRU eviction).
+- Concurrent misses for the same key are coalesced: one caller loads, the
+  others wait for its result (single-flight). A load that overlaps an
+  invalidation is returned to its callers but not stored. Request handlers use
+  get_or_load_async, which serves hits on the event loop and runs misses in the
+  threadpool, so concurrent misses actually overlap and coalesce.
+- A load that ran on a replica session is not stored within
+  READ_YOUR_WRITES_SECONDS (the replica lag the app allows for) of an
+  invalidation of its key, as the replica may not have the change yet.
+"""
+import time
+from collections import OrderedDict
+from threading import Event as ThreadEvent, Lock
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.metrics import CACHE_REQUESTS
+
+CacheKey = Tuple[int, str] # (event_id, kind); kind is "acl", "event" or "changelog"
+
+_MISSING = object()
+
+
+class _Flight:
+    __slots__ = ("done", "value", "error", "stale")
+
+    def __init__(self):
+        self.done = ThreadEvent()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+        self.stale = False
+
+
+def _size_of(value: Any) -> int:
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, frozenset):
+        return 216 + 40 * len(value) # Rough set + int overhead
+    return 256
+
+
+class EventReadCache:
+    def __init__(self, maxsize: int, max_bytes: int, ttl: float):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[CacheKey, Tuple[Any, float, int]]" = OrderedDict() # value, expires_at, size
+        self._flights: Dict[CacheKey, _Flight] = {}
+        self._invalidated_at: Dict[CacheKey, float] = {} # monotonic time of the key's last invalidation
+        self._cleared_at = 0.0
+        self._bytes = 0
+        self._lock = Lock()
+
+    def get_or_load(self, event_id: int, kind: str, loader: Callable[[], Any], replica: bool = False) -> Any:
+        """
+        Returns the cached value for (event_id, kind), or calls loader once for
+        all concurrent callers. None results are returned but never cached.
+        Pass replica=True when loader reads from a replica session.
+        """
+        if self.maxsize <= 0:
+            return loader()
+        key = (event_id, kind)
+        with self._lock:
+            value = self._lookup(key)
+            if value is not _MISSING:
+                return value
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            CACHE_REQUESTS.labels("event_read", "coalesced").inc()
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        CACHE_REQUESTS.labels("event_read", "miss").inc()
+        try:
+            flight.value = loader()
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+                if (
+                    flight.error is None and flight.value is not None and not flight.stale
+                    and not (replica and self._recently_invalidated(key))
+                ):
+                    self._store(key, flight.value)
+            flight.done.set()
+        return flight.value
+
+    async def get_or_load_async(
+        self, event_id: int, kind: str, loader: Callable[[], Any], replica: bool = False
+    ) -> Any:
+        """
+        get_or_load for async handlers: a hit is returned without leaving the event
+        loop; on a miss, get_or_load (and so loader) runs in the threadpool.
+        """
+        if self.maxsize > 0:
+            with self._lock:
+                value = self._lookup((event_id, kind))
+            if value is not _MISSING:
+                return value
+        return await run_in_threadpool(self.get_or_load, event_id, kind, loader, replica)
+
+    def _lookup(self, key: CacheKey) -> Any:
+        """The fresh cached value for key, or _MISSING; caller holds the lock."""
+        entry = self._entries.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            return _MISSING
+        self._entries.move_to_end(key)
+        CACHE_REQUESTS.labels("event_read", "hit").inc()
+        return entry[0]
+
+    def _store(self, key: CacheKey, value: Any) -> None:
+        size = _size_of(value)
+        if size > self.max_bytes:
+            return
+        self._discard(key)
+        self._entries[key] = (value, time.monotonic() + self.ttl, size)
+        self._bytes += size
+        while len(self._entries) > self.maxsize or self._bytes > self.max_bytes:
+            _, (_, _, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+
+    def _recently_invalidated(self, key: CacheKey) -> bool:
+        since = time.monotonic() - settings.READ_YOUR_WRITES_SECONDS
+        return self._cleared_at > since or self._invalidated_at.get(key, 0.0) > since
+
+    def _discard(self, key: CacheKey) -> None:
+        now = time.monotonic()
+        self._invalidated_at[key] = now
+        if len(self._invalidated_at) > 10_000:
+            since = now - settings.READ_YOUR_WRITES_SECONDS
+            self._invalidated_at = {k: v for k, v in self._invalidated_at.items() if v > since}
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+        flight = self._flights.get(key)
+        if flight is not None:
+            flight.stale = True
+
+    def invalidate(self, event_id: int, kinds: Iterable[str] = ("acl", "event", "changelog")) -> None:
+        with self._lock:
+            for kind in kinds:
+                self._discard((event_id, kind))
+
+    def invalidate_many(self, event_ids: Iterable[int], kinds: Iterable[str] = ("acl", "event", "changelog")) -> None:
+        kinds = tuple(kinds)
+        with self._lock:
+            for event_id in event_ids:
+                for kind in kinds:
+                    self._discard((event_id, kind))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._cleared_at = time.monotonic()
+            for flight in self._flights.values():
+                flight.stale = True
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+event_read_cache = EventReadCache(
+    maxsize=settings.EVENT_CACHE_SIZE,
+    max_bytes=settings.EVENT_CACHE_MAX_BYTES,
+    ttl=settings.EVENT_CACHE_TTL_SECONDS
+)
@@ -0,0 +1,105 @@
+# app/services/event_rollup.py
+"""
+event_day_rollups: number and total length of each owner's events per UTC start
+day, read by GET /api/events/heatmap when EVENT_HEATMAP_SOURCE=rollup.
+
+- Statement-level triggers on events keep it up to date. Each INSERT, UPDATE or
+  DELETE statement applies its net change per (owner, day) from its transition
+  tables, so a batch of 500 events is one upsert, and an update that does not
+  move an event or change its length writes nothing.
+- Rows that drop to zero events are deleted. Deleting a user deletes their
+  events and with them their rollup rows, which is why owner_id has no
+  foreign key.
+- install_rollup creates the triggers and rebuilds the table from events while
+  writes to events are blocked; run it once before switching the source:
+
+    python -m app.services.event_rollup          # install and rebuild
+    python -m app.services.event_rollup --drop   # remove the triggers
+"""
+import logging
+import sys
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Must match _UTC_START and _BUSY_MINUTES in app/crud/crud_event.py
+_DAY = "(start_time AT TIME ZONE 'UTC')::date"
+_MINUTES = "greatest(round(extract(epoch FROM end_time - start_time) / 60)::bigint, 0)"
+
+_DELTA = f"SELECT owner_id, {_DAY} AS day, {{sign}} AS event_count, {{sign}} * {_MINUTES} AS busy_minutes FROM {{rows}}"
+
+_APPLY = """
+        INSERT INTO event_day_rollups AS r (owner_id, day, event_count, busy_minutes)
+        SELECT owner_id, day, sum(event_count), sum(busy_minutes) FROM ({deltas}) delta
+        GROUP BY owner_id, day
+        HAVING sum(event_count) <> 0 OR sum(busy_minutes) <> 0
+        ORDER BY owner_id, day -- Same lock order in every statement, so concurrent writers cannot deadlock
+        ON CONFLICT (owner_id, day) DO UPDATE SET
+            event_count = r.event_count + excluded.event_count,
+            busy_minutes = r.busy_minutes + excluded.busy_minutes;"""
+
+_CLEAN_UP = f"""
+        DELETE FROM event_day_rollups r USING (SELECT DISTINCT owner_id, {_DAY} AS day FROM old_rows) removed
+        WHERE r.owner_id = removed.owner_id AND r.day = removed.day AND r.event_count = 0;"""
+
+_INSERTED = _DELTA.format(sign=1, rows="new_rows")
+_DELETED = _DELTA.format(sign=-1, rows="old_rows")
+
+# PL/pgSQL plans each statement on first use, so branches that name a transition
+# table the current trigger does not have are never planned
+_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION event_day_rollups_apply() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN{_APPLY.format(deltas=_INSERTED)}
+    ELSIF TG_OP = 'UPDATE' THEN{_APPLY.format(deltas=f"{_INSERTED} UNION ALL {_DELETED}")}{_CLEAN_UP}
+    ELSE{_APPLY.format(deltas=_DELETED)}{_CLEAN_UP}
+    END IF;
+    RETURN NULL;
+END
+$$"""
+
+_TRIGGERS = {
+    "events_rollup_insert": "AFTER INSERT ON events REFERENCING NEW TABLE AS new_rows",
+    "events_rollup_update": "AFTER UPDATE ON events REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows",
+    "events_rollup_delete": "AFTER DELETE ON events REFERENCING OLD TABLE AS old_rows",
+}
+
+_REBUILD = f"""
+    INSERT INTO event_day_rollups (owner_id, day, event_count, busy_minutes)
+    SELECT owner_id, {_DAY}, count(*), sum({_MINUTES}) FROM events GROUP BY 1, 2
+"""
+
+
+def drop_rollup_triggers(db: Session) -> None:
+    for name in _TRIGGERS:
+        db.execute(text(f"DROP TRIGGER IF EXISTS {name} ON events"))
+
+
+def install_rollup(db: Session) -> int:
+    """
+    (Re)creates the triggers and rebuilds event_day_rollups in the caller's
+    transaction; returns the number of rollup rows. Writes to events wait until
+    the transaction ends, reads do not.
+    """
+    db.execute(text("LOCK TABLE events IN SHARE ROW EXCLUSIVE MODE"))
+    drop_rollup_triggers(db)
+    db.execute(text(_FUNCTION))
+    for name, definition in _TRIGGERS.items():
+        db.execute(text(f"CREATE TRIGGER {name} {definition} FOR EACH STATEMENT EXECUTE FUNCTION event_day_rollups_apply()"))
+    db.execute(text("DELETE FROM event_day_rollups"))
+    return db.execute(text(_REBUILD)).rowcount
+
+
+if __name__ == "__main__":
+    from app.db.database import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    with SessionLocal() as session:
+        if "--drop" in sys.argv[1:]:
+            drop_rollup_triggers(session)
+            logger.info("Dropped the event_day_rollups triggers")
+        else:
+            logger.info("Rebuilt event_day_rollups: %d rows", install_rollup(session))
+        session.commit()
@@ -0,0 +1,56 @@
+# app/services/event_snapshot.py
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable
+
+from sqlalchemy import DateTime, Table
+
+from app.models.event import Event
+
+
+class EventSnapshotCodec:
+    """
+    Encodes Event rows into JSON-safe snapshot dicts (stored in EventVersion.data)
+    and decodes them back into typed column values.
+    Column types are resolved once from the table definition, so restoring a
+    snapshot is a single dict walk with no per-call schema introspection.
+    """
+
+    def __init__(self, table: Table, non_restorable: Iterable[str]):
+        # Generated columns (e.g. the search vector) are derived data, not event state
+        stored_columns = [c for c in table.columns if c.computed is None]
+        self.columns = tuple(c.key for c in stored_columns)
+        self.restorable = tuple(k for k in self.columns if k not in set(non_restorable))
+        self._decoders: Dict[str, Callable[[Any], Any]] = {
+            c.key: self._decode_datetime
+            for c in stored_columns
+            if isinstance(c.type, DateTime)
+        }
+
+    @staticmethod
+    def _decode_datetime(value: Any) -> Any:
+        # Snapshots are written with isoformat(), which fromisoformat reads back exactly
+        return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+    def encode(self, obj: Any) -> Dict[str, Any]:
+        """Snapshot every column of an Event, with datetimes as ISO strings."""
+        result = {}
+        for key in self.columns:
+            value = getattr(obj, key)
+            result[key] = value.isoformat() if isinstance(value, datetime) else value
+        return result
+
+    def decode(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Typed values for the restorable fields present in a snapshot."""
+        result = {}
+        for key in self.restorable:
+            if key in data:
+                decoder = self._decoders.get(key)
+                result[key] = decoder(data[key]) if decoder else data[key]
+        return result
+
+
+# id, ownership and timestamps are never restored from a snapshot
+event_snapshot_codec = EventSnapshotCodec(
+    Event.__table__,
+    non_restorable=("id", "owner_id", "created_at", "updated_at"),
+)
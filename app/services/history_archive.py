@@ -0,0 +1,367 @@
+# app/services/history_archive.py
+"""
+Monthly partitions for event_versions and changelog, and archival of old ones.
+
+- ensure_partitions creates the partitions for the current month and the next
+  HISTORY_PARTITION_MONTHS_AHEAD months, plus a DEFAULT partition for anything
+  outside them, so inserts never wait for DDL.
+- archive_expired_partitions moves each partition older than
+  HISTORY_RETENTION_MONTHS to HISTORY_ARCHIVE_DIR/<table>/<YYYY-MM>.<run>.jsonl.gz
+  and drops it. Each event's rows are written as a separate gzip member, so the
+  file is still plain gzipped JSON lines. history_archive_segments records where
+  each member starts, and reads decompress only the members they need.
+- A month can be archived more than once (rows that reached the DEFAULT
+  partition after its first archival get a partition of their own again). Each
+  run writes a new file, and reads merge the segments of all of them.
+- HistoryArchiver runs both as the history_partitions scheduled job. To run them once
+  (e.g. from cron):
+
+    python -m app.services.history_archive
+"""
+import gzip
+import itertools
+import json
+import logging
+import os
+import re
+from datetime import date, datetime, timezone
+from operator import itemgetter
+from typing import Any, Callable, Collection, Dict, List
+
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.history_archive import HistoryArchiveSegment
+from app.models.version import EventVersion
+
+logger = logging.getLogger(__name__)
+
+# Columns written to the archive, per partitioned table
+ARCHIVED_TABLES: Dict[str, tuple] = {
+    "event_versions": ("id", "event_id", "version_number", "data", "changed_by_user_id", "timestamp"),
+    "changelog": ("id", "event_id", "version_id", "user_id", "timestamp", "changes"),
+}
+
+# Transaction-level advisory lock taken for partition DDL and archival, so only
+# one process (across all app workers) changes partitions at a time.
+ARCHIVE_ADVISORY_LOCK_KEY = 0x0E7E_0A2C
+
+_PARTITION_SUFFIX = re.compile(r"_y(\d{4})m(\d{2})$")
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _current_month() -> date:
+    return datetime.now(timezone.utc).date().replace(day=1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_y{month.year}m{month.month:02d}"
+
+
+def _try_lock(db: Session) -> bool:
+    return db.execute(
+        text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": ARCHIVE_ADVISORY_LOCK_KEY}
+    ).scalar()
+
+
+def is_partitioned(db: Session, table: str) -> bool:
+    """False for databases created before partitioning; they are left alone."""
+    return db.execute(
+        text("""
+            SELECT EXISTS (
+                SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid
+                WHERE c.relname = :table
+            )
+        """),
+        {"table": table}
+    ).scalar()
+
+
+def monthly_partitions(db: Session, table: str) -> Dict[date, str]:
+    """Month -> partition name for the monthly partitions of table (not the DEFAULT one)."""
+    names = db.execute(
+        text("""
+            SELECT c.relname FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            JOIN pg_class p ON p.oid = i.inhparent
+            WHERE p.relname = :table
+        """),
+        {"table": table}
+    ).scalars()
+    partitions = {}
+    for name in names:
+        match = _PARTITION_SUFFIX.search(name)
+        if match and name == partition_name(table, date(int(match[1]), int(match[2]), 1)):
+            partitions[date(int(match[1]), int(match[2]), 1)] = name
+    return partitions
+
+
+def _create_partition(db: Session, table: str, month: date) -> str:
+    """
+    Creates the month's partition. Rows for that month already in the DEFAULT
+    partition (older databases, or rows written before the partition existed)
+    are moved into it first, since ATTACH refuses to overlap them.
+    """
+    name = partition_name(table, month)
+    start, end = f"{month.isoformat()} 00:00:00+00", f"{_add_months(month, 1).isoformat()} 00:00:00+00"
+    db.execute(text(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS)"))
+    db.execute(
+        text(f"""
+            WITH moved AS (
+                DELETE FROM {table}_default
+                WHERE timestamp >= CAST(:start AS timestamptz) AND timestamp < CAST(:end AS timestamptz)
+                RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+        """),
+        {"start": start, "end": end}
+    )
+    db.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM ('{start}') TO ('{end}')"))
+    return name
+
+
+def ensure_partitions(db: Session, months_ahead: int = settings.HISTORY_PARTITION_MONTHS_AHEAD) -> List[str]:
+    """
+    Creates the missing partitions from the current month up to months_ahead
+    months later, and for every month that has rows in the DEFAULT partition, so
+    existing history ends up in monthly partitions that can be archived.
+    Returns the names of the new partitions. Runs in the caller's transaction.
+    """
+    current = _current_month()
+    created = []
+    for table in ARCHIVED_TABLES:
+        if not is_partitioned(db, table):
+            continue
+        db.execute(text(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT"))
+        existing = monthly_partitions(db, table)
+        months = {_add_months(current, offset) for offset in range(months_ahead + 1)}
+        months.update(db.execute(text(
+            f"SELECT DISTINCT CAST(date_trunc('month', timestamp AT TIME ZONE 'UTC') AS date) FROM {table}_default"
+        )).scalars())
+        for month in sorted(months - existing.keys()):
+            try:
+                with db.begin_nested():
+                    created.append(_create_partition(db, table, month))
+            except Exception:
+                logger.exception("Could not create partition %s", partition_name(table, month))
+    return created
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot archive value of type {type(value).__name__}")
+
+
+def archive_partition(db: Session, table: str, month: date, name: str, archive_dir: str) -> int:
+    """
+    Writes partition `name` to a new archive file, records its segments, detaches and
+    drops it, all in the caller's transaction; returns the number of rows archived.
+    If the transaction does not commit, the file is left behind unreferenced and
+    the next run writes another one.
+    """
+    run = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+    relative_path = os.path.join(table, f"{month:%Y-%m}.{run}.jsonl.gz")
+    path = os.path.join(archive_dir, relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    db.execute(text(f"LOCK TABLE {name} IN SHARE MODE")) # No writes while it is exported
+    rows = db.execute(
+        text(f"SELECT {', '.join(ARCHIVED_TABLES[table])} FROM {name} ORDER BY event_id, id"),
+        execution_options={"stream_results": True, "yield_per": 1000}
+    ).mappings()
+
+    segments = []
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as out:
+        for event_id, event_rows in itertools.groupby(rows, key=itemgetter("event_id")):
+            event_rows = list(event_rows)
+            member = gzip.compress(b"".join(
+                json.dumps(dict(row), default=_json_default, separators=(",", ":")).encode() + b"\n"
+                for row in event_rows
+            ))
+            version_numbers = [row["version_number"] for row in event_rows] if table == "event_versions" else None
+            segments.append({
+                "event_id": event_id,
+                "table_name": table,
+                "month": month,
+                "path": relative_path,
+                "byte_offset": out.tell(),
+                "byte_length": len(member),
+                "row_count": len(event_rows),
+                "min_row_id": event_rows[0]["id"],
+                "max_row_id": event_rows[-1]["id"],
+                "min_version_number": min(version_numbers) if version_numbers else None,
+                "max_version_number": max(version_numbers) if version_numbers else None,
+            })
+            out.write(member)
+        out.flush()
+        os.fsync(out.fileno())
+
+    if segments:
+        os.replace(tmp_path, path)
+        db.execute(insert(HistoryArchiveSegment), segments)
+    else:
+        os.remove(tmp_path)
+    db.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+    db.execute(text(f"DROP TABLE {name}"))
+    return sum(segment["row_count"] for segment in segments)
+
+
+def archive_expired_partitions(
+    db: Session,
+    retention_months: int = settings.HISTORY_RETENTION_MONTHS,
+    archive_dir: str = settings.HISTORY_ARCHIVE_DIR
+) -> int:
+    """
+    Archives every monthly partition that ended before the retention window, one
+    partition per transaction; returns the number of rows archived.
+    """
+    if retention_months <= 0:
+        return 0
+    cutoff = _add_months(_current_month(), -(retention_months - 1))
+    archived = 0
+    for table in ARCHIVED_TABLES:
+        if not is_partitioned(db, table):
+            continue
+        for month, name in sorted(monthly_partitions(db, table).items()):
+            if month >= cutoff:
+                break
+            if not _try_lock(db):
+                db.rollback()
+                return archived
+            if db.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar() is None:
+                db.rollback() # Archived by another process since it was listed
+                continue
+            count = archive_partition(db, table, month, name, archive_dir)
+            db.commit()
+            archived += count
+            logger.info("Archived %d rows from %s", count, name)
+    return archived
+
+
+# --- Lazy reads of archived history ---
+
+def _read_segment(segment: HistoryArchiveSegment, archive_dir: str = settings.HISTORY_ARCHIVE_DIR) -> List[Dict[str, Any]]:
+    with open(os.path.join(archive_dir, segment.path), "rb") as archive:
+        archive.seek(segment.byte_offset)
+        member = archive.read(segment.byte_length)
+    return [json.loads(line) for line in gzip.decompress(member).splitlines()]
+
+
+def _segments(db: Session, event_id: int, table: str, *criteria) -> List[HistoryArchiveSegment]:
+    return (
+        db.query(HistoryArchiveSegment)
+        .filter(HistoryArchiveSegment.event_id == event_id, HistoryArchiveSegment.table_name == table, *criteria)
+        .order_by(HistoryArchiveSegment.month, HistoryArchiveSegment.min_row_id)
+        .all()
+    )
+
+
+def _version_from_row(row: Dict[str, Any]) -> EventVersion:
+    # Transient instance: never added to a session
+    return EventVersion(
+        id=row["id"],
+        event_id=row["event_id"],
+        version_number=row["version_number"],
+        data=row["data"],
+        changed_by_user_id=row["changed_by_user_id"],
+        timestamp=datetime.fromisoformat(row["timestamp"])
+    )
+
+
+def archived_changelog(db: Session, event_id: int) -> List[Dict[str, Any]]:
+    """Archived changelog rows of the event (timestamps as ISO strings), oldest first."""
+    rows = []
+    for segment in _segments(db, event_id, "changelog"):
+        rows.extend(_read_segment(segment))
+    # Segments of one month from different runs can interleave in time
+    return sorted(rows, key=lambda row: (datetime.fromisoformat(row["timestamp"]), row["id"]))
+
+
+def archived_versions_by_id(db: Session, event_id: int, version_ids: Collection[int]) -> Dict[int, EventVersion]:
+    if not version_ids:
+        return {}
+    segments = _segments(
+        db, event_id, "event_versions",
+        HistoryArchiveSegment.min_row_id <= max(version_ids),
+        HistoryArchiveSegment.max_row_id >= min(version_ids)
+    )
+    return {
+        row["id"]: _version_from_row(row)
+        for segment in segments
+        for row in _read_segment(segment)
+        if row["id"] in version_ids
+    }
+
+
+def archived_versions_in_range(db: Session, event_id: int, from_version: int, to_version: int) -> List[EventVersion]:
+    """Archived versions numbered from_version..to_version, in version order."""
+    segments = _segments(
+        db, event_id, "event_versions",
+        HistoryArchiveSegment.min_version_number <= to_version,
+        HistoryArchiveSegment.max_version_number >= from_version
+    )
+    versions = [
+        _version_from_row(row)
+        for segment in segments
+        for row in _read_segment(segment)
+        if from_version <= row["version_number"] <= to_version
+    ]
+    return sorted(versions, key=lambda version: version.version_number)
+
+
+def latest_archived_version_number(event_id: int):
+    """Scalar subquery: highest archived version number of the event, 0 if none."""
+    return (
+        select(func.coalesce(func.max(HistoryArchiveSegment.max_version_number), 0))
+        .where(HistoryArchiveSegment.event_id == event_id, HistoryArchiveSegment.table_name == "event_versions")
+        .scalar_subquery()
+    )
+
+
+def latest_version_numbers(db: Session, event_ids: Collection[int]) -> Dict[int, int]:
+    """Highest version number per event across the live table and the archive."""
+    latest = dict(
+        db.query(HistoryArchiveSegment.event_id, func.max(HistoryArchiveSegment.max_version_number))
+        .filter(HistoryArchiveSegment.event_id.in_(event_ids), HistoryArchiveSegment.table_name == "event_versions")
+        .group_by(HistoryArchiveSegment.event_id)
+        .all()
+    )
+    for event_id, version_number in (
+        db.query(EventVersion.event_id, func.max(EventVersion.version_number))
+        .filter(EventVersion.event_id.in_(event_ids))
+        .group_by(EventVersion.event_id)
+    ):
+        latest[event_id] = max(version_number, latest.get(event_id, 0))
+    return latest
+
+
+class HistoryArchiver:
+    """Creates upcoming partitions and archives expired ones; scheduled as the history_partitions job."""
+
+    def __init__(self, session_factory: Callable[[], Session]):
+        self.session_factory = session_factory
+
+    def run_once(self) -> int:
+        """Returns the number of rows archived; does nothing if another process holds the lock."""
+        with self.session_factory() as db:
+            if not _try_lock(db):
+                return 0
+            created = ensure_partitions(db)
+            db.commit()
+            if created:
+                logger.info("Created history partitions: %s", ", ".join(created))
+            return archive_expired_partitions(db)
+
+
+if __name__ == "__main__":
+    from app.db.database import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    HistoryArchiver(SessionLocal).run_once()
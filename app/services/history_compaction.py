@@ -0,0 +1,239 @@
+# app/services/history_compaction.py
+"""
+Compaction of event history written in bursts of small edits (e.g. integrations
+that update an event every few minutes).
+
+- A run is a sequence of consecutive versions of one event by the same user,
+  each within HISTORY_COMPACTION_WINDOW_SECONDS of the run's first version.
+  A run is merged into its first version, whose snapshot is the state before
+  the whole run. Its changelog entries become one entry on that version, with
+  each field's first "old" and last "new" value. Fields that ended where they
+  started are dropped, and the entry itself is dropped if nothing is left.
+- Surviving versions keep their ids and version_numbers, so numbers stay in
+  update order with gaps where versions were merged. The latest version of an
+  event and versions younger than HISTORY_COMPACTION_MIN_AGE_SECONDS are never
+  touched, so new versions keep counting up from the same number and recent
+  edits can still be undone one at a time.
+- Each event is compacted in its own short transaction under the event's row
+  lock (the lock update_event and rollbacks take); events locked by a request
+  are skipped until the next run. Archived partitions are not compacted.
+- HistoryCompactor runs it as the history_compaction scheduled job, hottest
+  events first. To run it once:
+
+    python -m app.services.history_compaction
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence
+
+from sqlalchemy import delete, func, literal_column, select, text, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import HISTORY_COMPACTED_BYTES, HISTORY_COMPACTED_ROWS
+from app.models.changelog import Changelog
+from app.models.event import Event
+from app.models.version import EventVersion
+from app.services.diff_service import diff_cache
+from app.services.event_cache import event_read_cache
+
+logger = logging.getLogger(__name__)
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Events with at least one pair of adjacent versions that would merge, most pairs
+# first. A pair ending at the event's latest version does not count, as that
+# version is kept.
+_CANDIDATES = text("""
+    SELECT event_id FROM (
+        SELECT event_id, timestamp,
+               changed_by_user_id = lag(changed_by_user_id) OVER w
+                   AND timestamp - lag(timestamp) OVER w <= make_interval(secs => :window) AS mergeable,
+               lead(version_number) OVER w IS NOT NULL AS has_newer
+        FROM event_versions
+        WHERE timestamp >= :since
+        WINDOW w AS (PARTITION BY event_id ORDER BY version_number)
+    ) v
+    WHERE mergeable AND has_newer AND timestamp < :cutoff
+    GROUP BY event_id
+    ORDER BY count(*) DESC
+    LIMIT :limit
+""")
+
+
+class CompactionResult(NamedTuple):
+    events: int
+    versions_deleted: int
+    changelog_deleted: int
+    bytes_reclaimed: int # pg_column_size of the deleted rows; the space is reused after VACUUM
+
+
+def find_runs(versions: Sequence[Any], latest_version_number: int, window: timedelta) -> List[List[Any]]:
+    """
+    Splits versions (rows with version_number, changed_by_user_id and timestamp, in
+    version order) into the runs that would be merged, each at least two long.
+    """
+    runs: List[List[Any]] = []
+    run: List[Any] = []
+    for version in versions:
+        if version.version_number >= latest_version_number:
+            break
+        if (
+            run
+            and version.changed_by_user_id is not None
+            and version.changed_by_user_id == run[0].changed_by_user_id
+            and version.timestamp - run[0].timestamp <= window
+        ):
+            run.append(version)
+            continue
+        if len(run) > 1:
+            runs.append(run)
+        run = [version]
+    if len(run) > 1:
+        runs.append(run)
+    return runs
+
+
+def merge_changes(changes: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """Net {field: {"old", "new"}} of consecutive changelog entries, oldest first."""
+    merged: Dict[str, Any] = {}
+    for entry in changes:
+        for field, change in entry.items():
+            if not isinstance(change, dict) or field not in merged or not isinstance(merged[field], dict):
+                merged[field] = change
+            else:
+                merged[field] = {"old": merged[field].get("old"), "new": change.get("new")}
+    return {
+        field: change for field, change in merged.items()
+        if not isinstance(change, dict) or change.get("old") != change.get("new")
+    }
+
+
+def compact_event(db: Session, event_id: int, cutoff: datetime, window: timedelta) -> Optional[CompactionResult]:
+    """
+    Merges the event's runs of versions older than cutoff, in the caller's
+    transaction. Returns None if the event is gone or locked by a request.
+    """
+    locked = (
+        db.query(Event.id)
+        .filter(Event.id == event_id)
+        .with_for_update(skip_locked=True, key_share=True) # Does not block version inserts (FK checks)
+        .scalar()
+    )
+    if locked is None:
+        return None
+
+    latest_version_number = db.execute(
+        select(func.max(EventVersion.version_number)).where(EventVersion.event_id == event_id)
+    ).scalar()
+    versions = db.execute(
+        select(EventVersion.id, EventVersion.version_number, EventVersion.changed_by_user_id, EventVersion.timestamp)
+        .where(EventVersion.event_id == event_id, EventVersion.timestamp < cutoff)
+        .order_by(EventVersion.version_number)
+    ).all()
+    runs = find_runs(versions, latest_version_number or 0, window)
+    if not runs:
+        return CompactionResult(1, 0, 0, 0)
+
+    entries_by_version: Dict[int, List[Any]] = defaultdict(list)
+    for entry in db.execute(
+        select(Changelog.id, Changelog.version_id, Changelog.timestamp, Changelog.changes)
+        .where(Changelog.event_id == event_id, Changelog.version_id.in_([v.id for run in runs for v in run]))
+        .order_by(Changelog.timestamp, Changelog.id)
+    ):
+        entries_by_version[entry.version_id].append(entry)
+
+    doomed_versions: List[int] = []
+    doomed_entries: List[int] = []
+    for run in runs:
+        doomed_versions.extend(version.id for version in run[1:])
+        entries = [entry for version in run for entry in entries_by_version[version.id]]
+        if not entries:
+            continue
+        merged = merge_changes([entry.changes for entry in entries])
+        if merged:
+            kept, *merged_away = entries
+            db.execute(
+                update(Changelog)
+                .where(Changelog.id == kept.id, Changelog.timestamp == kept.timestamp)
+                .values(version_id=run[0].id, changes=merged)
+            )
+            doomed_entries.extend(entry.id for entry in merged_away)
+        else:
+            doomed_entries.extend(entry.id for entry in entries)
+
+    version_bytes = db.execute(
+        delete(EventVersion)
+        .where(EventVersion.event_id == event_id, EventVersion.timestamp < cutoff, EventVersion.id.in_(doomed_versions))
+        .returning(func.pg_column_size(literal_column("event_versions")))
+    ).scalars().all()
+    changelog_bytes = db.execute(
+        delete(Changelog)
+        .where(Changelog.event_id == event_id, Changelog.id.in_(doomed_entries))
+        .returning(func.pg_column_size(literal_column("changelog")))
+    ).scalars().all() if doomed_entries else []
+
+    HISTORY_COMPACTED_ROWS.labels("event_versions").inc(len(version_bytes))
+    HISTORY_COMPACTED_ROWS.labels("changelog").inc(len(changelog_bytes))
+    HISTORY_COMPACTED_BYTES.labels("event_versions").inc(sum(version_bytes))
+    HISTORY_COMPACTED_BYTES.labels("changelog").inc(sum(changelog_bytes))
+    diff_cache.discard_versions(doomed_versions)
+    return CompactionResult(1, len(version_bytes), len(changelog_bytes), sum(version_bytes) + sum(changelog_bytes))
+
+
+class HistoryCompactor:
+    """Compacts the hottest events' history in batches; scheduled as the history_compaction job."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        window_seconds: float = settings.HISTORY_COMPACTION_WINDOW_SECONDS,
+        min_age_seconds: float = settings.HISTORY_COMPACTION_MIN_AGE_SECONDS,
+        batch_events: int = settings.HISTORY_COMPACTION_BATCH_EVENTS
+    ):
+        self.session_factory = session_factory
+        self.window = timedelta(seconds=window_seconds)
+        self.min_age = timedelta(seconds=min_age_seconds)
+        self.batch_events = batch_events
+        # Versions before this (less one window) have been fully compacted; the
+        # first run after start-up scans all live history
+        self._compacted_until: Optional[datetime] = None
+
+    def run_once(self) -> CompactionResult:
+        """Compacts up to batch_events events; returns what was reclaimed."""
+        cutoff = datetime.now(timezone.utc) - self.min_age
+        since = self._compacted_until - self.window if self._compacted_until else _EPOCH
+        total = CompactionResult(0, 0, 0, 0)
+        skipped = False
+        with self.session_factory() as db:
+            event_ids = db.execute(_CANDIDATES, {
+                "since": since, "cutoff": cutoff, "window": self.window.total_seconds(), "limit": self.batch_events
+            }).scalars().all()
+            db.commit()
+            for event_id in event_ids:
+                result = compact_event(db, event_id, cutoff, self.window)
+                db.commit()
+                if result is None:
+                    skipped = True
+                    continue
+                if result.versions_deleted or result.changelog_deleted:
+                    event_read_cache.invalidate(event_id, kinds=("changelog",))
+                total = CompactionResult(*map(sum, zip(total, result)))
+        if len(event_ids) < self.batch_events and not skipped:
+            self._compacted_until = cutoff
+        if total.versions_deleted or total.changelog_deleted:
+            logger.info(
+                "Compacted history of %d events: %d versions and %d changelog entries deleted, %d bytes",
+                *total
+            )
+        return total
+
+
+if __name__ == "__main__":
+    from app.db.database import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    compactor = HistoryCompactor(SessionLocal)
+    while compactor.run_once().versions_deleted: # Until a run finds nothing more to merge
+        pass
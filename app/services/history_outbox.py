@@ -0,0 +1,211 @@
+# app/services/history_outbox.py
+"""
+Write-behind materialization of event history.
+
+With HISTORY_WRITE_BEHIND enabled, update_event commits the event change and a
+single EventHistoryOutbox row together. This module turns outbox rows into
+EventVersion and Changelog rows in batches, either from an asyncio task started
+by the app or from a separate process:
+
+    python -m app.services.history_outbox
+"""
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from sqlalchemy import insert, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.changelog import Changelog
+from app.models.outbox import EventHistoryOutbox
+from app.models.version import EventVersion
+from app.services.event_cache import event_read_cache
+from app.services import history_archive
+
+logger = logging.getLogger(__name__)
+
+# Transaction-level advisory lock held while a batch is materialized, so only one
+# worker (across all app processes) runs at a time.
+OUTBOX_ADVISORY_LOCK_KEY = 0x0E7E_0B0C
+
+# Class of the per-event transaction-level advisory locks (two-key form, keyed by
+# event_id) under which an event's pending history is given version numbers. The
+# worker skips events whose lock is taken; rollbacks wait for it.
+OUTBOX_EVENT_LOCK_CLASS = 0x0E7E_0B0D
+
+
+def lock_event_history(db: Session, event_id: int) -> None:
+    """Takes the event's history lock until the caller's transaction ends."""
+    db.execute(
+        text("SELECT pg_advisory_xact_lock(:lock_class, :event_id)"),
+        {"lock_class": OUTBOX_EVENT_LOCK_CLASS, "event_id": event_id}
+    )
+
+
+def _try_lock_event_history(db: Session, event_id: int) -> bool:
+    return db.execute(
+        text("SELECT pg_try_advisory_xact_lock(:lock_class, :event_id)"),
+        {"lock_class": OUTBOX_EVENT_LOCK_CLASS, "event_id": event_id}
+    ).scalar()
+
+
+def enqueue_history(
+    db: Session,
+    event_id: int,
+    user_id: int,
+    snapshot: Dict[str, Any],
+    changes: Dict[str, Any]
+) -> None:
+    """Adds an outbox row to the caller's transaction; nothing is flushed here."""
+    db.add(EventHistoryOutbox(
+        event_id=event_id,
+        user_id=user_id,
+        snapshot=snapshot,
+        changes=changes
+    ))
+
+
+def enqueue_history_many(db: Session, entries: List[Dict[str, Any]]) -> None:
+    """
+    Multi-row variant of enqueue_history for bulk updates.
+    Each entry has event_id, user_id, snapshot and changes.
+    """
+    if entries:
+        db.execute(insert(EventHistoryOutbox), entries)
+
+
+def materialize_pending_history(
+    db: Session,
+    batch_size: Optional[int] = None,
+    event_id: Optional[int] = None,
+    touched_event_ids: Optional[Set[int]] = None
+) -> int:
+    """
+    Converts pending outbox rows into EventVersion/Changelog rows inside the
+    caller's transaction and returns how many rows were processed.
+    Rows are handled in outbox id order, which preserves the order of updates
+    per event. Passing event_id drains that event only and waits for rows
+    locked by a concurrent worker instead of skipping them; the caller must hold
+    lock_event_history for it. Otherwise events whose history lock is held
+    elsewhere are skipped until a later batch.
+    The IDs of the affected events are added to touched_event_ids if given.
+    """
+    query = db.query(EventHistoryOutbox).order_by(EventHistoryOutbox.id.asc())
+    if event_id is not None:
+        query = query.filter(EventHistoryOutbox.event_id == event_id).with_for_update()
+    else:
+        query = query.with_for_update(skip_locked=True)
+    if batch_size:
+        query = query.limit(batch_size)
+    pending = query.all()
+    if event_id is None:
+        locked = {id_ for id_ in sorted({row.event_id for row in pending}) if _try_lock_event_history(db, id_)}
+        pending = [row for row in pending if row.event_id in locked]
+    if not pending:
+        return 0
+
+    event_ids = {row.event_id for row in pending}
+    if touched_event_ids is not None:
+        touched_event_ids.update(event_ids)
+    latest_version_numbers = history_archive.latest_version_numbers(db, event_ids)
+
+    version_rows = []
+    for row in pending:
+        version_number = latest_version_numbers.get(row.event_id, 0) + 1
+        latest_version_numbers[row.event_id] = version_number
+        version_rows.append({
+            "event_id": row.event_id,
+            "version_number": version_number,
+            "data": row.snapshot,
+            "changed_by_user_id": row.user_id,
+            "timestamp": row.created_at,
+        })
+
+    version_ids = db.execute(
+        insert(EventVersion).returning(EventVersion.id, sort_by_parameter_order=True),
+        version_rows
+    ).scalars().all()
+
+    changelog_rows = [
+        {
+            "event_id": row.event_id,
+            "version_id": version_id,
+            "user_id": row.user_id,
+            "timestamp": row.created_at,
+            "changes": row.changes,
+        }
+        for row, version_id in zip(pending, version_ids)
+        if row.changes
+    ]
+    if changelog_rows:
+        db.execute(insert(Changelog), changelog_rows)
+
+    db.query(EventHistoryOutbox).filter(
+        EventHistoryOutbox.id.in_([row.id for row in pending])
+    ).delete(synchronize_session=False)
+    return len(pending)
+
+
+class HistoryOutboxWorker:
+    """Background loop that materializes the outbox in batches."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        batch_size: int = settings.HISTORY_OUTBOX_BATCH_SIZE,
+        poll_interval: float = settings.HISTORY_OUTBOX_POLL_SECONDS
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = asyncio.Event()
+
+    def run_once(self) -> int:
+        """Materializes one batch; returns 0 if another worker holds the lock."""
+        with self.session_factory() as db:
+            acquired = db.execute(
+                text("SELECT pg_try_advisory_xact_lock(:key)"),
+                {"key": OUTBOX_ADVISORY_LOCK_KEY}
+            ).scalar()
+            if not acquired:
+                return 0
+            touched_event_ids: Set[int] = set()
+            processed = materialize_pending_history(
+                db, batch_size=self.batch_size, touched_event_ids=touched_event_ids
+            )
+            db.commit()
+            event_read_cache.invalidate_many(touched_event_ids, kinds=("changelog",))
+            return processed
+
+    async def run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                processed = await asyncio.to_thread(self.run_once)
+            except Exception:
+                logger.exception("History outbox batch failed; retrying")
+                processed = 0
+            if processed < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Stops the loop and flushes whatever is still pending."""
+        self._stopping.set()
+        if self._task:
+            await self._task
+        while await asyncio.to_thread(self.run_once):
+            pass
+
+
+if __name__ == "__main__":
+    from app.db.database import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(HistoryOutboxWorker(SessionLocal).run())
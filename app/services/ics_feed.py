@@ -0,0 +1,250 @@
+# app/services/ics_feed.py
+"""
+Per-user iCalendar (RFC 5545) feeds of every event the user can read.
+
+- feed_etag summarizes the feed (which events, at which updated_at) in one
+  aggregate query, so a poll with a matching If-None-Match is answered with 304
+  without reading any event rows.
+- iter_feed streams the calendar. It walks (id, updated_at) of the readable
+  events through a server-side cursor. Each VEVENT block is cached per event
+  and reused while the event's updated_at is unchanged, so only new or changed
+  events are loaded in full and re-rendered.
+- recurrence_pattern becomes an RRULE: either {"rrule": "FREQ=...;..."} or
+  RRULE parts as keys, e.g. {"freq": "WEEKLY", "interval": 2, "by_day": ["MO"]}
+  or {"freq": "WEEKLY", "by": {"day": ["MO"]}}.
+"""
+import hashlib
+import re
+import secrets
+from collections import OrderedDict
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import CACHE_REQUESTS
+from app.models.event import Event
+from app.models.permission import EventPermission
+
+# Bump when the rendering changes, so clients holding an old ETag get the new output
+FEED_FORMAT_VERSION = 1
+
+_UID_DOMAIN = re.sub(r"[^a-z0-9]+", "-", settings.PROJECT_NAME.lower()).strip("-") or "events"
+_RRULE_PARTS = {
+    "FREQ", "INTERVAL", "COUNT", "UNTIL", "WKST", "BYSECOND", "BYMINUTE", "BYHOUR",
+    "BYDAY", "BYMONTHDAY", "BYYEARDAY", "BYWEEKNO", "BYMONTH", "BYSETPOS",
+}
+_FREQUENCIES = {"SECONDLY", "MINUTELY", "HOURLY", "DAILY", "WEEKLY", "MONTHLY", "YEARLY"}
+_RRULE_VALUE = re.compile(r"^[A-Za-z0-9+\-,]+$")
+
+
+def new_feed_token() -> Tuple[str, str]:
+    """A new feed token and the SHA-256 hex digest stored for it."""
+    token = secrets.token_urlsafe(32)
+    return token, hash_feed_token(token)
+
+
+def hash_feed_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _readable_by(user_id: int):
+    return or_(
+        Event.owner_id == user_id,
+        Event.id.in_(select(EventPermission.event_id).where(EventPermission.user_id == user_id))
+    )
+
+
+# --- Rendering ---
+
+def _utc(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _escape(text: str) -> str:
+    return (
+        text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+        .replace("\r\n", "\\n").replace("\n", "\\n").replace("\r", "\\n")
+    )
+
+
+def _fold(line: str) -> bytes:
+    """Encodes a content line, folded at 75 octets without splitting UTF-8 sequences."""
+    data = line.encode()
+    if len(data) <= 75:
+        return data + b"\r\n"
+    parts: List[bytes] = []
+    start, limit = 0, 75
+    while start < len(data):
+        end = min(start + limit, len(data))
+        while end < len(data) and (data[end] & 0xC0) == 0x80:
+            end -= 1
+        parts.append(data[start:end])
+        start, limit = end, 74 # Continuation lines start with a space
+    return b"\r\n ".join(parts) + b"\r\n"
+
+
+def _rrule_value(name: str, value: Any) -> Optional[str]:
+    if name == "UNTIL" and isinstance(value, str):
+        try:
+            return _utc(datetime.fromisoformat(value.replace("Z", "+00:00")))
+        except ValueError:
+            pass
+    if isinstance(value, (list, tuple)):
+        value = ",".join(str(item) for item in value)
+    value = str(value).upper()
+    return value if _RRULE_VALUE.match(value) else None
+
+
+def recurrence_rule(pattern: Optional[Dict[str, Any]]) -> Optional[str]:
+    """RRULE value for a recurrence_pattern, or None if it has no usable FREQ."""
+    if not isinstance(pattern, dict):
+        return None
+    if isinstance(pattern.get("rrule"), str):
+        rule = pattern["rrule"].strip()
+        rule = rule[6:] if rule.upper().startswith("RRULE:") else rule
+        parts = dict(part.partition("=")[::2] for part in rule.split(";") if part)
+    else:
+        parts = {}
+        for key, value in pattern.items():
+            if key == "by" and isinstance(value, dict): # {"by": {"day": [...]}} -> BYDAY
+                parts.update({f"by{sub}": sub_value for sub, sub_value in value.items()})
+            else:
+                parts[key] = value
+    rule_parts = {}
+    for key, value in parts.items():
+        name = str(key).upper().replace("_", "")
+        if name in _RRULE_PARTS and value not in (None, "", []):
+            rendered = _rrule_value(name, value)
+            if rendered is not None:
+                rule_parts[name] = rendered
+    if rule_parts.get("FREQ") not in _FREQUENCIES:
+        return None
+    # FREQ first, as some clients expect
+    return ";".join(f"{name}={rule_parts[name]}" for name in ["FREQ", *sorted(set(rule_parts) - {"FREQ"})])
+
+
+def render_vevent(event: Event) -> bytes:
+    updated_at = event.updated_at or event.created_at
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:event-{event.id}@{_UID_DOMAIN}",
+        f"DTSTAMP:{_utc(updated_at)}",
+        f"LAST-MODIFIED:{_utc(updated_at)}",
+        f"DTSTART:{_utc(event.start_time)}",
+        f"DTEND:{_utc(event.end_time)}",
+        f"SUMMARY:{_escape(event.title)}",
+    ]
+    if event.created_at:
+        lines.append(f"CREATED:{_utc(event.created_at)}")
+    if event.description:
+        lines.append(f"DESCRIPTION:{_escape(event.description)}")
+    if event.location:
+        lines.append(f"LOCATION:{_escape(event.location)}")
+    if event.is_recurring:
+        rule = recurrence_rule(event.recurrence_pattern)
+        if rule:
+            lines.append(f"RRULE:{rule}")
+    lines.append("END:VEVENT")
+    return b"".join(_fold(line) for line in lines)
+
+
+def _calendar_header() -> bytes:
+    name = _escape(settings.PROJECT_NAME)
+    return b"".join(_fold(line) for line in [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:-//{name}//Events//EN",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{name}",
+    ])
+
+
+_CALENDAR_FOOTER = b"END:VCALENDAR\r\n"
+
+
+class VEventCache:
+    """LRU of rendered VEVENT blocks, one per event, valid for one updated_at."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[int, Tuple[datetime, bytes]]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, event_id: int, updated_at: datetime) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(event_id)
+            if entry is None or entry[0] != updated_at:
+                return None
+            self._entries.move_to_end(event_id)
+            return entry[1]
+
+    def put(self, event_id: int, updated_at: datetime, block: bytes) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[event_id] = (updated_at, block)
+            self._entries.move_to_end(event_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+vevent_cache = VEventCache(settings.ICS_CACHE_SIZE)
+
+
+# --- Queries ---
+
+def feed_etag(db: Session, user_id: int) -> str:
+    """
+    Weak ETag over the set of readable events and their updated_at. Any create,
+    update, delete, share or unshare changes it.
+    """
+    count, checksum = db.execute(
+        select(
+            func.count(Event.id),
+            func.coalesce(func.sum(func.hashtext(
+                func.concat(Event.id, ":", func.extract("epoch", Event.updated_at))
+            )), 0)
+        ).where(_readable_by(user_id))
+    ).one()
+    digest = hashlib.sha256(f"{FEED_FORMAT_VERSION}:{user_id}:{count}:{checksum}".encode()).hexdigest()[:32]
+    return f'W/"{digest}"'
+
+
+def iter_feed(session_factory: Callable[[], Session], user_id: int) -> Iterator[bytes]:
+    """Yields the calendar in chunks; opens its own session, as it runs after the endpoint returns."""
+    yield _calendar_header()
+    with session_factory() as db:
+        keys = db.execute(
+            select(Event.id, Event.updated_at)
+            .where(_readable_by(user_id))
+            .execution_options(yield_per=settings.ICS_FEED_BATCH_SIZE)
+        )
+        for partition in keys.partitions():
+            chunk: List[bytes] = []
+            misses: List[int] = []
+            for event_id, updated_at in partition:
+                block = vevent_cache.get(event_id, updated_at)
+                if block is None:
+                    misses.append(event_id)
+                else:
+                    chunk.append(block)
+            CACHE_REQUESTS.labels("ics_vevent", "hit").inc(len(chunk))
+            if misses:
+                CACHE_REQUESTS.labels("ics_vevent", "miss").inc(len(misses))
+                for event in db.execute(select(Event).where(Event.id.in_(misses))).scalars():
+                    block = render_vevent(event)
+                    vevent_cache.put(event.id, event.updated_at, block)
+                    chunk.append(block)
+                db.expunge_all()
+            yield b"".join(chunk)
+    yield _CALENDAR_FOOTER
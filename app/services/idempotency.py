@@ -0,0 +1,139 @@
+# app/services/idempotency.py
+"""
+Idempotency-Key handling for event writes.
+
+- The first request with a key claims it: a row without a response, committed
+  before the write runs. The write is left uncommitted, and complete() stores
+  its response (compressed) in that row and commits both together, so a write
+  never lands without its response. When the write fails the claim is deleted
+  so the client can retry.
+- A retry with the same key and the same request gets the stored status and
+  body back without touching the events tables. The same key sent with a
+  different request is rejected.
+- A duplicate that arrives while the first request is still running waits for
+  its response, for up to IDEMPOTENCY_WAIT_SECONDS. A claim left behind by a
+  request that died is taken over once it is IDEMPOTENCY_STALE_SECONDS old.
+- Keys are scoped per user and replayed for IDEMPOTENCY_TTL_SECONDS; the
+  purge_idempotency_keys job deletes expired rows.
+"""
+import asyncio
+import json
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from hashlib import sha256
+from typing import Any, Callable, NamedTuple, Optional
+
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.idempotency import IdempotencyKey
+
+_POLL_SECONDS = 0.05
+
+
+class StoredResponse(NamedTuple):
+    status_code: int
+    body: bytes
+
+
+class IdempotencyKeyReused(Exception):
+    """The key was already used for a different request."""
+
+
+class IdempotencyInProgress(Exception):
+    """The first request with the key did not finish within IDEMPOTENCY_WAIT_SECONDS."""
+
+
+def request_fingerprint(endpoint: str, payload: Any) -> str:
+    """Hash of the endpoint and its JSON-compatible parameters, independent of key order."""
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return sha256(f"{endpoint}\n{canonical}".encode()).hexdigest()
+
+
+def _try_claim(db: Session, user_id: int, key: str, request_hash: str) -> bool:
+    """Inserts the claim, or takes over an expired or stale one; True if this request owns the key."""
+    now = datetime.now(timezone.utc)
+    stmt = pg_insert(IdempotencyKey).values(
+        user_id=user_id,
+        key=key,
+        request_hash=request_hash,
+        created_at=now,
+        expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_TTL_SECONDS)
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[IdempotencyKey.user_id, IdempotencyKey.key],
+        set_={
+            "request_hash": stmt.excluded.request_hash,
+            "status_code": None,
+            "response_body": None,
+            "created_at": stmt.excluded.created_at,
+            "expires_at": stmt.excluded.expires_at,
+        },
+        where=or_(
+            IdempotencyKey.expires_at < now,
+            IdempotencyKey.status_code.is_(None)
+            & (IdempotencyKey.created_at < now - timedelta(seconds=settings.IDEMPOTENCY_STALE_SECONDS))
+        )
+    ).returning(IdempotencyKey.key)
+    claimed = db.execute(stmt).first() is not None
+    db.commit()
+    return claimed
+
+
+async def begin(db: Session, user_id: int, key: str, request_hash: str) -> Optional[StoredResponse]:
+    """
+    Claims the key for this request and returns None, or returns the response
+    stored by an earlier request with the same key, waiting for it if that
+    request is still running.
+    """
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        if _try_claim(db, user_id, key, request_hash):
+            return None
+        row = db.execute(
+            select(IdempotencyKey.request_hash, IdempotencyKey.status_code, IdempotencyKey.response_body)
+            .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+        ).first()
+        db.commit()
+        if row is None: # Released by a failed first request since the claim attempt
+            continue
+        if row.request_hash != request_hash:
+            raise IdempotencyKeyReused(key)
+        if row.status_code is not None:
+            return StoredResponse(row.status_code, zlib.decompress(row.response_body))
+        if time.monotonic() > deadline:
+            raise IdempotencyInProgress(key)
+        await asyncio.sleep(_POLL_SECONDS)
+
+
+def complete(db: Session, user_id: int, key: str, status_code: int, body: bytes) -> None:
+    """Stores the response and commits it with the caller's pending write."""
+    db.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+        .values(status_code=status_code, response_body=zlib.compress(body))
+    )
+    db.commit()
+
+
+def release(db: Session, user_id: int, key: str) -> None:
+    """Drops this request's claim after it failed, so the key can be retried."""
+    db.rollback()
+    db.execute(
+        delete(IdempotencyKey)
+        .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key, IdempotencyKey.status_code.is_(None))
+    )
+    db.commit()
+
+
+def purge_expired_keys(session_factory: Callable[[], Session]) -> int:
+    """Deletes expired keys; scheduled as the purge_idempotency_keys job."""
+    with session_factory() as db:
+        deleted = db.execute(
+            delete(IdempotencyKey).where(IdempotencyKey.expires_at < datetime.now(timezone.utc))
+        ).rowcount
+        db.commit()
+        return deleted
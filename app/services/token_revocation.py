@@ -0,0 +1,41 @@
+# app/services/token_revocation.py
+"""
+Background purge of the token revocation index.
+
+A revocation only matters until the token it revokes expires, so rows past
+their expires_at are deleted in batches, which keeps revoked_tokens
+proportional to the tokens that are still alive.
+"""
+import logging
+from typing import Callable
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.security import purge_expired_revocations
+
+logger = logging.getLogger(__name__)
+
+
+class RevocationCompactor:
+    """Deletes expired rows from revoked_tokens; scheduled as the purge_revoked_tokens job."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        batch_size: int = settings.REVOCATION_PURGE_BATCH_SIZE
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+
+    def run_once(self) -> int:
+        """Purges expired revocations in batches; returns how many were deleted."""
+        purged = 0
+        with self.session_factory() as db:
+            while True:
+                deleted = purge_expired_revocations(db, batch_size=self.batch_size)
+                purged += deleted
+                if deleted < self.batch_size:
+                    if purged:
+                        logger.info("Purged %d expired token revocations", purged)
+                    return purged
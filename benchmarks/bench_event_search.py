@@ -0,0 +1,91 @@
+# benchmarks/bench_event_search.py
+"""
+Event search: the ILIKE title filter versus the full-text `q` search.
+
+Seeds one throwaway owner with --rows synthetic events (generated server-side
+with generate_series), runs both search paths of get_events_with_permission
+for each term and removes the seeded rows afterwards.
+
+Usage:
+    python -m benchmarks.bench_event_search --rows 1000000 --iterations 20
+"""
+import argparse
+import statistics
+import time
+import uuid
+
+from sqlalchemy import text
+
+from app.db.database import SessionLocal
+from app.models.user import User
+from app.crud import crud_event
+
+WORDS = ["planning", "review", "standup", "retro", "budget", "offsite", "design", "hiring", "launch", "sync"]
+
+
+def seed_events(db, rows: int) -> int:
+    tag = uuid.uuid4().hex[:12]
+    user = User(username=f"bench_{tag}", email=f"bench_{tag}@example.com", hashed_password="x")
+    db.add(user)
+    db.flush()
+    db.execute(
+        text("""
+            INSERT INTO events (title, description, start_time, end_time, location, owner_id, is_recurring)
+            SELECT
+                (:words)[1 + n % 10] || ' ' || (:words)[1 + (n / 10) % 10] || ' #' || n,
+                'Notes for ' || (:words)[1 + (n / 100) % 10] || ' session ' || n,
+                TIMESTAMPTZ '2030-01-01' + n * INTERVAL '1 minute',
+                TIMESTAMPTZ '2030-01-01' + n * INTERVAL '1 minute' + INTERVAL '1 hour',
+                'Room ' || (n % 50),
+                :owner_id,
+                FALSE
+            FROM generate_series(1, :rows) AS n
+        """),
+        {"words": WORDS, "owner_id": user.id, "rows": rows}
+    )
+    db.commit()
+    db.execute(text("ANALYZE events"))
+    return user.id
+
+
+def time_call(fn, iterations: int) -> list[float]:
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--terms", nargs="+", default=["budget", "hiring", "54321"])
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        started = time.perf_counter()
+        user_id = seed_events(db, args.rows)
+        print(f"seeded {args.rows} events in {time.perf_counter() - started:.1f}s")
+        try:
+            for term in args.terms:
+                for label, kwargs in (("ilike title", {"title": term}), ("full-text q", {"search": term})):
+                    samples = time_call(
+                        lambda: crud_event.get_events_with_permission(db, user_id=user_id, limit=50, **kwargs),
+                        args.iterations
+                    )
+                    print(
+                        f"{term:<14} {label:<12} "
+                        f"mean={statistics.mean(samples):8.2f}ms  "
+                        f"median={statistics.median(samples):8.2f}ms  "
+                        f"max={max(samples):8.2f}ms"
+                    )
+        finally:
+            db.rollback()
+            db.query(User).filter(User.id == user_id).delete()
+            db.commit()
+
+
+if __name__ == "__main__":
+    main()
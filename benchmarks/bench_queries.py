@@ -0,0 +1,130 @@
+# benchmarks/bench_queries.py
+"""
+Per-query Python overhead of the hot CRUD lookups: the lambda statements in
+app/crud against the equivalent ORM Query code they replaced.
+
+Each call is timed end to end, and the time spent inside cursor.execute is
+subtracted (using the query profiling hooks), which leaves statement
+construction, cache-key generation, compilation and result processing.
+Seeds one throwaway user and event in the database from DATABASE_URL and
+removes them afterwards. Point DATABASE_URL at postgresql+psycopg:// to
+include server-side prepared statements.
+
+Usage:
+    python -m benchmarks.bench_queries --iterations 2000
+"""
+import argparse
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from app.core import profiling
+from app.core.profiling import RequestQueryStats, install_query_hooks
+from app.crud import crud_event, crud_user
+from app.db.database import SessionLocal
+from app.models.event import Event
+from app.models.permission import EventPermission
+from app.models.user import User
+
+
+def legacy_get_user_by_email(db, email):
+    return db.query(User).filter(User.email == email).first()
+
+
+def legacy_get_event_with_permission(db, event_id, user_id):
+    event = db.query(Event).filter(Event.id == event_id).first()
+    if not event:
+        return None
+    if event.owner_id == user_id:
+        return event
+    permission = db.query(EventPermission).filter(
+        EventPermission.event_id == event_id,
+        EventPermission.user_id == user_id
+    ).first()
+    return event if permission else None
+
+
+def legacy_get_events_with_permission(db, user_id, skip=0, limit=100):
+    permission_subquery = db.query(EventPermission.event_id).filter(EventPermission.user_id == user_id).subquery()
+    query = db.query(Event).filter((Event.owner_id == user_id) | (Event.id.in_(permission_subquery)))
+    total = query.count()
+    return {"items": query.offset(skip).limit(limit).all(), "total": total}
+
+
+def legacy_get_permission(db, event_id, user_id):
+    return db.query(EventPermission).filter(
+        EventPermission.event_id == event_id,
+        EventPermission.user_id == user_id
+    ).first()
+
+
+def measure(db, fn, iterations: int):
+    """Returns (wall, python) mean microseconds per call; python excludes time in cursor.execute."""
+    fn() # Warm the compiled cache (and the prepared statement, with psycopg 3)
+    fn()
+    db.expunge_all()
+    stats = RequestQueryStats()
+    token = profiling._current_stats.set(stats)
+    try:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+            db.expunge_all() # Keep the identity map from turning later calls into cache hits
+        wall = time.perf_counter() - started
+    finally:
+        profiling._current_stats.reset(token)
+    return wall / iterations * 1e6, (wall - stats.seconds) / iterations * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    install_query_hooks()
+    with SessionLocal() as db:
+        tag = uuid.uuid4().hex[:12]
+        user = User(username=f"bench_{tag}", email=f"bench_{tag}@example.com", hashed_password="x")
+        db.add(user)
+        db.flush()
+        start = datetime(2030, 1, 1, tzinfo=timezone.utc)
+        event = Event(title="bench", start_time=start, end_time=start + timedelta(hours=1), owner_id=user.id)
+        db.add(event)
+        db.commit()
+        user_id, email, event_id = user.id, user.email, event.id
+        stranger_id = -1 # Not the owner and never shared with: exercises the permission lookup
+
+        cases = [
+            ("get_user_by_email",
+             lambda: legacy_get_user_by_email(db, email),
+             lambda: crud_user.get_user_by_email(db, email)),
+            ("get_event_with_permission (owner)",
+             lambda: legacy_get_event_with_permission(db, event_id, user_id),
+             lambda: crud_event.get_event_with_permission(db, event_id, user_id)),
+            ("get_event_with_permission (other)",
+             lambda: legacy_get_event_with_permission(db, event_id, stranger_id),
+             lambda: crud_event.get_event_with_permission(db, event_id, stranger_id)),
+            ("get_events_with_permission",
+             lambda: legacy_get_events_with_permission(db, user_id),
+             lambda: crud_event.get_events_with_permission(db, user_id)),
+            ("get_permission",
+             lambda: legacy_get_permission(db, event_id, user_id),
+             lambda: crud_event.get_permission(db, event_id, user_id)),
+        ]
+        try:
+            print(f"{'query':<36} {'before wall':>12} {'python':>9} {'after wall':>12} {'python':>9} {'python x':>9}")
+            for label, before, after in cases:
+                before_wall, before_python = measure(db, before, args.iterations)
+                after_wall, after_python = measure(db, after, args.iterations)
+                print(
+                    f"{label:<36} {before_wall:10.1f}us {before_python:7.1f}us "
+                    f"{after_wall:10.1f}us {after_python:7.1f}us {before_python / after_python:8.1f}x"
+                )
+        finally:
+            db.rollback()
+            db.query(User).filter(User.id == user_id).delete() # Cascades to the event
+            db.commit()
+
+
+if __name__ == "__main__":
+    main()
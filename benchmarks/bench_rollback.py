@@ -0,0 +1,97 @@
+# benchmarks/bench_rollback.py
+"""
+Rollback latency on events with long version histories.
+
+Seeds one throwaway user and event per history length into the database from
+DATABASE_URL, times rollback_event_to_version_number against it and removes
+the seeded rows afterwards.
+
+Usage:
+    python -m benchmarks.bench_rollback --histories 10 1000 10000 --iterations 50
+"""
+import argparse
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from app.db.database import SessionLocal
+from app.models.event import Event
+from app.models.user import User
+from app.models.version import EventVersion
+from app.crud import crud_event
+from app.services.event_snapshot import event_snapshot_codec
+
+
+def seed_event(db, history_length: int) -> tuple[int, int]:
+    tag = uuid.uuid4().hex[:12]
+    user = User(username=f"bench_{tag}", email=f"bench_{tag}@example.com", hashed_password="x")
+    db.add(user)
+    db.flush()
+
+    start = datetime(2030, 1, 1, 9, tzinfo=timezone.utc)
+    event = Event(
+        title="bench v0",
+        description="line\n" * 20,
+        start_time=start,
+        end_time=start + timedelta(hours=1),
+        owner_id=user.id,
+        recurrence_pattern={"freq": "WEEKLY", "interval": 1},
+    )
+    db.add(event)
+    db.flush()
+
+    snapshot = event_snapshot_codec.encode(event)
+    db.bulk_insert_mappings(EventVersion, [
+        {
+            "event_id": event.id,
+            "version_number": n,
+            "data": {**snapshot, "title": f"bench v{n}"},
+            "changed_by_user_id": user.id,
+        }
+        for n in range(1, history_length + 1)
+    ])
+    db.commit()
+    return user.id, event.id
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run(history_length: int, iterations: int) -> None:
+    with SessionLocal() as db:
+        user_id, event_id = seed_event(db, history_length)
+        try:
+            samples = []
+            for i in range(iterations):
+                started = time.perf_counter()
+                if i % 2:
+                    crud_event.rollback_event_to_version_number(db, event_id, user_id, steps_back=3)
+                else:
+                    crud_event.rollback_event_to_version_number(db, event_id, user_id, version_number=1)
+                samples.append((time.perf_counter() - started) * 1000)
+            print(
+                f"history={history_length:>7}  n={iterations:<4} "
+                f"mean={statistics.mean(samples):7.2f}ms  "
+                f"p50={percentile(samples, 50):7.2f}ms  "
+                f"p95={percentile(samples, 95):7.2f}ms"
+            )
+        finally:
+            db.rollback()
+            db.query(User).filter(User.id == user_id).delete()
+            db.commit()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--histories", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+    for history_length in args.histories:
+        run(history_length, args.iterations)
+
+
+if __name__ == "__main__":
+    main()
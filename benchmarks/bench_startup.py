@@ -0,0 +1,117 @@
+# benchmarks/bench_startup.py
+"""
+Cold start of the app: import time per module, and time to first response
+from a freshly started uvicorn process.
+
+Import times come from `python -X importtime -c "import app.main"` (median of
+--runs fresh interpreters). Time to first response is measured from spawning
+uvicorn until GET / answers, followed by the first request that needs a
+database connection (GET /api/health/db-pool), once per DB_POOL_PREWARM value
+in --prewarm. Needs the settings from .env or the environment and a reachable
+DATABASE_URL.
+
+Usage:
+    python -m benchmarks.bench_startup --runs 5 --prewarm 0 5
+"""
+import argparse
+import os
+import re
+import secrets
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def import_times(runs: int) -> Tuple[float, Dict[str, Tuple[float, float]]]:
+    """Median import time of app.main in ms, and median (self, cumulative) ms per module."""
+    samples: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import app.main"],
+            capture_output=True, text=True, check=True
+        )
+        for line in result.stderr.splitlines():
+            match = IMPORT_LINE.match(line)
+            if match:
+                samples[match.group(4)].append((int(match.group(1)), int(match.group(2))))
+    modules = {
+        name: (statistics.median(s for s, _ in values) / 1000, statistics.median(c for _, c in values) / 1000)
+        for name, values in samples.items()
+    }
+    return modules["app.main"][1], modules
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def get(url: str, headers: Optional[Dict[str, str]] = None) -> int:
+    with urllib.request.urlopen(urllib.request.Request(url, headers=headers or {}), timeout=10) as response:
+        response.read()
+        return response.status
+
+
+def first_response(prewarm: int) -> Tuple[float, float]:
+    """(ms until GET / answers, ms for the first database-backed request)."""
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    health_token = secrets.token_urlsafe(16) # /api/health/* needs the operator token
+    env = {**os.environ, "DB_POOL_PREWARM": str(prewarm), "HEALTH_TOKEN": health_token}
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while True:
+            if server.poll() is not None:
+                raise RuntimeError("uvicorn exited during start-up; check the settings and DATABASE_URL")
+            try:
+                get(base + "/")
+                break
+            except OSError:
+                time.sleep(0.005)
+        ready = time.perf_counter() - started
+        db_started = time.perf_counter()
+        get(base + "/api/health/db-pool", {"X-Health-Token": health_token})
+        return ready * 1000, (time.perf_counter() - db_started) * 1000
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Slowest top-level imports to list")
+    parser.add_argument("--prewarm", type=int, nargs="+", default=[0, 5])
+    args = parser.parse_args()
+
+    total, modules = import_times(args.runs)
+    print(f"import app.main: {total:.1f} ms (median of {args.runs})")
+    print(f"\n{'module':<40} {'self':>9} {'cumulative':>11}")
+    # Packages at their top level, plus every app module
+    listed = [name for name in modules if "." not in name or name.startswith("app.")]
+    for name in sorted(listed, key=lambda n: modules[n][1], reverse=True)[:args.top]:
+        self_ms, cumulative_ms = modules[name]
+        print(f"{name:<40} {self_ms:7.1f}ms {cumulative_ms:9.1f}ms")
+
+    print(f"\n{'DB_POOL_PREWARM':<16} {'first response':>15} {'first DB request':>17}")
+    for prewarm in args.prewarm:
+        results = [first_response(prewarm) for _ in range(args.runs)]
+        ready = statistics.median(r for r, _ in results)
+        first_db = statistics.median(d for _, d in results)
+        print(f"{prewarm:<16} {ready:13.1f}ms {first_db:15.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
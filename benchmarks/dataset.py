@@ -0,0 +1,150 @@
+# benchmarks/dataset.py
+"""
+Synthetic dataset for the load test: users, events, shares and deep version
+histories, generated server-side with generate_series so that millions of
+rows seed in seconds. Every seeded username starts with the dataset tag, so
+drop_dataset can remove everything (events, permissions, versions and
+changelog cascade from the users).
+"""
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.security import get_password_hash
+
+WORDS = ["planning", "review", "standup", "retro", "budget", "offsite", "design", "hiring", "launch", "sync"]
+
+
+@dataclass
+class Dataset:
+    tag: str
+    password: str
+    usernames: List[str]
+    # owner username -> ids of the events it owns
+    owned_events: Dict[str, List[int]] = field(default_factory=dict)
+    history_depth: int = 0
+
+
+def ensure_roles(db: Session) -> Dict[str, int]:
+    db.execute(text("""
+        INSERT INTO roles (name) VALUES ('owner'), ('editor'), ('viewer')
+        ON CONFLICT (name) DO NOTHING
+    """))
+    return dict(db.execute(text("SELECT name, id FROM roles")).all())
+
+
+def seed_dataset(
+    db: Session,
+    users: int,
+    events_per_user: int,
+    shares_per_event: int,
+    history_depth: int,
+    password: str = "load-test-password"
+) -> Dataset:
+    tag = f"load_{uuid.uuid4().hex[:8]}"
+    roles = ensure_roles(db)
+    hashed_password = get_password_hash(password) # bcrypt once, shared by every seeded user
+
+    user_rows = db.execute(
+        text("""
+            INSERT INTO users (username, email, hashed_password, created_at, updated_at)
+            SELECT :tag || '_' || n, :tag || '_' || n || '@example.com', :hashed_password, NOW(), NOW()
+            FROM generate_series(1, :users) AS n
+            RETURNING id, username
+        """),
+        {"tag": tag, "users": users, "hashed_password": hashed_password}
+    ).all()
+    user_ids = [row.id for row in user_rows]
+
+    db.execute(
+        text("""
+            INSERT INTO events (title, description, start_time, end_time, location, owner_id, is_recurring, created_at, updated_at)
+            SELECT
+                (:words)[1 + n % 10] || ' ' || (:words)[1 + (u.idx + n) % 10] || ' #' || u.id || '-' || n,
+                'Notes for ' || (:words)[1 + (n / 10) % 10] || E' session\\nagenda item ' || n,
+                TIMESTAMPTZ '2030-01-01' + (u.idx * :events_per_user + n) * INTERVAL '30 minutes',
+                TIMESTAMPTZ '2030-01-01' + (u.idx * :events_per_user + n) * INTERVAL '30 minutes' + INTERVAL '1 hour',
+                'Room ' || (n % 50),
+                u.id,
+                FALSE,
+                NOW(),
+                NOW()
+            FROM unnest(CAST(:user_ids AS int[])) WITH ORDINALITY AS u(id, idx)
+            CROSS JOIN generate_series(1, :events_per_user) AS n
+        """),
+        {"words": WORDS, "user_ids": user_ids, "events_per_user": events_per_user}
+    )
+
+    if shares_per_event and users > 1:
+        # Each event is shared with the next shares_per_event users, alternating editor/viewer
+        db.execute(
+            text("""
+                INSERT INTO event_permissions (event_id, user_id, role_id)
+                SELECT e.id,
+                       (CAST(:user_ids AS int[]))[1 + (u.idx + s) % :users],
+                       CASE WHEN s % 2 = 1 THEN :editor ELSE :viewer END
+                FROM unnest(CAST(:user_ids AS int[])) WITH ORDINALITY AS u(id, idx)
+                JOIN events e ON e.owner_id = u.id
+                CROSS JOIN generate_series(1, :shares) AS s
+            """),
+            {
+                "user_ids": user_ids,
+                "users": users,
+                "shares": min(shares_per_event, users - 1),
+                "editor": roles["editor"],
+                "viewer": roles["viewer"],
+            }
+        )
+
+    if history_depth:
+        # Version n of each event retitles it; the last version matches the current row
+        db.execute(
+            text("""
+                INSERT INTO event_versions (event_id, version_number, data, changed_by_user_id, timestamp)
+                SELECT e.id, v,
+                       jsonb_set(
+                           to_jsonb(e) - 'search_vector', '{title}',
+                           to_jsonb(CASE WHEN v = :depth THEN e.title ELSE e.title || ' (rev ' || v || ')' END)
+                       ),
+                       e.owner_id,
+                       e.created_at + v * INTERVAL '1 second'
+                FROM events e
+                CROSS JOIN generate_series(1, :depth) AS v
+                WHERE e.owner_id = ANY(CAST(:user_ids AS int[]))
+            """),
+            {"user_ids": user_ids, "depth": history_depth}
+        )
+        db.execute(
+            text("""
+                INSERT INTO changelog (event_id, version_id, user_id, timestamp, changes)
+                SELECT cur.event_id, cur.id, cur.changed_by_user_id, cur.timestamp,
+                       jsonb_build_object('title', jsonb_build_object('old', prev.data -> 'title', 'new', cur.data -> 'title'))
+                FROM event_versions cur
+                JOIN event_versions prev
+                  ON prev.event_id = cur.event_id AND prev.version_number = cur.version_number - 1
+                WHERE cur.changed_by_user_id = ANY(CAST(:user_ids AS int[]))
+            """),
+            {"user_ids": user_ids}
+        )
+
+    db.commit()
+    for table in ("users", "events", "event_permissions", "event_versions", "changelog"):
+        db.execute(text(f"ANALYZE {table}"))
+
+    dataset = Dataset(tag=tag, password=password, usernames=[row.username for row in user_rows], history_depth=history_depth)
+    usernames_by_id = {row.id: row.username for row in user_rows}
+    for event_id, owner_id in db.execute(
+        text("SELECT id, owner_id FROM events WHERE owner_id = ANY(CAST(:user_ids AS int[])) ORDER BY id"),
+        {"user_ids": user_ids}
+    ):
+        dataset.owned_events.setdefault(usernames_by_id[owner_id], []).append(event_id)
+    db.commit()
+    return dataset
+
+
+def drop_dataset(db: Session, tag: str) -> None:
+    db.execute(text("DELETE FROM users WHERE username LIKE :prefix"), {"prefix": f"{tag}\\_%"})
+    db.commit()
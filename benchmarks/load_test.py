@@ -0,0 +1,312 @@
+# benchmarks/load_test.py
+"""
+Mixed-workload load test for the whole API.
+
+Seeds a synthetic dataset (see benchmarks/dataset.py), logs in --clients virtual
+users and has each of them issue a weighted mix of reads and writes for
+--duration seconds. Requests go either in-process to app.main:app through
+httpx's ASGI transport (the default) or to a running server (--url; it must use
+the same DATABASE_URL). Reports throughput and p50/p95/p99 latency per
+operation. --save writes the report as a JSON baseline. --compare exits with
+status 1 when an operation's p95 or throughput is worse than the baseline by
+more than --tolerance.
+
+Without a database server, --embedded-postgres DIR starts a throwaway
+PostgreSQL from the pgserver package (pip install pgserver) and creates the
+schema there.
+
+Usage:
+    python -m benchmarks.load_test --users 200 --events-per-user 50 --history-depth 100 \\
+        --duration 30 --save benchmarks/baselines/local.json
+    python -m benchmarks.load_test --url http://localhost:8000 --compare benchmarks/baselines/local.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+DEFAULT_MIX = {
+    "list_events": 30,
+    "search_events": 10,
+    "get_event": 20,
+    "changelog": 8,
+    "diff_range": 7,
+    "update_event": 15,
+    "rollback": 5,
+    "create_event": 5,
+}
+SEARCH_TERMS = ["budget", "hiring", "design review", "launch", "standup"]
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def parse_mix(value: str) -> Dict[str, int]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown operation {name!r}; choose from {', '.join(DEFAULT_MIX)}")
+        mix[name] = int(weight)
+    return mix
+
+
+def start_embedded_postgres(data_dir: str) -> None:
+    """Points DATABASE_URL at a pgserver instance; must run before anything imports app.*"""
+    try:
+        import pgserver
+    except ImportError:
+        sys.exit("--embedded-postgres needs the pgserver package: pip install pgserver")
+    server = pgserver.get_server(data_dir)
+    os.environ["DATABASE_URL"] = server.get_uri()
+
+
+def create_schema() -> None:
+    from sqlalchemy import text
+
+    import app.models  # noqa: F401 - registers every table on Base.metadata
+    from app.db.database import Base, SessionLocal, get_engine
+    from app.services.history_archive import ensure_partitions
+
+    engine = get_engine()
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        # Indexes that are not declared on the models (see the README schema)
+        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_events_search_vector ON events USING GIN (search_vector)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_event_permissions_event_id_id ON event_permissions(event_id, id)"))
+    with SessionLocal() as db:
+        ensure_partitions(db)
+        db.commit()
+
+
+class VirtualUser:
+    def __init__(self, client: httpx.AsyncClient, username: str, event_ids: List[int], history_depth: int, seed: int):
+        self.client = client
+        self.username = username
+        self.event_ids = event_ids
+        self.history_depth = history_depth
+        self.rng = random.Random(seed)
+        self.headers: Dict[str, str] = {}
+
+    async def login(self, password: str) -> None:
+        response = await self.client.post("/api/auth/login", data={"username": self.username, "password": password})
+        response.raise_for_status()
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    def build_request(self, operation: str) -> Tuple[str, str, Dict[str, Any]]:
+        rng = self.rng
+        event_id = rng.choice(self.event_ids)
+        if operation == "list_events":
+            return "GET", "/api/events/", {"params": {"skip": rng.randrange(0, 5) * 20, "limit": 20}}
+        if operation == "search_events":
+            return "GET", "/api/events/", {"params": {"q": rng.choice(SEARCH_TERMS), "limit": 20}}
+        if operation == "get_event":
+            return "GET", f"/api/events/{event_id}", {}
+        if operation == "changelog":
+            return "GET", f"/api/events/{event_id}/changelog", {}
+        if operation == "diff_range":
+            to_version = max(2, self.history_depth)
+            from_version = rng.randint(1, to_version - 1)
+            return "GET", f"/api/events/{event_id}/diff", {"params": {"from_version": from_version, "to_version": to_version}}
+        if operation == "update_event":
+            return "PUT", f"/api/events/{event_id}", {"json": {"title": f"{rng.choice(SEARCH_TERMS)} {rng.randrange(10**6)}"}}
+        if operation == "rollback":
+            return "POST", f"/api/events/{event_id}/rollback", {"params": {"steps_back": 1}}
+        if operation == "create_event":
+            start = datetime(2031, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=rng.randrange(10**6))
+            return "POST", "/api/events/", {"json": {
+                "title": f"{rng.choice(SEARCH_TERMS)} created under load",
+                "start_time": start.isoformat(),
+                "end_time": (start + timedelta(hours=1)).isoformat(),
+            }}
+        raise ValueError(operation)
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    def record(self, operation: str, milliseconds: float, ok: bool) -> None:
+        self.latencies.setdefault(operation, []).append(milliseconds)
+        if not ok:
+            self.errors[operation] = self.errors.get(operation, 0) + 1
+
+    def report(self, elapsed: float) -> Dict[str, Dict[str, float]]:
+        report = {}
+        for operation, samples in sorted(self.latencies.items()):
+            report[operation] = {
+                "count": len(samples),
+                "errors": self.errors.get(operation, 0),
+                "throughput_rps": round(len(samples) / elapsed, 2),
+                "p50_ms": round(percentile(samples, 50), 3),
+                "p95_ms": round(percentile(samples, 95), 3),
+                "p99_ms": round(percentile(samples, 99), 3),
+                "max_ms": round(max(samples), 3),
+            }
+        return report
+
+
+async def drive(user: VirtualUser, mix: Dict[str, int], deadline: float, recorder: Optional[Recorder]) -> None:
+    operations, weights = zip(*mix.items())
+    while time.perf_counter() < deadline:
+        operation = user.rng.choices(operations, weights)[0]
+        method, url, kwargs = user.build_request(operation)
+        started = time.perf_counter()
+        try:
+            response = await user.client.request(method, url, headers=user.headers, **kwargs)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        if recorder is not None:
+            recorder.record(operation, (time.perf_counter() - started) * 1000, ok)
+
+
+async def run_load(args, dataset) -> Tuple[Dict[str, Dict[str, float]], float]:
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=60, limits=httpx.Limits(max_connections=args.clients))
+    else:
+        from app.main import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://load-test", timeout=60)
+
+    async with client:
+        owners = [name for name in dataset.usernames if dataset.owned_events.get(name)]
+        users = [
+            VirtualUser(client, owners[i % len(owners)], dataset.owned_events[owners[i % len(owners)]], dataset.history_depth, seed=args.seed * 100_003 + i)
+            for i in range(args.clients)
+        ]
+        started = time.perf_counter()
+        await asyncio.gather(*(user.login(dataset.password) for user in users))
+        print(f"logged in {len(users)} clients in {time.perf_counter() - started:.1f}s")
+
+        if args.warmup:
+            deadline = time.perf_counter() + args.warmup
+            await asyncio.gather(*(drive(user, args.mix, deadline, None) for user in users))
+
+        recorder = Recorder()
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*(drive(user, args.mix, deadline, recorder) for user in users))
+        elapsed = time.perf_counter() - started
+    return recorder.report(elapsed), elapsed
+
+
+def print_report(report: Dict[str, Dict[str, float]]) -> None:
+    print(f"{'operation':<16}{'count':>8}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for operation, row in report.items():
+        print(
+            f"{operation:<16}{row['count']:>8}{row['errors']:>8}{row['throughput_rps']:>10.1f}"
+            f"{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}{row['p99_ms']:>10.2f}"
+        )
+
+
+def compare(report: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    regressions = []
+    for operation, base in baseline.items():
+        current = report.get(operation)
+        if current is None:
+            continue
+        if current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{operation}: p95 {base['p95_ms']:.2f}ms -> {current['p95_ms']:.2f}ms")
+        if current["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{operation}: {base['throughput_rps']:.1f} -> {current['throughput_rps']:.1f} req/s")
+    return regressions
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Base URL of a running server; default is in-process ASGI")
+    parser.add_argument("--embedded-postgres", metavar="DIR", help="Start a pgserver PostgreSQL in DIR instead of using DATABASE_URL")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--events-per-user", type=int, default=20)
+    parser.add_argument("--shares-per-event", type=int, default=2)
+    parser.add_argument("--history-depth", type=int, default=50)
+    parser.add_argument("--clients", type=int, default=20, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Unmeasured seconds before the run")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="e.g. list_events=50,update_event=10")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the workload's random choices")
+    parser.add_argument("--save", metavar="PATH", help="Write the report as a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="Fail if the run regresses against this baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression for --compare")
+    parser.add_argument("--keep-dataset", action="store_true", help="Leave the seeded rows in the database")
+    args = parser.parse_args()
+
+    if not args.url:
+        # Every virtual user would share one rate-limit budget per client address,
+        # and the mix hits the limited endpoints on purpose; set it to "true" to include limiting
+        os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    if args.embedded_postgres:
+        start_embedded_postgres(args.embedded_postgres)
+        create_schema()
+
+    # Imported after DATABASE_URL is final
+    from app.db.database import SessionLocal
+    from benchmarks.dataset import drop_dataset, seed_dataset
+
+    with SessionLocal() as db:
+        started = time.perf_counter()
+        dataset = seed_dataset(db, args.users, args.events_per_user, args.shares_per_event, args.history_depth)
+    print(
+        f"seeded {args.users} users x {args.events_per_user} events, {args.shares_per_event} shares/event, "
+        f"{args.history_depth} versions/event in {time.perf_counter() - started:.1f}s"
+    )
+    try:
+        report, elapsed = asyncio.run(run_load(args, dataset))
+    finally:
+        if not args.keep_dataset:
+            with SessionLocal() as db:
+                drop_dataset(db, dataset.tag)
+
+    print_report(report)
+    total = sum(row["count"] for row in report.values())
+    print(f"total {total} requests in {elapsed:.1f}s ({total / elapsed:.1f} req/s)")
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.save) or ".", exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump({
+                "revision": git_revision(),
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "target": args.url or "asgi",
+                "config": {
+                    key: getattr(args, key)
+                    for key in ("users", "events_per_user", "shares_per_event", "history_depth", "clients", "duration", "mix", "seed")
+                },
+                "operations": report,
+            }, f, indent=2)
+        print(f"saved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline["operations"], args.tolerance)
+        if regressions:
+            print(f"regressions against {args.compare} (revision {baseline.get('revision')}):")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"no regressions against {args.compare} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()